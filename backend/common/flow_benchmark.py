@@ -0,0 +1,166 @@
+"""Flow insertion benchmark.
+
+Generates per-host, per-L4-port flows from a flow rule spec and pushes them
+to ONOS, reporting:
+
+  * sustained insertion rate (flows/s accepted by the REST API, and flows/s
+    until every flow reached ADDED)
+  * ONOS acceptance latency per batch POST (p50/p95/p99/max)
+  * OVS flow table occupancy of each bridge before and after
+
+Usage (from backend/common, with the network running):
+
+    sudo python3 flow_benchmark.py ../flowrules/flow_rule_final1.json --topology topo_final_88
+    sudo python3 flow_benchmark.py ../flowrules/flow_rule_final1.json --hosts-per-subnet 250
+"""
+import argparse
+import importlib
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import flow_compiler
+import flow_injector
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'topologies'))
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def ovs_flow_counts(switch_count):
+    """Flow count of each OVS bridge s1..sN (None if it cannot be read)"""
+    counts = {}
+    for i in range(1, switch_count + 1):
+        bridge = f's{i}'
+        try:
+            output = subprocess.run(
+                ['sudo', 'ovs-ofctl', '-O', 'OpenFlow13', 'dump-aggregate', bridge],
+                capture_output=True, text=True, timeout=10
+            ).stdout
+            match = re.search(r'flow_count=(\d+)', output)
+            counts[bridge] = int(match.group(1)) if match else None
+        except (OSError, subprocess.SubprocessError):
+            counts[bridge] = None
+    return counts
+
+
+def run_benchmark(flows, batch_size, max_workers, convergence_timeout):
+    """Insert flows batch_size per POST from max_workers threads.
+
+    Returns the report and the per-flow results (for cleanup).
+    """
+    batches = [flows[start:start + batch_size] for start in range(0, len(flows), batch_size)]
+
+    def post(batch):
+        started = time.perf_counter()
+        results = flow_injector.post_flow_batch(batch)
+        return results, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        outcomes = list(pool.map(post, batches))
+    accepted_s = time.perf_counter() - started
+
+    results = [result for batch_results, _ in outcomes for result in batch_results]
+    latencies = [latency for _, latency in outcomes]
+    accepted = sum(1 for result in results if result["success"])
+
+    convergence = flow_injector.track_convergence(results, started, convergence_timeout)
+    all_added_ms = convergence["time_to_all_added_ms"]
+
+    report = {
+        "flows": len(flows),
+        "batches": len(batches),
+        "accepted": accepted,
+        "failed": len(flows) - accepted,
+        "accept_time_s": round(accepted_s, 3),
+        "accept_rate_fps": round(accepted / accepted_s, 1) if accepted_s else None,
+        "install_rate_fps": round(accepted / (all_added_ms / 1000), 1) if all_added_ms else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 2),
+            "p95": round(percentile(latencies, 0.95), 2),
+            "p99": round(percentile(latencies, 0.99), 2),
+            "max": round(max(latencies), 2)
+        } if latencies else None,
+        "convergence": {key: value for key, value in convergence.items() if key != "devices"}
+    }
+    return report, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ONOS/OVS flow insertion with per-host flows")
+    parser.add_argument("spec", help="Flow rule spec (JSON)")
+    parser.add_argument("--topology", help="Topology module to take host and switch counts from")
+    parser.add_argument("--hosts-per-subnet", type=int, help="Override the number of hosts in every subnet")
+    parser.add_argument("--switches", type=int, help="Override the number of switches")
+    parser.add_argument("--batch-size", type=int, default=200, help="Flows per POST (default 200)")
+    parser.add_argument("--workers", type=int, default=flow_injector.DEFAULT_MAX_WORKERS,
+                        help="Concurrent POSTs")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for ADDED")
+    parser.add_argument("--keep", action="store_true", help="Leave the flows installed afterwards")
+    args = parser.parse_args()
+
+    spec = flow_compiler.load_spec(args.spec)
+
+    host_counts = {subnet: 0 for subnet in spec["subnets"]}
+    switch_count = flow_compiler.DEFAULT_SWITCH_COUNT
+    if args.topology:
+        topology = importlib.import_module(args.topology)
+        host_counts.update({
+            "student": getattr(topology, 'student_number', 0),
+            "faculty": getattr(topology, 'faculty_number', 0)
+        })
+        switch_count = getattr(topology, 'switch_number', switch_count)
+    if args.hosts_per_subnet is not None:
+        host_counts = {subnet: args.hosts_per_subnet for subnet in spec["subnets"]}
+    if args.switches is not None:
+        switch_count = args.switches
+
+    flows = flow_compiler.compile_host_flows(spec, host_counts, switch_count)
+    print(f"Generated {len(flows)} flows for {switch_count} switches, hosts per subnet: {host_counts}")
+
+    before = ovs_flow_counts(switch_count)
+    report, results = run_benchmark(flows, max(1, args.batch_size), max(1, args.workers), args.timeout)
+    after = ovs_flow_counts(switch_count)
+
+    print(f"\n=== Flow insertion benchmark ({report['flows']} flows, {report['batches']} batches) ===")
+    print(f"Accepted:           {report['accepted']} ({report['failed']} failed) in {report['accept_time_s']} s")
+    print(f"Acceptance rate:    {report['accept_rate_fps']} flows/s")
+    print(f"Installation rate:  {report['install_rate_fps']} flows/s (all ADDED)")
+    if report["latency_ms"]:
+        latency = report["latency_ms"]
+        print(f"POST latency (ms):  p50 {latency['p50']}  p95 {latency['p95']}  "
+              f"p99 {latency['p99']}  max {latency['max']}")
+    convergence = report["convergence"]
+    print(f"Convergence:        {'complete' if convergence['converged'] else 'incomplete'}, "
+          f"first ADDED {convergence['time_to_first_added_ms']} ms, "
+          f"all ADDED {convergence['time_to_all_added_ms']} ms, "
+          f"{convergence['pending_flows']} pending")
+
+    print(f"\n{'Bridge':<8} {'Flows before':<14} {'Flows after':<14}")
+    for bridge in before:
+        print(f"{bridge:<8} {str(before[bridge]):<14} {str(after[bridge]):<14}")
+
+    if not args.keep:
+        # Only the benchmark's own flows are removed
+        refs = [
+            {"deviceId": result["deviceId"], "flowId": result["flowId"]}
+            for result in results if result["success"] and result.get("flowId") is not None
+        ]
+        started = time.perf_counter()
+        removed = flow_injector.delete_flow_refs(refs, max(1, args.batch_size))
+        print(f"\nRemoved {sum(1 for result in removed if result['success'])} benchmark flows "
+              f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""Declarative flow rule specs compiled to ONOS flow payloads.
+
+A spec is a JSON file describing the policy as data: the source subnets,
+the destination services and the queue each (subnet, service) class is
+steered into. compile_flows() expands it into one ONOS flow per class per
+switch, and the result is memoized per (spec, switch count) so repeated
+injections reuse the payload list. compile_host_flows() expands the same
+spec per source host and per destination L4 port instead of per subnet.
+
+Example spec:
+
+    {
+        "priority": 50000,
+        "subnets": {"student": "10.0.0.0/24"},
+        "services": {"mail": "10.0.2.1/32"},
+        "classes": [{"subnet": "student", "service": "mail", "queueId": 1}]
+    }
+"""
+import hashlib
+import ipaddress
+import json
+import os
+import threading
+from collections import OrderedDict
+import flow_injector
+
+DEFAULT_PRIORITY = 50000
+DEFAULT_SWITCH_COUNT = 8
+
+# Per-host flows sit above the subnet flows so both can be installed
+HOST_PRIORITY_OFFSET = 1000
+
+# L4 ports of each service, used when a spec has no "service_ports"
+DEFAULT_SERVICE_PORTS = {
+    "mail": {"protocol": "TCP", "ports": [25, 587, 993]},
+    "rtmp": {"protocol": "TCP", "ports": [1935]},
+    "call": {"protocol": "UDP", "ports": [5060, 5061]},
+}
+
+IP_PROTOCOLS = {"TCP": 6, "UDP": 17}
+
+# Compiled payload lists kept per (spec fingerprint, switch count)
+CACHE_SIZE = 32
+
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def device_id(dpid):
+    """ONOS device id of an OpenFlow switch, e.g. 10 -> of:000000000000000a"""
+    return f"of:{dpid:016x}"
+
+
+def load_spec(path):
+    """Read and validate a spec file"""
+    with open(path) as spec_file:
+        spec = json.load(spec_file)
+    validate_spec(spec)
+    return spec
+
+
+def validate_spec(spec):
+    """Raise ValueError if the spec is incomplete or inconsistent"""
+    for key in ("subnets", "services", "classes"):
+        if key not in spec:
+            raise ValueError(f"Flow rule spec is missing '{key}'")
+
+    for name, prefix in list(spec["subnets"].items()) + list(spec["services"].items()):
+        try:
+            ipaddress.ip_network(prefix)
+        except ValueError:
+            raise ValueError(f"Invalid prefix for '{name}': {prefix}")
+
+    for flow_class in spec["classes"]:
+        if flow_class.get("subnet") not in spec["subnets"]:
+            raise ValueError(f"Unknown subnet in class: {flow_class}")
+        if flow_class.get("service") not in spec["services"]:
+            raise ValueError(f"Unknown service in class: {flow_class}")
+        if not isinstance(flow_class.get("queueId"), int) or flow_class["queueId"] < 0:
+            raise ValueError(f"Invalid queueId in class: {flow_class}")
+
+
+def spec_fingerprint(spec):
+    """Stable hash of a spec's content"""
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+def _build_flows(spec, switch_count):
+    """Expand every class of the spec on switches 1..switch_count"""
+    priority = spec.get("priority", DEFAULT_PRIORITY)
+    flows = []
+    for dpid in range(1, switch_count + 1):
+        for flow_class in spec["classes"]:
+            flows.append({
+                "priority": priority,
+                "timeout": 0,
+                "isPermanent": True,
+                "deviceId": device_id(dpid),
+                "treatment": {
+                    "instructions": [
+                        {"type": "QUEUE", "queueId": flow_class["queueId"]},
+                        {"type": "OUTPUT", "port": "NORMAL"}
+                    ]
+                },
+                "selector": {
+                    "criteria": [
+                        {"type": "ETH_TYPE", "ethType": "0x800"},
+                        {"type": "IPV4_SRC", "ip": spec["subnets"][flow_class["subnet"]]},
+                        {"type": "IPV4_DST", "ip": spec["services"][flow_class["service"]]}
+                    ]
+                }
+            })
+    return flows
+
+
+def compile_flows(spec, switch_count=DEFAULT_SWITCH_COUNT):
+    """Return the ONOS payloads of a spec for switch_count switches.
+
+    The payload dicts are shared between callers through the cache and
+    must not be modified; the returned list itself is a fresh copy.
+    """
+    key = (spec_fingerprint(spec), switch_count)
+    with _compiled_lock:
+        if key in _compiled:
+            _compiled.move_to_end(key)
+            return list(_compiled[key])
+
+    flows = _build_flows(spec, switch_count)
+
+    with _compiled_lock:
+        _compiled[key] = flows
+        while len(_compiled) > CACHE_SIZE:
+            _compiled.popitem(last=False)
+    return list(flows)
+
+
+def subnet_hosts(prefix, count):
+    """/32 prefixes of the first count hosts of a subnet (.1, .2, ...)"""
+    network = ipaddress.ip_network(prefix)
+    if count > network.num_addresses - 2:
+        raise ValueError(f"{prefix} cannot hold {count} hosts")
+    return [f"{network.network_address + i}/32" for i in range(1, count + 1)]
+
+
+def compile_host_flows(spec, host_counts, switch_count=DEFAULT_SWITCH_COUNT, priority=None):
+    """Expand a spec into per-host, per-L4-port flows.
+
+    host_counts maps each subnet name to its number of hosts (e.g.
+    {"student": 16, "faculty": 2}). Every class becomes one flow per host of
+    its subnet and per port of its service, matching IPV4_SRC <host>/32,
+    IPV4_DST and the TCP/UDP destination port, on each of switch_count
+    switches. Service ports come from the spec's "service_ports" or
+    DEFAULT_SERVICE_PORTS.
+    """
+    service_ports = spec.get("service_ports", DEFAULT_SERVICE_PORTS)
+    if priority is None:
+        priority = spec.get("priority", DEFAULT_PRIORITY) + HOST_PRIORITY_OFFSET
+
+    hosts = {
+        subnet: subnet_hosts(prefix, host_counts.get(subnet, 0))
+        for subnet, prefix in spec["subnets"].items()
+    }
+
+    # Selector/treatment pairs are the same on every switch
+    matches = []
+    for flow_class in spec["classes"]:
+        service = service_ports.get(flow_class["service"])
+        if service is None:
+            raise ValueError(f"No L4 ports defined for service '{flow_class['service']}'")
+        protocol = service["protocol"].upper()
+        if protocol not in IP_PROTOCOLS:
+            raise ValueError(f"Unsupported protocol for '{flow_class['service']}': {protocol}")
+        port_type, port_key = ("TCP_DST", "tcpPort") if protocol == "TCP" else ("UDP_DST", "udpPort")
+
+        for host in hosts[flow_class["subnet"]]:
+            for port in service["ports"]:
+                matches.append((
+                    {
+                        "criteria": [
+                            {"type": "ETH_TYPE", "ethType": "0x800"},
+                            {"type": "IP_PROTO", "protocol": IP_PROTOCOLS[protocol]},
+                            {"type": "IPV4_SRC", "ip": host},
+                            {"type": "IPV4_DST", "ip": spec["services"][flow_class["service"]]},
+                            {"type": port_type, port_key: port}
+                        ]
+                    },
+                    {
+                        "instructions": [
+                            {"type": "QUEUE", "queueId": flow_class["queueId"]},
+                            {"type": "OUTPUT", "port": "NORMAL"}
+                        ]
+                    }
+                ))
+
+    return [
+        {
+            "priority": priority,
+            "timeout": 0,
+            "isPermanent": True,
+            "deviceId": device_id(dpid),
+            "treatment": treatment,
+            "selector": selector
+        }
+        for dpid in range(1, switch_count + 1)
+        for selector, treatment in matches
+    ]
+
+
+class FlowRuleSpec:
+    """A flow rule set loaded from a spec file.
+
+    Offers the same interface as a flow rule module (__name__,
+    build_flow_payloads, inject_flow_rules) so the web routes can select
+    either.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.__name__ = os.path.splitext(os.path.basename(path))[0]
+        self.spec = load_spec(path)
+
+    def build_flow_payloads(self, switch_count=DEFAULT_SWITCH_COUNT):
+        """ONOS payloads of this rule set for switch_count switches"""
+        return compile_flows(self.spec, switch_count)
+
+    def inject_flow_rules(self, switch_count=DEFAULT_SWITCH_COUNT,
+                          mode=flow_injector.DEFAULT_MODE,
+                          batch_size=flow_injector.DEFAULT_BATCH_SIZE,
+                          max_workers=flow_injector.DEFAULT_MAX_WORKERS):
+        """Inject flow rules into ONOS controller"""
+        report = flow_injector.inject_flows(self.build_flow_payloads(switch_count), mode, batch_size, max_workers)
+        flow_injector.print_report(report, len(self.spec["classes"]))
+        return report["failed_count"] == 0
@@ -0,0 +1,441 @@
+"""Flow injection engine shared by the flow rule modules.
+
+Flows are posted to ONOS in batches. In parallel mode the flows are grouped
+by deviceId and each device is pushed from a bounded thread pool, since
+flows for different devices are independent. Reconcile mode diffs the
+desired flows against what ONOS already has installed and applies only the
+delta.
+"""
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import onos_client
+
+MODES = ("batch", "parallel", "reconcile")
+
+# Defaults, overridable per call
+DEFAULT_MODE = os.getenv("FLOW_INJECT_MODE", "parallel")
+DEFAULT_BATCH_SIZE = int(os.getenv("FLOW_INJECT_BATCH_SIZE", "48"))
+DEFAULT_MAX_WORKERS = int(os.getenv("FLOW_INJECT_WORKERS", "8"))
+DEFAULT_CONVERGENCE_TIMEOUT = float(os.getenv("FLOW_CONVERGENCE_TIMEOUT", "10"))
+
+# Flows posted through the REST API are owned by this app in ONOS; only
+# these are considered for removal when reconciling
+MANAGED_APP_ID = os.getenv("FLOW_APP_ID", "org.onosproject.rest")
+
+
+def post_flow_batch(flows):
+    """POST a list of flows in one request and return per-flow results.
+
+    ONOS answers a batch with the ids of the installed flows in submission
+    order, so each entry of the response is matched back to its flow by
+    position and device.
+    """
+    try:
+        response = onos_client.get_client().post_flows(flows)
+    except requests.RequestException as e:
+        return [{"deviceId": flow["deviceId"], "success": False, "error": str(e)} for flow in flows]
+
+    if response.status_code not in [200, 201]:
+        error = f"Status: {response.status_code} {response.text}"
+        return [{"deviceId": flow["deviceId"], "success": False, "error": error} for flow in flows]
+
+    try:
+        installed = response.json().get("flows", [])
+    except ValueError:
+        installed = []
+
+    results = []
+    for i, flow in enumerate(flows):
+        entry = installed[i] if i < len(installed) else None
+        if entry and entry.get("deviceId", flow["deviceId"]) == flow["deviceId"]:
+            results.append({"deviceId": flow["deviceId"], "success": True, "flowId": entry.get("flowId")})
+        elif not installed:
+            # Accepted batch without a flow id listing
+            results.append({"deviceId": flow["deviceId"], "success": True, "flowId": None})
+        else:
+            results.append({"deviceId": flow["deviceId"], "success": False, "error": "Missing from ONOS response"})
+    return results
+
+
+def _post_in_batches(flows, batch_size):
+    """Post flows batch_size at a time, returning results and request count"""
+    results = []
+    requests_sent = 0
+    for start in range(0, len(flows), batch_size):
+        results.extend(post_flow_batch(flows[start:start + batch_size]))
+        requests_sent += 1
+    return results, requests_sent
+
+
+def _inject_device(flows, batch_size):
+    """Push one device's flows and time it"""
+    started = time.perf_counter()
+    results, requests_sent = _post_in_batches(flows, batch_size)
+    return results, requests_sent, (time.perf_counter() - started) * 1000
+
+
+def inject_flows(flows, mode=DEFAULT_MODE, batch_size=DEFAULT_BATCH_SIZE, max_workers=DEFAULT_MAX_WORKERS,
+                 track=False, convergence_timeout=DEFAULT_CONVERGENCE_TIMEOUT):
+    """Inject flow payloads into ONOS and return an injection report.
+
+    mode "batch" sends every flow in order, batch_size flows per POST.
+    mode "parallel" groups flows by deviceId and injects up to max_workers
+    devices at once. The report carries per-flow results (in the order of
+    flows), per-device counts and latency, and the total elapsed time.
+    mode "reconcile" is delegated to reconcile_flows(). With track set, the
+    report also holds the track_convergence() result for the posted flows.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown injection mode: {mode}")
+    if mode == "reconcile":
+        return reconcile_flows(flows, batch_size, max_workers, track, convergence_timeout)
+    batch_size = max(1, int(batch_size))
+    max_workers = max(1, int(max_workers))
+
+    # Group flow indices by device, keeping first-seen device order
+    by_device = OrderedDict()
+    for i, flow in enumerate(flows):
+        by_device.setdefault(flow["deviceId"], []).append(i)
+
+    results = [None] * len(flows)
+    devices = OrderedDict()
+    total_requests = 0
+    started = time.perf_counter()
+
+    if mode == "parallel":
+        workers = min(max_workers, len(by_device)) or 1
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flow-inject") as pool:
+            futures = {
+                device_id: pool.submit(_inject_device, [flows[i] for i in indices], batch_size)
+                for device_id, indices in by_device.items()
+            }
+            for device_id, future in futures.items():
+                device_results, requests_sent, latency_ms = future.result()
+                for i, result in zip(by_device[device_id], device_results):
+                    results[i] = result
+                devices[device_id] = {"requests": requests_sent, "latency_ms": round(latency_ms, 2)}
+                total_requests += requests_sent
+    else:
+        # Batches may span devices, so only the total time is known
+        results, total_requests = _post_in_batches(flows, batch_size)
+        for device_id in by_device:
+            devices[device_id] = {}
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    for device_id, indices in by_device.items():
+        succeeded = sum(1 for i in indices if results[i]["success"])
+        devices[device_id].update({
+            "flows": len(indices),
+            "success": succeeded,
+            "failed": len(indices) - succeeded
+        })
+
+    success_count = sum(1 for result in results if result["success"])
+    report = {
+        "mode": mode,
+        "batch_size": batch_size,
+        "max_workers": max_workers if mode == "parallel" else 1,
+        "total_flows": len(flows),
+        "success_count": success_count,
+        "failed_count": len(flows) - success_count,
+        "requests": total_requests,
+        "elapsed_ms": round(elapsed_ms, 2),
+        "devices": devices,
+        "results": results
+    }
+    if track:
+        report["convergence"] = track_convergence(results, started, convergence_timeout)
+    return report
+
+
+def track_convergence(results, started=None, timeout=DEFAULT_CONVERGENCE_TIMEOUT):
+    """Poll ONOS until the injected flows reach the ADDED state.
+
+    Only the flow ids from results are tracked. While several devices have
+    pending flows each round reads one ONOS-wide snapshot so all devices are
+    timed against the same poll; a single remaining device is queried on
+    its own. Polling is fast while flows keep
+    converging and backs off while they stall. Times are measured from
+    started (a time.perf_counter() value, default now), so passing the
+    injection start gives time-to-first-ADDED and time-to-all-ADDED per
+    device as seen from the moment the flows were submitted.
+    """
+    client = onos_client.get_client()
+    started = time.perf_counter() if started is None else started
+
+    pending = OrderedDict()
+    for result in results:
+        if result["success"] and result.get("flowId") is not None:
+            pending.setdefault(result["deviceId"], set()).add(str(result["flowId"]))
+    devices = OrderedDict(
+        (device_id, {"flows": len(ids), "added": 0, "first_added_ms": None, "all_added_ms": None})
+        for device_id, ids in pending.items()
+    )
+    tracked = sum(len(ids) for ids in pending.values())
+
+    polls = 0
+    interval = 0.02
+    deadline = time.perf_counter() + timeout
+    while any(pending.values()):
+        progressed = False
+        pending_devices = [device_id for device_id, ids in pending.items() if ids]
+        try:
+            snapshot = client.get_flows(pending_devices[0] if len(pending_devices) == 1 else None)
+            polls += 1
+        except (requests.RequestException, onos_client.OnosError):
+            snapshot = []
+        now_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        added_ids = {}
+        for flow in snapshot:
+            if flow.get("state") == "ADDED":
+                added_ids.setdefault(flow.get("deviceId"), set()).add(str(flow.get("id")))
+
+        for device_id in pending_devices:
+            ids = pending[device_id]
+            added = ids & added_ids.get(device_id, set())
+            if not added:
+                continue
+            progressed = True
+            ids.difference_update(added)
+            stats = devices[device_id]
+            stats["added"] += len(added)
+            if stats["first_added_ms"] is None:
+                stats["first_added_ms"] = now_ms
+            if not ids:
+                stats["all_added_ms"] = now_ms
+
+        if not any(pending.values()) or time.perf_counter() >= deadline:
+            break
+        interval = 0.02 if progressed else min(interval * 2, 0.5)
+        time.sleep(interval)
+
+    pending_count = sum(len(ids) for ids in pending.values())
+    first_times = [stats["first_added_ms"] for stats in devices.values() if stats["first_added_ms"] is not None]
+    all_times = [stats["all_added_ms"] for stats in devices.values()]
+    return {
+        "converged": pending_count == 0,
+        "timeout_s": timeout,
+        "tracked_flows": tracked,
+        "pending_flows": pending_count,
+        "polls": polls,
+        "time_to_first_added_ms": min(first_times) if first_times else None,
+        "time_to_all_added_ms": max(all_times) if all_times and pending_count == 0 else None,
+        "devices": devices
+    }
+
+
+def _canonical_value(value):
+    """Normalize a criterion/instruction value ('0x800' == 2048, '1' == 1)"""
+    if isinstance(value, str):
+        text = value.strip()
+        if text.lower().startswith("0x"):
+            try:
+                return int(text, 16)
+            except ValueError:
+                return text
+        return int(text) if text.isdigit() else text
+    return value
+
+
+def _canonical_entries(entries):
+    """Order-independent, hashable form of a criteria/instructions list"""
+    return tuple(sorted(
+        (tuple(sorted((key, _canonical_value(value)) for key, value in entry.items()))
+         for entry in entries),
+        key=repr
+    ))
+
+
+def selector_key(flow):
+    """Canonical, hashable form of a flow's selector criteria"""
+    return _canonical_entries((flow.get("selector") or {}).get("criteria", []))
+
+
+def match_key(flow):
+    """Identity of a flow rule in ONOS: device, priority and selector.
+
+    ONOS derives the flow id from these (not from the treatment), so posting
+    a flow with the same match key updates the installed rule in place.
+    """
+    return (flow["deviceId"], int(flow.get("priority", 0)), selector_key(flow))
+
+
+def flow_key(flow):
+    """Canonical key of a flow: its match key plus normalized treatment"""
+    instructions = flow.get("treatment", {}).get("instructions", [])
+    return match_key(flow) + (_canonical_entries(instructions),)
+
+
+def delete_flow_refs(flow_refs, batch_size=DEFAULT_BATCH_SIZE):
+    """Delete {"deviceId", "flowId"} entries, batch_size per DELETE request"""
+    client = onos_client.get_client()
+    batch_size = max(1, int(batch_size))
+    results = []
+    for start in range(0, len(flow_refs), batch_size):
+        batch = flow_refs[start:start + batch_size]
+        try:
+            response = client.delete_flows(batch)
+            error = None if response.status_code in [200, 204] else f"Status: {response.status_code} {response.text}"
+        except requests.RequestException as e:
+            error = str(e)
+        for ref in batch:
+            if error:
+                results.append({"deviceId": ref["deviceId"], "flowId": ref["flowId"], "success": False, "error": error})
+            else:
+                results.append({"deviceId": ref["deviceId"], "flowId": ref["flowId"], "success": True})
+    return results
+
+
+def reconcile_flows(flows, batch_size=DEFAULT_BATCH_SIZE, max_workers=DEFAULT_MAX_WORKERS,
+                    track=False, convergence_timeout=DEFAULT_CONVERGENCE_TIMEOUT):
+    """Apply only the difference between the desired flows and ONOS.
+
+    Installed flows are fetched once and compared by canonical key. Desired
+    flows already installed are left alone, flows whose match exists with a
+    different treatment are re-posted (an in-place update in ONOS), new
+    matches are added and managed flows no longer desired are deleted.
+    """
+    started = time.perf_counter()
+    installed = [
+        flow for flow in onos_client.get_client().get_flows()
+        if flow.get("appId") == MANAGED_APP_ID
+    ]
+    installed_keys = {flow_key(flow) for flow in installed}
+    installed_matches = {match_key(flow) for flow in installed}
+
+    desired = OrderedDict()
+    for flow in flows:
+        desired.setdefault(flow_key(flow), flow)
+    desired_matches = {match_key(flow) for flow in desired.values()}
+
+    to_post = [flow for key, flow in desired.items() if key not in installed_keys]
+    modified = sum(1 for flow in to_post if match_key(flow) in installed_matches)
+    to_remove = [
+        {"deviceId": flow["deviceId"], "flowId": flow["id"]}
+        for flow in installed if match_key(flow) not in desired_matches
+    ]
+
+    post_report = None
+    if to_post:
+        post_report = inject_flows(to_post, "parallel", batch_size, max_workers, track, convergence_timeout)
+    remove_results = delete_flow_refs(to_remove, batch_size) if to_remove else []
+
+    results = (post_report["results"] if post_report else []) + remove_results
+    failed_count = sum(1 for result in results if not result["success"])
+    report = {
+        "mode": "reconcile",
+        "batch_size": max(1, int(batch_size)),
+        "max_workers": max(1, int(max_workers)),
+        "desired_count": len(desired),
+        "installed_count": len(installed),
+        "added": len(to_post) - modified,
+        "modified": modified,
+        "removed": len(to_remove),
+        "unchanged": len(desired) - len(to_post),
+        "total_flows": len(to_post) + len(to_remove),
+        "success_count": len(results) - failed_count,
+        "failed_count": failed_count,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        "devices": post_report["devices"] if post_report else {},
+        "results": results
+    }
+    if track:
+        report["convergence"] = post_report["convergence"] if post_report else track_convergence([])
+    return report
+
+
+def clear_flows(app_id=MANAGED_APP_ID, method="application", device_id=None,
+                batch_size=DEFAULT_BATCH_SIZE, confirm_timeout=5.0):
+    """Bulk-remove the flows owned by app_id and confirm they are gone.
+
+    method "application" issues a single DELETE for the whole application;
+    method "ids" deletes the matched flow ids in batches and can be limited
+    to one device. ONOS is then polled until none of the matched flows are
+    listed any more, or confirm_timeout seconds pass.
+    """
+    if method not in ("application", "ids"):
+        raise ValueError(f"Unknown clear method: {method}")
+    if method == "application" and device_id:
+        raise ValueError("device_id requires the 'ids' clear method")
+
+    client = onos_client.get_client()
+    started = time.perf_counter()
+
+    errors = []
+    try:
+        matched = [
+            flow for flow in client.get_application_flows(app_id)
+            if not device_id or flow.get("deviceId") == device_id
+        ]
+    except (requests.RequestException, onos_client.OnosError) as e:
+        # Nothing is deleted without knowing which flows to delete
+        matched = []
+        errors.append(f"Listing the flows of {app_id} failed: {e}")
+    matched_ids = {flow["id"] for flow in matched}
+
+    if matched:
+        if method == "application":
+            try:
+                response = client.delete_application_flows(app_id)
+                if response.status_code not in [200, 204]:
+                    errors.append(f"Status: {response.status_code} {response.text}")
+            except requests.RequestException as e:
+                errors.append(str(e))
+        else:
+            refs = [{"deviceId": flow["deviceId"], "flowId": flow["id"]} for flow in matched]
+            errors = [result["error"] for result in delete_flow_refs(refs, batch_size) if not result["success"]]
+    delete_ms = (time.perf_counter() - started) * 1000
+
+    # Poll until ONOS no longer lists the matched flows; a failed poll is retried until the deadline
+    remaining = set(matched_ids)
+    confirm_error = None
+    interval = 0.05
+    deadline = time.perf_counter() + confirm_timeout
+    while remaining:
+        try:
+            remaining &= {flow["id"] for flow in client.get_application_flows(app_id)}
+            confirm_error = None
+        except (requests.RequestException, onos_client.OnosError) as e:
+            confirm_error = str(e)
+        if not remaining or errors or time.perf_counter() >= deadline:
+            break
+        time.sleep(interval)
+        interval = min(interval * 2, 0.5)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return {
+        "method": method,
+        "app_id": app_id,
+        "device_id": device_id,
+        "matched": len(matched_ids),
+        "removed": len(matched_ids) - len(remaining),
+        "remaining": len(remaining),
+        "confirmed": not remaining and not errors,
+        "errors": errors[:10],
+        "confirm_error": confirm_error,
+        "delete_ms": round(delete_ms, 2),
+        "confirm_ms": round(elapsed_ms - delete_ms, 2),
+        "elapsed_ms": round(elapsed_ms, 2)
+    }
+
+
+def print_report(report, flows_per_device):
+    """Print per-flow outcome lines in the flow rule modules' format"""
+    if report["mode"] == "reconcile":
+        print(f"Reconciled flows: {report['added']} added, {report['modified']} modified, "
+              f"{report['removed']} removed, {report['unchanged']} unchanged")
+        for result in report["results"]:
+            if not result["success"]:
+                print(f"Failed to reconcile flow on {result['deviceId']} | {result['error']}")
+        return
+    for i, result in enumerate(report["results"]):
+        flow_number = i % flows_per_device + 1
+        if result["success"]:
+            print(f"Flow {flow_number} added to {result['deviceId']}")
+        else:
+            print(f"Failed to add Flow {flow_number} to {result['deviceId']} | {result['error']}")
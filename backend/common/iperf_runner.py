@@ -0,0 +1,385 @@
+"""Parallel iperf measurements on Mininet hosts.
+
+Server and clients run as processes in the hosts' namespaces
+(`Node.popen`), not through the hosts' interactive shells, so any number
+of clients can run at once, every process can be waited on with a timeout
+and killed, and concurrent tests do not share a shell. Clients run all at
+once (measuring the hosts under contention) or in waves of a given size.
+
+Reports use iperf3's JSON output (`-J`) when iperf3 is installed and
+iperf2's CSV output (`-y C`) otherwise, instead of scraping the human
+readable text.
+"""
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# iperf3 where available (JSON reports), else iperf2; IPERF overrides the choice
+IPERF = os.getenv("IPERF") or ("iperf3" if shutil.which("iperf3") else "iperf")
+
+DEFAULT_PORT = 5001
+PORT_RANGE = range(5001, 6001)
+SERVER_START_TIMEOUT = 3.0
+CLIENT_GRACE = 10.0     # seconds a client may run past its duration before it is killed
+
+_ports_lock = threading.Lock()
+_ports_in_use = set()
+_next_port = itertools.cycle(PORT_RANGE)
+
+
+def allocate_port():
+    """A server port no other running test is using"""
+    with _ports_lock:
+        for _ in PORT_RANGE:
+            port = next(_next_port)
+            if port not in _ports_in_use:
+                _ports_in_use.add(port)
+                return port
+    raise RuntimeError("No free iperf server port")
+
+
+def release_port(port):
+    with _ports_lock:
+        _ports_in_use.discard(port)
+
+
+def csv_rows(output):
+    """Reports of iperf -y C output, in output order.
+
+    TCP lines are timestamp,src,src_port,dst,dst_port,id,interval,bytes,bps;
+    the UDP server report appends jitter_ms,lost,total,loss_pct,out_of_order.
+    """
+    rows = []
+    for line in output.splitlines():
+        fields = line.split(",")
+        if len(fields) < 9:
+            continue
+        start, _, end = fields[6].partition("-")
+        row = {
+            "start": float(start),
+            "end": float(end) if end else float(start),
+            "bandwidth_mbps": round(float(fields[8]) / 1e6, 2),
+            "transferred_mbytes": round(int(fields[7]) / 1e6, 2)
+        }
+        if len(fields) >= 13:
+            row.update({
+                "jitter_ms": float(fields[9]),
+                "lost": int(fields[10]),
+                "total": int(fields[11]),
+                "loss_pct": float(fields[12])
+            })
+        rows.append(row)
+    return rows
+
+
+def parse_csv_report(output):
+    """Final report of iperf -y C output (its last line)"""
+    rows = csv_rows(output)
+    if not rows:
+        return None
+    row = rows[-1]
+    report = {key: value for key, value in row.items() if key not in ("start", "end")}
+    report["duration_sec"] = round(row["end"] - row["start"], 2)
+    return report
+
+
+def parse_csv_intervals(output):
+    """Interval reports of iperf -y C -i output: every line but the final total"""
+    rows = csv_rows(output)
+    return rows[:-1] if len(rows) > 1 else rows
+
+
+def json_row(entry):
+    row = {
+        "start": round(entry["start"], 2),
+        "end": round(entry["end"], 2),
+        "bandwidth_mbps": round(entry["bits_per_second"] / 1e6, 2),
+        "transferred_mbytes": round(entry["bytes"] / 1e6, 2)
+    }
+    if "jitter_ms" in entry:
+        row.update({
+            "jitter_ms": round(entry["jitter_ms"], 3),
+            "lost": entry.get("lost_packets", 0),
+            "total": entry.get("packets", 0),
+            "loss_pct": round(entry.get("lost_percent", 0.0), 3)
+        })
+    return row
+
+
+def parse_json_report(output):
+    """Final report of iperf3 -J output, with its interval reports.
+
+    TCP uses the receiver's totals (end.sum_received); UDP uses end.sum,
+    which carries the server-side jitter and loss. Intervals come from the
+    server's own report when the client fetched it (--get-server-output),
+    as only the receiving side measures jitter and loss.
+    """
+    try:
+        data = json.loads(output)
+    except ValueError:
+        return None
+    if data.get("error"):
+        return {"error": data["error"]}
+    end = data.get("end") or {}
+    total = end.get("sum") if "jitter_ms" in (end.get("sum") or {}) else end.get("sum_received") or end.get("sum")
+    if not total:
+        return None
+    row = json_row(total)
+    report = {key: value for key, value in row.items() if key not in ("start", "end")}
+    report["duration_sec"] = round(row["end"] - row["start"], 2)
+
+    intervals = (data.get("server_output_json") or {}).get("intervals") or data.get("intervals") or []
+    report["intervals"] = [json_row(interval["sum"]) for interval in intervals if interval.get("sum")]
+    return report
+
+
+def parse_report(output):
+    """Final report of iperf3 JSON or iperf2 CSV output, None if there is none"""
+    return parse_json_report(output) if output.lstrip().startswith("{") else parse_csv_report(output)
+
+
+def listening_ports(output):
+    """Local ports in `ss -lnH` output"""
+    ports = set()
+    for line in output.splitlines():
+        for field in line.split():
+            address, _, port = field.rpartition(":")
+            if address and port.isdigit():
+                ports.add(int(port))
+                break   # the first address is the local one
+    return ports
+
+
+def kill(process, timeout=2.0):
+    """Terminate a process, killing it if it does not exit in time"""
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout)
+    except Exception:
+        process.kill()
+        process.wait()
+
+
+def stop(processes, timeout=2.0):
+    """Terminate processes together, killing those that do not exit in time"""
+    running = [process for process in processes if process.poll() is None]
+    for process in running:
+        process.terminate()
+    deadline = time.monotonic() + timeout
+    for process in running:
+        try:
+            process.wait(max(0.0, deadline - time.monotonic()))
+        except Exception:
+            process.kill()
+            process.wait()
+
+
+def read_output(process):
+    """Remaining stdout of an exited process"""
+    try:
+        output = process.communicate(timeout=1.0)[0]
+    except Exception:
+        return ""
+    return output.decode(errors="replace") if isinstance(output, bytes) else (output or "")
+
+
+class IperfTest:
+    """iperf servers on server and clients on hosts.
+
+    run() starts the servers, runs the clients (all at once, or wave_size
+    at a time), stops the servers and returns per-host reports plus
+    timings; progress(host_name, report, completed, total) is called as
+    each client finishes. cancel() kills everything still running.
+
+    UDP and iperf3 clients each get their own server port, so every client
+    has a server report of its own; TCP clients of iperf2 share one server.
+    With interval (seconds), reports carry "intervals" as measured by the
+    receiving side: throughput, and for UDP jitter and loss.
+    """
+
+    def __init__(self, server, hosts, duration=2, wave_size=None, udp=False, bandwidth=None,
+                 port=None, progress=None, tool=None, interval=None):
+        self.server = server
+        self.hosts = list(hosts)
+        self.duration = duration
+        self.wave_size = wave_size or len(self.hosts) or 1
+        self.udp = udp
+        self.bandwidth = bandwidth
+        self.port = port
+        self.progress = progress
+        self.tool = tool or IPERF
+        self.interval = interval
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = set()
+
+    @property
+    def iperf3(self):
+        return os.path.basename(self.tool).startswith("iperf3")
+
+    @property
+    def server_per_client(self):
+        return self.iperf3 or self.udp
+
+    @property
+    def server_intervals(self):
+        """iperf2 reports UDP intervals with jitter and loss on the server only"""
+        return bool(self.interval) and self.udp and not self.iperf3
+
+    def _spawn(self, node, args):
+        with self._lock:
+            if self.cancelled.is_set():
+                raise RuntimeError("Test cancelled")
+            process = node.popen(args)
+            self._processes.add(process)
+        return process
+
+    def _forget(self, process):
+        with self._lock:
+            self._processes.discard(process)
+
+    def start_server(self, port):
+        """Start a server process on port (see wait_listening)"""
+        args = [self.tool, "-s", "-p", str(port)]
+        if self.udp and not self.iperf3:
+            args.append("-u")
+        if self.server_intervals:
+            # Line buffered so the reports are not lost when the server is terminated
+            args = ["stdbuf", "-oL"] + args + ["-y", "C", "-i", str(self.interval)]
+        return self._spawn(self.server, args)
+
+    def wait_listening(self, servers):
+        """Wait until every server ({port: process}) listens on its port (iperf3 always on TCP)"""
+        protocol = "-u" if self.udp and not self.iperf3 else "-t"
+        pending = dict(servers)
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            for port, process in pending.items():
+                if process.poll() is not None:
+                    raise RuntimeError(f"iperf server on {self.server.name} port {port} exited with {process.returncode}")
+            # One probe for all servers
+            probe = self.server.popen(["ss", "-lnH", protocol])
+            listening = probe.communicate()[0]
+            listening = listening.decode(errors="replace") if isinstance(listening, bytes) else listening
+            ports = listening_ports(listening or "")
+            pending = {port: process for port, process in pending.items() if port not in ports}
+            if not pending:
+                return
+            time.sleep(0.05)
+        raise RuntimeError(f"iperf server on {self.server.name} did not start listening on port(s) "
+                           f"{', '.join(str(port) for port in sorted(pending))}")
+
+    def client_args(self, port):
+        args = [self.tool, "-c", self.server.IP(), "-p", str(port), "-t", str(self.duration)]
+        args += ["-J"] if self.iperf3 else ["-y", "C"]
+        if self.interval:
+            args += ["-i", str(self.interval)]
+            if self.iperf3 and self.udp:
+                args.append("--get-server-output")
+        if self.udp:
+            args += ["-u", "-b", str(self.bandwidth or "1M")]
+        return args
+
+    def run_client(self, host, port):
+        process = self._spawn(host, self.client_args(port))
+        try:
+            output, errors = process.communicate(timeout=self.duration + CLIENT_GRACE)
+        except Exception:
+            kill(process)
+            return {"error": "timed out" if not self.cancelled.is_set() else "cancelled"}
+        finally:
+            self._forget(process)
+
+        output = output.decode(errors="replace") if isinstance(output, bytes) else output
+        report = parse_report(output or "")
+        if report is None:
+            if self.cancelled.is_set():
+                return {"error": "cancelled"}
+            errors = errors.decode(errors="replace") if isinstance(errors, bytes) else errors
+            return {"error": (errors or "").strip() or f"no iperf report (exit {process.returncode})"}
+        if self.interval and not self.iperf3 and not self.udp:
+            report["intervals"] = parse_csv_intervals(output)
+        return report
+
+    def run(self):
+        started = time.perf_counter()
+        server_started = None
+        count = len(self.hosts) if self.server_per_client else 1
+        allocated = self.port is None
+        ports, servers = [], []
+        results, waves = {}, 0
+        try:
+            for index in range(count):
+                ports.append(allocate_port() if allocated else self.port + index)
+            try:
+                for port in ports:
+                    servers.append(self.start_server(port))
+                self.wait_listening(dict(zip(ports, servers)))
+                server_started = time.perf_counter()
+                host_ports = {host.name: ports[index if self.server_per_client else 0]
+                              for index, host in enumerate(self.hosts)}
+
+                for offset in range(0, len(self.hosts), self.wave_size):
+                    if self.cancelled.is_set():
+                        break
+                    wave = self.hosts[offset:offset + self.wave_size]
+                    waves += 1
+                    with ThreadPoolExecutor(max_workers=len(wave)) as pool:
+                        futures = {pool.submit(self.run_client, host, host_ports[host.name]): host for host in wave}
+                        for future in as_completed(futures):
+                            host = futures[future]
+                            try:
+                                results[host.name] = future.result()
+                            except Exception as e:
+                                results[host.name] = {"error": str(e)}
+                            if self.progress:
+                                self.progress(host.name, results[host.name], len(results), len(self.hosts))
+            finally:
+                stopping = time.perf_counter()
+                stop(servers)
+                for process in servers:
+                    self._forget(process)
+                stopped = time.perf_counter()
+        finally:
+            if allocated:
+                for port in ports:
+                    release_port(port)
+
+        if self.server_intervals:
+            outputs = {port: read_output(process) for port, process in zip(ports, servers)}
+            for host in self.hosts:
+                report = results.get(host.name)
+                if report is not None and "error" not in report:
+                    report["intervals"] = parse_csv_intervals(outputs.get(host_ports[host.name], ""))
+        finished = time.perf_counter()
+        server_started = server_started or stopping
+
+        return {
+            "results": results,
+            "cancelled": self.cancelled.is_set(),
+            "timing": {
+                "wall_clock_s": round(finished - started, 3),
+                "server_start_ms": round((server_started - started) * 1000, 1),
+                "clients_s": round(stopping - server_started, 3),
+                "teardown_ms": round((stopped - stopping) * 1000, 1),
+                "waves": waves,
+                "wave_size": self.wave_size,
+                "clients": len(self.hosts),
+                "servers": len(servers),
+                "duration_s": self.duration,
+                "tool": self.tool
+            }
+        }
+
+    def cancel(self):
+        """Kill the servers and all running clients"""
+        self.cancelled.set()
+        with self._lock:
+            processes = list(self._processes)
+        stop(processes)
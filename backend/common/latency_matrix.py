@@ -0,0 +1,214 @@
+"""All-pairs latency matrix.
+
+net.pingAll() sends one ping after another, pair by pair. Here every
+source host runs one shell (`Node.popen`) that backgrounds a ping to each
+destination at once, so a full mesh takes about one ping run (count x
+interval) however many hosts there are. Each ping summary line is
+prefixed with its destination, and the summaries are parsed into N x N
+NumPy arrays of RTT and loss, aggregated per subnet pair.
+"""
+import ipaddress
+import math
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List
+import numpy as np
+from test_results import PingReport
+
+TRANSMITTED = re.compile(r"^(\S+) (\d+) packets transmitted, (\d+) (?:packets )?received")
+RTT = re.compile(r"^(\S+) (?:rtt|round-trip) min/avg/max/(?:mdev|stddev) = [\d.]+/([\d.]+)/")
+WAIT_GRACE = 5.0    # seconds a source may run past the ping deadline before it is killed
+
+
+def ping_script(targets, count, interval, deadline):
+    """sh script pinging all targets in the background, each summary prefixed with its target"""
+    pings = " ".join(
+        f"(ping -n -q -c {count} -i {interval} -w {deadline} {ip} 2>&1 | sed 's/^/{ip} /') &" for ip in targets
+    )
+    return f"{pings} wait"
+
+
+def parse_summaries(output):
+    """destination ip -> (sent, received, avg rtt ms or None)"""
+    summaries = {}
+    for line in output.splitlines():
+        match = TRANSMITTED.match(line)
+        if match:
+            _, rtt = summaries.get(match.group(1), (None, None))
+            summaries[match.group(1)] = ((int(match.group(2)), int(match.group(3))), rtt)
+            continue
+        match = RTT.match(line)
+        if match:
+            counts, _ = summaries.get(match.group(1), (None, None))
+            summaries[match.group(1)] = (counts, float(match.group(2)))
+    return {ip: (counts[0], counts[1], rtt) for ip, (counts, rtt) in summaries.items() if counts is not None}
+
+
+def cell(value, digits=3):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+@dataclass
+class LatencyMatrix(PingReport):
+    """RTT (ms) and loss (%) from every host (row) to every other host (column).
+
+    Cells without a reply hold NaN RTT; the diagonal is NaN in both.
+    """
+    names: List[str] = field(default_factory=list)
+    ips: List[str] = field(default_factory=list)
+    subnets: List[str] = field(default_factory=list)
+    rtt_ms: np.ndarray = field(default=None, repr=False)
+    loss: np.ndarray = field(default=None, repr=False)
+    count: int = 0
+    elapsed_s: float = 0.0
+    cancelled: bool = False
+
+    def subnet_summary(self):
+        """Average/max RTT and loss for every (source subnet, destination subnet)"""
+        labels = np.array(self.subnets)
+        off_diagonal = ~np.eye(len(self.names), dtype=bool)
+        summary = []
+        for source in dict.fromkeys(self.subnets):
+            for destination in dict.fromkeys(self.subnets):
+                mask = np.outer(labels == source, labels == destination) & off_diagonal
+                if not mask.any():
+                    continue
+                rtts = self.rtt_ms[mask]
+                replied = rtts[~np.isnan(rtts)]
+                losses = self.loss[mask]
+                measured = losses[~np.isnan(losses)]
+                summary.append({
+                    "source": source,
+                    "destination": destination,
+                    "pairs": int(mask.sum()),
+                    "avg_rtt_ms": round(float(replied.mean()), 3) if replied.size else None,
+                    "max_rtt_ms": round(float(replied.max()), 3) if replied.size else None,
+                    "loss_pct": round(float(measured.mean()), 2) if measured.size else None
+                })
+        return summary
+
+    def to_dict(self):
+        return {
+            "hosts": self.hosts,
+            "sent": self.sent,
+            "received": self.received,
+            "dropped": self.dropped,
+            "loss_pct": self.loss_pct,
+            "names": self.names,
+            "ips": self.ips,
+            "subnets": self.subnets,
+            "rtt_ms": [[cell(value) for value in row] for row in self.rtt_ms],
+            "loss": [[cell(value, 2) for value in row] for row in self.loss],
+            "subnet_summary": self.subnet_summary(),
+            "count": self.count,
+            "elapsed_s": self.elapsed_s,
+            "cancelled": self.cancelled
+        }
+
+    def format(self):
+        lines = [f"*** Results: {self.loss_pct:g}% dropped ({self.received}/{self.sent} received) "
+                 f"in {self.elapsed_s:.2f}s",
+                 f"{'Source':<10} {'Destination':<12} {'Pairs':<6} {'Avg RTT (ms)':<14} {'Max RTT (ms)':<14} {'Loss (%)'}"]
+        for entry in self.subnet_summary():
+            avg = f"{entry['avg_rtt_ms']:.3f}" if entry["avg_rtt_ms"] is not None else "n/a"
+            peak = f"{entry['max_rtt_ms']:.3f}" if entry["max_rtt_ms"] is not None else "n/a"
+            loss = f"{entry['loss_pct']:.2f}" if entry["loss_pct"] is not None else "n/a"
+            lines.append(f"{entry['source']:<10} {entry['destination']:<12} {entry['pairs']:<6} "
+                         f"{avg:<14} {peak:<14} {loss}")
+        return "\n".join(lines)
+
+
+class LatencyProbe:
+    """Pings between all hosts, every source pinging all destinations at once.
+
+    subnets maps a label to a network ("student": "10.0.0.0/24"); hosts
+    outside all of them are labelled by their /24. cancel() stops waiting
+    for the sources; their pings end by themselves within the deadline.
+    """
+
+    def __init__(self, hosts, count=3, interval=0.2, timeout=1.0, subnets=None):
+        self.hosts = list(hosts)
+        self.count = count
+        self.interval = interval
+        self.timeout = timeout
+        self.subnets = {label: ipaddress.ip_network(network) for label, network in (subnets or {}).items()}
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = []
+
+    def subnet(self, ip):
+        address = ipaddress.ip_address(ip)
+        for label, network in self.subnets.items():
+            if address in network:
+                return label
+        return str(ipaddress.ip_network(f"{ip}/24", strict=False))
+
+    @property
+    def deadline(self):
+        """Seconds after which a ping gives up on missing replies"""
+        return int(math.ceil(self.count * self.interval + self.timeout))
+
+    def run(self):
+        started = time.perf_counter()
+        ips = [host.IP() for host in self.hosts]
+        index = {ip: position for position, ip in enumerate(ips)}
+        size = len(self.hosts)
+
+        # All sources start before any is waited on
+        with self._lock:
+            if not self.cancelled.is_set():
+                for source, host in enumerate(self.hosts):
+                    targets = [ip for position, ip in enumerate(ips) if position != source]
+                    self._processes.append(host.popen(["sh", "-c", ping_script(targets, self.count, self.interval, self.deadline)]))
+            processes = list(self._processes)
+
+        sent = np.zeros((size, size), dtype=np.int64)
+        received = np.zeros((size, size), dtype=np.int64)
+        rtt = np.full((size, size), np.nan)
+        for source, process in enumerate(processes):
+            try:
+                output = process.communicate(timeout=self.deadline + WAIT_GRACE)[0]
+            except Exception:
+                process.kill()
+                output = process.communicate()[0]
+            output = output.decode(errors="replace") if isinstance(output, bytes) else (output or "")
+
+            # A destination without a summary counts as unanswered
+            sent[source, :] = self.count
+            for ip, (transmitted, replies, average) in parse_summaries(output).items():
+                if ip in index:
+                    sent[source, index[ip]] = transmitted
+                    received[source, index[ip]] = replies
+                    if replies and average is not None:
+                        rtt[source, index[ip]] = average
+        np.fill_diagonal(sent, 0)
+        np.fill_diagonal(received, 0)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            loss = np.where(sent > 0, (sent - received) * 100.0 / sent, np.nan)
+        total_sent, total_received = int(sent.sum()), int(received.sum())
+        return LatencyMatrix(
+            hosts=size,
+            sent=total_sent,
+            received=total_received,
+            loss_pct=round((total_sent - total_received) * 100.0 / total_sent, 2) if total_sent else 0.0,
+            names=[host.name for host in self.hosts],
+            ips=ips,
+            subnets=[self.subnet(ip) for ip in ips],
+            rtt_ms=rtt,
+            loss=loss,
+            count=self.count,
+            elapsed_s=round(time.perf_counter() - started, 3),
+            cancelled=self.cancelled.is_set()
+        )
+
+    def cancel(self):
+        """Terminate every source shell"""
+        with self._lock:
+            self.cancelled.set()
+            processes = list(self._processes)
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
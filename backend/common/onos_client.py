@@ -0,0 +1,141 @@
+"""Shared ONOS REST client.
+
+One pooled, keep-alive requests.Session is shared by the web routes and the
+flow rule modules so every ONOS call reuses open connections, has a bounded
+timeout and retries transient failures with backoff.
+"""
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
+
+# ONOS configuration - can be overridden by environment variables
+ONOS_IP = os.getenv("ONOS_IP", "127.0.0.1")
+ONOS_PORT = os.getenv("ONOS_PORT", "8181")
+ONOS_USERNAME = os.getenv("ONOS_USERNAME", "onos")
+ONOS_PASSWORD = os.getenv("ONOS_PASSWORD", "rocks")
+
+# Connection pool and retry settings
+POOL_SIZE = int(os.getenv("ONOS_POOL_SIZE", "16"))
+RETRIES = int(os.getenv("ONOS_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.getenv("ONOS_BACKOFF", "0.3"))
+
+# (connect, read) timeouts in seconds per endpoint
+TIMEOUTS = {
+    "default": (3, 10),
+    "devices": (3, 5),
+    "ports": (3, 10),
+    "links": (3, 5),
+    "applications": (3, 5),
+    "statistics": (3, 10),
+    "flows": (3, 15),
+    "flows_write": (3, 30),
+}
+
+
+class OnosError(Exception):
+    """Raised when ONOS answers with an unexpected HTTP status"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class OnosClient:
+    """Pooled ONOS REST client with per-endpoint timeouts and retries"""
+
+    def __init__(self, ip=ONOS_IP, port=ONOS_PORT, username=ONOS_USERNAME,
+                 password=ONOS_PASSWORD, pool_size=POOL_SIZE, retries=RETRIES,
+                 backoff_factor=BACKOFF_FACTOR):
+        self.ip = ip
+        self.port = port
+        self.username = username
+        self.base_url = f"http://{ip}:{port}/onos/v1"
+
+        # Idempotent methods are retried on 5xx; POSTs only on connect errors
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.auth = HTTPBasicAuth(username, password)
+        self.session.headers.update({"Accept": "application/json"})
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, path, endpoint="default", **kwargs):
+        """Send a request to /onos/v1/<path> with the endpoint's timeout"""
+        kwargs.setdefault("timeout", TIMEOUTS.get(endpoint, TIMEOUTS["default"]))
+        return self.session.request(method, f"{self.base_url}/{path.lstrip('/')}", **kwargs)
+
+    def get_json(self, path, endpoint="default", key=None):
+        """GET a resource and return its JSON body (or one key of it)"""
+        response = self.request("GET", path, endpoint)
+        if response.status_code != 200:
+            raise OnosError(f"GET {path} failed with HTTP {response.status_code}", response.status_code)
+        data = response.json()
+        return data.get(key, []) if key else data
+
+    def get_devices(self):
+        """List of devices known to ONOS"""
+        return self.get_json("devices", "devices", "devices")
+
+    def get_flows(self, device_id=None):
+        """All flows, or the flows of one device"""
+        path = f"flows/{device_id}" if device_id else "flows"
+        return self.get_json(path, "flows", "flows")
+
+    def get_ports(self, device_id=None):
+        """Ports of one device, or of every device"""
+        if device_id:
+            return self.get_json(f"devices/{device_id}/ports", "ports", "ports")
+        return self.get_json("devices/ports", "ports", "ports")
+
+    def get_links(self):
+        """Infrastructure links between devices"""
+        return self.get_json("links", "links", "links")
+
+    def get_applications(self):
+        """Installed ONOS applications"""
+        return self.get_json("applications", "applications", "applications")
+
+    def get_port_statistics(self, device_id=None):
+        """Per-device port counters from /statistics/ports"""
+        path = f"statistics/ports/{device_id}" if device_id else "statistics/ports"
+        return self.get_json(path, "statistics", "statistics")
+
+    def post_flows(self, flows):
+        """POST a list of flow payloads in a single request"""
+        return self.request("POST", "flows", "flows_write", json={"flows": flows})
+
+    def delete_flows(self, flow_refs):
+        """DELETE a list of {"deviceId", "flowId"} entries in a single request"""
+        return self.request("DELETE", "flows", "flows_write", json={"flows": flow_refs})
+
+    def get_application_flows(self, app_id):
+        """Flows installed on behalf of one application"""
+        return self.get_json(f"flows/application/{app_id}", "flows", "flows")
+
+    def delete_application_flows(self, app_id):
+        """DELETE every flow owned by one application"""
+        return self.request("DELETE", f"flows/application/{app_id}", "flows_write")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide shared client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OnosClient()
+    return _client
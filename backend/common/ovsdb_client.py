@@ -0,0 +1,301 @@
+"""Shared OVSDB client.
+
+One long-lived JSON-RPC connection (RFC 7047) to the local ovsdb-server
+over its unix socket replaces spawning `sudo ovs-vsctl` per operation: a
+transaction carries any number of operations in one round trip, and
+monitors push table changes instead of the tables being polled.
+
+The socket is only writable by root, like ovs-vsctl itself; the web
+application and the topologies already run under sudo.
+"""
+import codecs
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import Future, TimeoutError
+
+OVSDB_SOCKET = os.getenv("OVSDB_SOCKET", "/var/run/openvswitch/db.sock")
+OVSDB_DATABASE = "Open_vSwitch"
+OVSDB_TIMEOUT = float(os.getenv("OVSDB_TIMEOUT", "10"))
+
+logger = logging.getLogger(__name__)
+
+
+class OvsdbError(Exception):
+    """Raised when ovsdb-server is unreachable or rejects a request"""
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details
+
+
+# OVSDB JSON encoding of references, sets and maps
+def uuid(value):
+    return ["uuid", value]
+
+
+def named_uuid(name):
+    return ["named-uuid", name]
+
+
+def ovs_set(values):
+    return ["set", list(values)]
+
+
+def ovs_map(values):
+    return ["map", [[key, item] for key, item in values.items()]]
+
+
+def value(data):
+    """Plain Python value of an OVSDB JSON atom, set or map"""
+    if isinstance(data, list) and len(data) == 2 and isinstance(data[0], str):
+        kind, content = data
+        if kind in ("uuid", "named-uuid"):
+            return content
+        if kind == "set":
+            return [value(item) for item in content]
+        if kind == "map":
+            return {value(key): value(item) for key, item in content}
+    return data
+
+
+def rows(result):
+    """Decoded rows of a select operation result"""
+    return [{column: value(cell) for column, cell in row.items()} for row in result.get("rows", [])]
+
+
+# Transaction operations
+def select(table, columns=None, where=None):
+    operation = {"op": "select", "table": table, "where": where or []}
+    if columns is not None:
+        operation["columns"] = list(columns)
+    return operation
+
+
+def insert(table, row, uuid_name=None):
+    operation = {"op": "insert", "table": table, "row": row}
+    if uuid_name is not None:
+        operation["uuid-name"] = uuid_name
+    return operation
+
+
+def update(table, where, row):
+    return {"op": "update", "table": table, "where": where, "row": row}
+
+
+def delete(table, where=None):
+    return {"op": "delete", "table": table, "where": where or []}
+
+
+def mutate(table, where, mutations):
+    return {"op": "mutate", "table": table, "where": where, "mutations": mutations}
+
+
+class OvsdbClient:
+    """Persistent JSON-RPC connection to ovsdb-server.
+
+    Requests from any thread share the connection; replies are matched by
+    id on a reader thread. A broken connection is re-opened by the next
+    request, and active monitors are re-registered on it.
+    """
+
+    def __init__(self, path=OVSDB_SOCKET, database=OVSDB_DATABASE, timeout=OVSDB_TIMEOUT):
+        self.path = path
+        self.database = database
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._sock = None
+        self._pending = {}      # request id -> (socket, Future)
+        self._monitors = {}     # monitor id -> (monitored tables, callback)
+        self._stats = {"connects": 0, "requests": 0, "transactions": 0, "operations": 0, "notifications": 0, "errors": 0}
+
+    def _connect(self):
+        """Open the socket and start its reader (lock held)"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            raise OvsdbError(f"Cannot connect to ovsdb-server at {self.path}: {e}")
+        self._sock = sock
+        self._stats["connects"] += 1
+        threading.Thread(target=self._read_loop, args=(sock,), name="ovsdb-reader", daemon=True).start()
+
+        # Monitors live on the connection, so a new one needs them again
+        for monitor_id, (tables, callback) in self._monitors.items():
+            future = self._send(sock, "monitor", [self.database, monitor_id, tables])
+            future.add_done_callback(lambda done, callback=callback: done.exception() or self._notify(callback, done.result()))
+
+    def _send(self, sock, method, params):
+        """Write one request on sock and return the Future of its reply (lock held)"""
+        request_id = next(self._ids)
+        future = Future()
+        self._pending[request_id] = (sock, future)
+        try:
+            sock.sendall(json.dumps({"method": method, "params": params, "id": request_id}).encode())
+        except OSError:
+            del self._pending[request_id]
+            raise
+        return future
+
+    def _read_loop(self, sock):
+        decoder = json.JSONDecoder()
+        text = codecs.getincrementaldecoder("utf-8")()
+        buffer = ""
+        try:
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                buffer += text.decode(data)
+                while True:
+                    buffer = buffer.lstrip()
+                    if not buffer:
+                        break
+                    try:
+                        message, end = decoder.raw_decode(buffer)
+                    except ValueError:
+                        break   # message not complete yet
+                    buffer = buffer[end:]
+                    self._dispatch(sock, message)
+        except OSError:
+            pass
+        finally:
+            self._disconnected(sock)
+
+    def _dispatch(self, sock, message):
+        method = message.get("method")
+        if method == "echo":
+            # Keep-alive probe from the server
+            with self._lock:
+                try:
+                    sock.sendall(json.dumps({"result": message.get("params"), "error": None, "id": message.get("id")}).encode())
+                except OSError:
+                    pass
+        elif method in ("update", "update2"):
+            monitor_id, updates = message["params"][0], message["params"][1]
+            with self._lock:
+                self._stats["notifications"] += 1
+                monitor = self._monitors.get(monitor_id)
+            if monitor is not None:
+                self._notify(monitor[1], updates)
+        elif method is None:
+            with self._lock:
+                pending = self._pending.pop(message.get("id"), None)
+            if pending is None:
+                return
+            if message.get("error") is not None:
+                pending[1].set_exception(OvsdbError(f"OVSDB request failed: {message['error']}", message["error"]))
+            else:
+                pending[1].set_result(message.get("result"))
+
+    def _notify(self, callback, updates):
+        try:
+            callback(updates)
+        except Exception:
+            logger.exception("OVSDB monitor callback failed")
+
+    def _disconnected(self, sock):
+        with self._lock:
+            if self._sock is sock:
+                self._sock = None
+            failed = [request_id for request_id, (owner, _) in self._pending.items() if owner is sock]
+            futures = [self._pending.pop(request_id)[1] for request_id in failed]
+        try:
+            sock.close()
+        except OSError:
+            pass
+        for future in futures:
+            future.set_exception(OvsdbError("Connection to ovsdb-server closed"))
+
+    def request(self, method, params, timeout=None):
+        """Send a JSON-RPC request and wait for its result"""
+        with self._lock:
+            self._stats["requests"] += 1
+            for attempt in range(2):
+                if self._sock is None:
+                    self._connect()
+                sock = self._sock
+                try:
+                    future = self._send(sock, method, params)
+                    break
+                except OSError as e:
+                    # Stale connection (ovsdb-server restarted): reconnect once
+                    self._sock = None
+                    sock.close()
+                    if attempt:
+                        self._stats["errors"] += 1
+                        raise OvsdbError(f"Cannot send to ovsdb-server: {e}")
+        try:
+            return future.result(timeout or self.timeout)
+        except TimeoutError:
+            with self._lock:
+                self._pending = {key: entry for key, entry in self._pending.items() if entry[1] is not future}
+                self._stats["errors"] += 1
+            raise OvsdbError(f"OVSDB {method} timed out after {timeout or self.timeout}s")
+
+    def transact(self, *operations, timeout=None):
+        """Run the operations as one atomic transaction and return their results"""
+        with self._lock:
+            self._stats["transactions"] += 1
+            self._stats["operations"] += len(operations)
+        results = self.request("transact", [self.database, *operations], timeout)
+        errors = [result for result in results if isinstance(result, dict) and result.get("error")]
+        if errors:
+            with self._lock:
+                self._stats["errors"] += 1
+            error = errors[0]
+            raise OvsdbError(f"OVSDB transaction failed: {error['error']}: {error.get('details', '')}".rstrip(": "), results)
+        return results
+
+    def select(self, table, columns=None, where=None):
+        """Decoded rows of one table"""
+        return rows(self.transact(select(table, columns, where))[0])
+
+    def monitor(self, tables, callback, monitor_id):
+        """Watch tables ({table: [columns]}) and call callback(table_updates) on changes.
+
+        Returns the initial contents, or None if monitor_id is already
+        registered. callback runs on the reader thread and must not wait
+        for other requests on this client.
+        """
+        params = {table: {"columns": list(columns)} for table, columns in tables.items()}
+        with self._lock:
+            if monitor_id in self._monitors:
+                return None
+            if self._sock is None:
+                self._connect()
+            try:
+                future = self._send(self._sock, "monitor", [self.database, monitor_id, params])
+            except OSError as e:
+                raise OvsdbError(f"Cannot send to ovsdb-server: {e}")
+            # Registered with the request so no update sent right after the reply is missed
+            self._monitors[monitor_id] = (params, callback)
+        try:
+            return future.result(self.timeout)
+        except (OvsdbError, TimeoutError) as e:
+            with self._lock:
+                self._monitors.pop(monitor_id, None)
+            raise e if isinstance(e, OvsdbError) else OvsdbError(f"OVSDB monitor timed out after {self.timeout}s")
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, connected=self._sock is not None, monitors=len(self._monitors), pending=len(self._pending))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide shared client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OvsdbClient()
+    return _client
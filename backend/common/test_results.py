@@ -0,0 +1,213 @@
+"""Typed results of the topology test functions.
+
+run_iperf_multithreaded_tcp(), udp_test() and ping_all() return these
+objects instead of printing; format_report() renders them as the text the
+Mininet CLI prints, and to_dict() as the JSON the web application serves.
+"""
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+GROUPS = ("student", "faculty")
+
+
+def host_group(host_name):
+    """student (h<N>s) or faculty (h<N>f)"""
+    return "student" if host_name.endswith("s") else "faculty"
+
+
+def mean(values):
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+
+@dataclass
+class IperfMeasurement:
+    """One iperf client run from a host to the server"""
+    host: str
+    group: str
+    request: int = 1
+    bandwidth_mbps: float = 0.0
+    transferred_mbytes: float = 0.0
+    duration_sec: float = 0.0
+    latency_ms: Optional[float] = None
+    jitter_ms: Optional[float] = None
+    loss_pct: Optional[float] = None
+    error: Optional[str] = None
+    intervals: List[dict] = field(default_factory=list)
+
+    @classmethod
+    def from_report(cls, host_name, report, request=1, latency_ms=None):
+        """From an iperf_runner client report"""
+        keys = ("bandwidth_mbps", "transferred_mbytes", "duration_sec", "jitter_ms", "loss_pct", "error", "intervals")
+        return cls(host=host_name, group=host_group(host_name), request=request, latency_ms=latency_ms,
+                   **{key: report[key] for key in keys if key in report})
+
+
+@dataclass
+class GroupSummary:
+    """Averages over the successful measurements of a group"""
+    group: str
+    tests: int
+    avg_bandwidth_mbps: float
+    max_bandwidth_mbps: float
+    min_bandwidth_mbps: float
+    avg_latency_ms: Optional[float] = None
+    avg_jitter_ms: Optional[float] = None
+    avg_loss_pct: Optional[float] = None
+
+
+@dataclass
+class IperfReport:
+    """All measurements of a TCP or UDP test to one server"""
+    protocol: str
+    server: str
+    measurements: List[IperfMeasurement] = field(default_factory=list)
+    wall_clock_s: float = 0.0
+    cancelled: bool = False
+
+    def summary(self, group=None):
+        """GroupSummary of one group (all hosts if None), None without results"""
+        measured = [m for m in self.measurements if m.error is None and (group is None or m.group == group)]
+        if not measured:
+            return None
+        bandwidths = [m.bandwidth_mbps for m in measured]
+        return GroupSummary(
+            group=group or "all",
+            tests=len(measured),
+            avg_bandwidth_mbps=sum(bandwidths) / len(bandwidths),
+            max_bandwidth_mbps=max(bandwidths),
+            min_bandwidth_mbps=min(bandwidths),
+            avg_latency_ms=mean(m.latency_ms for m in measured),
+            avg_jitter_ms=mean(m.jitter_ms for m in measured),
+            avg_loss_pct=mean(m.loss_pct for m in measured)
+        )
+
+    def groups(self) -> Dict[str, Optional[GroupSummary]]:
+        return {group: self.summary(group) for group in GROUPS}
+
+    def timeline(self):
+        """Totals per interval over all hosts: summed throughput, mean jitter, loss over all packets"""
+        slots = {}
+        for m in self.measurements:
+            for interval in m.intervals:
+                key = (m.request, interval["start"], interval["end"])
+                slot = slots.setdefault(key, {"hosts": 0, "bandwidth_mbps": 0.0, "jitter": [], "lost": 0, "total": 0})
+                slot["hosts"] += 1
+                slot["bandwidth_mbps"] += interval["bandwidth_mbps"]
+                slot["jitter"].append(interval.get("jitter_ms"))
+                slot["lost"] += interval.get("lost", 0)
+                slot["total"] += interval.get("total", 0)
+        return [
+            {
+                "request": request,
+                "start": start,
+                "end": end,
+                "hosts": slot["hosts"],
+                "bandwidth_mbps": round(slot["bandwidth_mbps"], 2),
+                "jitter_ms": mean(slot["jitter"]),
+                "loss_pct": round(slot["lost"] * 100.0 / slot["total"], 3) if slot["total"] else None
+            }
+            for (request, start, end), slot in sorted(slots.items())
+        ]
+
+    def errors(self):
+        return {f"{m.host} [Request {m.request}]": m.error for m in self.measurements if m.error is not None}
+
+    def to_dict(self):
+        summary = self.summary()
+        return dict(
+            asdict(self),
+            summary=asdict(summary) if summary else None,
+            groups={group: asdict(entry) if entry else None for group, entry in self.groups().items()},
+            timeline=self.timeline(),
+            errors=self.errors()
+        )
+
+
+@dataclass
+class PingReport:
+    """Outcome of pinging between all pairs of hosts"""
+    hosts: int
+    sent: int
+    received: int
+    loss_pct: float
+
+    @property
+    def dropped(self):
+        return self.sent - self.received
+
+    @classmethod
+    def from_loss(cls, hosts, loss_pct):
+        """From net.pingAll()'s loss percentage: one ping per ordered host pair"""
+        sent = hosts * (hosts - 1)
+        return cls(hosts=hosts, sent=sent, received=sent - round(sent * loss_pct / 100.0), loss_pct=loss_pct)
+
+    def to_dict(self):
+        return dict(asdict(self), dropped=self.dropped)
+
+
+def format_tcp_report(report):
+    lines = []
+    for m in report.measurements:
+        if m.error is not None:
+            lines.append(f'{m.host} -> {report.server} [Request {m.request}]: failed: {m.error}')
+        else:
+            latency = f'{m.latency_ms:.2f} ms' if m.latency_ms is not None else 'n/a'
+            lines.append(f'{m.host} -> {report.server} [Request {m.request}]: '
+                         f'{m.bandwidth_mbps:.2f} Mbps, Latency: {latency}')
+    lines.append(f"\n=== Average TCP Performance to {report.server} ===")
+    for group, summary in report.groups().items():
+        if summary:
+            lines.append(f'{group.title()} to {report.server}: '
+                         f'Avg Bandwidth: {summary.avg_bandwidth_mbps:.2f} Mbps, '
+                         f'Avg Latency: {summary.avg_latency_ms or 0:.2f} ms')
+        else:
+            lines.append(f'{group.title()} to {report.server}: No data')
+    return "\n".join(lines)
+
+
+def format_udp_report(report):
+    lines = []
+    for group in GROUPS:
+        lines.append(f"\n--- {group.title()} Results ---")
+        lines.append(f"{'Host':<8} {'Throughput(Mbps)':<18} {'Jitter(ms)':<12} {'Loss(%)':<8}")
+        for m in report.measurements:
+            if m.group != group:
+                continue
+            if m.error is not None:
+                lines.append(f"{m.host:<8} failed: {m.error}")
+            else:
+                lines.append(f"{m.host:<8} {m.bandwidth_mbps:<18.2f} {m.jitter_ms or 0:<12.2f} {m.loss_pct or 0:<8.2f}")
+
+    lines.append("\n*** Average UDP Performance ***")
+    lines.append(f"{'Group':<10} {'Avg Throughput (Mbps)':<24} {'Avg Jitter (ms)':<18} {'Avg Loss (%)'}")
+    for group, summary in report.groups().items():
+        if summary:
+            lines.append(f"{group.title():<10} {summary.avg_bandwidth_mbps:<24.2f} "
+                         f"{summary.avg_jitter_ms or 0:<18.2f} {summary.avg_loss_pct or 0:.2f}")
+        else:
+            lines.append(f"{group.title():<10} No data")
+
+    timeline = report.timeline()
+    if timeline:
+        lines.append("\n*** Per-Interval Totals ***")
+        lines.append(f"{'Interval':<12} {'Hosts':<6} {'Throughput (Mbps)':<20} {'Jitter (ms)':<12} {'Loss (%)'}")
+        for slot in timeline:
+            interval = f"{slot['start']:.0f}-{slot['end']:.0f} s"
+            jitter = f"{slot['jitter_ms']:.2f}" if slot['jitter_ms'] is not None else "n/a"
+            loss = f"{slot['loss_pct']:.2f}" if slot['loss_pct'] is not None else "n/a"
+            lines.append(f"{interval:<12} {slot['hosts']:<6} {slot['bandwidth_mbps']:<20.2f} {jitter:<12} {loss}")
+    return "\n".join(lines)
+
+
+def format_ping_report(report):
+    return f"*** Results: {report.loss_pct:g}% dropped ({report.received}/{report.sent} received)"
+
+
+def format_report(report):
+    """Text of a test result, as printed by the Mininet CLI"""
+    if hasattr(report, "format"):
+        return report.format()
+    if isinstance(report, PingReport):
+        return format_ping_report(report)
+    return format_tcp_report(report) if report.protocol == "tcp" else format_udp_report(report)
@@ -7,13 +7,23 @@ from mininet.cli import CLI
 import threading
 import re
 import time
-from subprocess import check_output, call, CalledProcessError
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+import ovsdb_client
+import iperf_runner
+import latency_matrix
+from ovsdb_client import OvsdbError
+from test_results import IperfMeasurement, IperfReport, format_report
 
 # ONOS controller info
 onos_ip = "127.0.0.1"  # Change this if needed
 onos_port = 6653
 student_number = 8
 faculty_number = 8
+switch_number = 8
+SUBNETS = {'student': '10.0.0.0/24', 'faculty': '10.0.1.0/24', 'server': '10.0.2.0/24'}
 TOTAL_MAX_RATE = 1_000_000_000  # 8 Gbps in bits per second for 8 buildings
 
 QUEUE_CONFIG = {
@@ -41,74 +51,107 @@ QUEUE_CONFIG = {
 
 
 
+# Timings of the last QoS provisioning ("setup") and teardown ("cleanup")
+qos_timings = {}
+
 def cleanup_qos():
+    """Detach QoS from every port and delete all QoS and Queue rows in one transaction"""
     try:
         print("Cleaning up QoS configurations...")
-        # Get all ports with QoS settings
-        qos_ports = check_output(['sudo', 'ovs-vsctl', '--format=csv', '--columns=name,qos', 'list', 'Port']).decode()
-        for line in qos_ports.strip().split('\n')[1:]:  # Skip CSV header
-            parts = line.strip().split(',')
-            if len(parts) == 2 and parts[1] != '[]':
-                port_name = parts[0].strip('"')
-                print(f"Removing QoS from port: {port_name}")
-                call(['sudo', 'ovs-vsctl', 'remove', 'Port', port_name, 'qos', parts[1]])
-
-        # Delete all QoS and Queue entries
-        call(['sudo', 'ovs-vsctl', '--all', 'destroy', 'qos'])
-        call(['sudo', 'ovs-vsctl', '--all', 'destroy', 'queue'])
-        print("QoS cleanup completed.")
-    except CalledProcessError as e:
+        started = time.perf_counter()
+        no_qos = ovsdb_client.ovs_set([])
+        result = ovsdb_client.get_client().transact(
+            ovsdb_client.update('Port', [['qos', '!=', no_qos]], {'qos': no_qos}),
+            ovsdb_client.delete('QoS'),
+            ovsdb_client.delete('Queue')
+        )
+        report = {
+            "ports": result[0].get('count', 0),
+            "qos": result[1].get('count', 0),
+            "queues": result[2].get('count', 0),
+            "transactions": 1,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+        qos_timings["cleanup"] = report
+        print(f"QoS cleanup completed: {report['ports']} ports, {report['qos']} QoS and "
+              f"{report['queues']} queues removed in {report['total_ms']} ms.")
+        return report
+    except OvsdbError as e:
         print(f"Error during QoS cleanup: {e}")
 
+def host_ports(net):
+    """Switch ports connected to hosts (excluding router)"""
+    ports = []
+    for host in net.hosts:
+        if host.name == 'r0':
+            continue
+        link = host.defaultIntf().link
+        if link:
+            switch_intf = link.intf1 if link.intf2.node == host else link.intf2
+            ports.append(switch_intf.name)
+    return ports
+
 def setup_qos_on_host_ports(net):
+    """Create the queues and the QoS and attach it to every host port in one transaction"""
     try:
-        # Build queue creation arguments
-        queue_cmds = []
-        for queue_name, percentage in QUEUE_CONFIG.items():
-            rate = int(TOTAL_MAX_RATE * percentage)
-            queue_cmds += ['--', f'--id=@{queue_name}', 'create', 'queue', f'other-config:max-rate={rate}']
-
-        # QoS command with all queues
-        qos_cmd = [
-            'sudo', 'ovs-vsctl',
-            *queue_cmds,
-            '--', '--id=@newqos', 'create', 'qos', 'type=linux-htb',
-            f'other-config:max-rate={TOTAL_MAX_RATE}',
-            'queues:1=@q1s', 'queues:2=@q2s', 'queues:3=@q3s',
-            'queues:4=@q1f', 'queues:5=@q2f', 'queues:6=@q3f',
-
-            'queues:7=@q1s2', 'queues:8=@q2s2', 'queues:9=@q3s2',
-            'queues:10=@q1f2', 'queues:11=@q2f2', 'queues:12=@q3f2',
-            
-            'queues:13=@q1s3', 'queues:14=@q2s3', 'queues:15=@q3s3',
-            'queues:16=@q1f3', 'queues:17=@q2f3', 'queues:18=@q3f3'
-            
+        started = time.perf_counter()
+        ports = host_ports(net)
+
+        # Queue rows, referenced by name from the QoS row of the same transaction
+        operations = [
+            ovsdb_client.insert('Queue', {
+                'other_config': ovsdb_client.ovs_map({'max-rate': str(int(TOTAL_MAX_RATE * percentage))})
+            }, uuid_name=queue_name)
+            for queue_name, percentage in QUEUE_CONFIG.items()
         ]
 
-        qos_result = check_output(qos_cmd).decode()
-        qos_ids = qos_result.strip().split('\n')
-        qos_id = qos_ids[-1]  # Last line contains the QoS ID
+        # QoS with all queues: queue ids 1..18 in QUEUE_CONFIG order (1=q1s, 2=q2s, ..., 18=q3f3)
+        operations.append(ovsdb_client.insert('QoS', {
+            'type': 'linux-htb',
+            'other_config': ovsdb_client.ovs_map({'max-rate': str(TOTAL_MAX_RATE)}),
+            'queues': ovsdb_client.ovs_map({
+                queue_id: ovsdb_client.named_uuid(queue_name)
+                for queue_id, queue_name in enumerate(QUEUE_CONFIG, start=1)
+            })
+        }, uuid_name='newqos'))
+
+        # Apply QoS to switch ports connected to hosts
+        operations += [
+            ovsdb_client.update('Port', [['name', '==', port_name]], {'qos': ovsdb_client.named_uuid('newqos')})
+            for port_name in ports
+        ]
+        built = time.perf_counter()
+
+        result = ovsdb_client.get_client().transact(*operations)
+        finished = time.perf_counter()
+        qos_id = result[len(QUEUE_CONFIG)]['uuid'][1]
+        attached = sum(entry.get('count', 0) for entry in result[len(QUEUE_CONFIG) + 1:len(operations)])
+
+        report = {
+            "qos": qos_id,
+            "queues": len(QUEUE_CONFIG),
+            "ports": attached,
+            "operations": len(operations),
+            "transactions": 1,
+            "build_ms": round((built - started) * 1000, 1),
+            "transact_ms": round((finished - built) * 1000, 1),
+            "total_ms": round((finished - started) * 1000, 1)
+        }
+        qos_timings["setup"] = report
         print(f"Created QoS with UUID: {qos_id}")
+        print(f"Applied QoS to {attached} host ports in {report['total_ms']} ms "
+              f"(1 transaction, {len(operations)} operations)")
+        if attached < len(ports):
+            print(f"Warning: {len(ports) - attached} host ports were not found in OVSDB")
+        return report
 
-        # Apply QoS to switch ports connected to hosts (excluding router)
-        for host in net.hosts:
-            if host.name == 'r0':
-                continue
-            intf = host.defaultIntf()
-            link = intf.link
-            if link:
-                switch_intf = link.intf1 if link.intf2.node == host else link.intf2
-                port_name = switch_intf.name
-                print(f"Applying QoS to port: {port_name}")
-                call(['sudo', 'ovs-vsctl', 'set', 'port', port_name, f'qos={qos_id}'])
-
-    except CalledProcessError as e:
-        print(f"Error executing OVS command: {e}")
+    except OvsdbError as e:
+        print(f"Error executing OVSDB transaction: {e}")
 
 class SimpleTopo(Topo):
     def build(self):
         # Switches
-        switches = [self.addSwitch(f's{i+1}', protocols='OpenFlow13') for i in range(8)]
+        switches = [self.addSwitch(f's{i+1}', protocols='OpenFlow13') for i in range(switch_number)]
 
         # Student hosts: 10.0.0.0/16
         student_hosts = [self.addHost(f'h{i+1}s', ip=f'10.0.0.{i+1}/24') for i in range(student_number)]
@@ -183,8 +226,14 @@ def run():
         server_host = net.get(f'srv{i+1}')
         server_host.cmd('ip route add default via 10.0.2.250')
 
-    for switch in net.switches:
-        switch.cmd('sudo ovs-vsctl set Bridge {} stp_enable=true'.format(switch.name))
+    # Enable STP on every switch in one OVSDB transaction
+    try:
+        ovsdb_client.get_client().transact(*[
+            ovsdb_client.update('Bridge', [['name', '==', switch.name]], {'stp_enable': True})
+            for switch in net.switches
+        ])
+    except OvsdbError as e:
+        print(f"Error enabling STP: {e}")
 
     setup_qos_on_host_ports(net)
 
@@ -200,184 +249,119 @@ def run():
 #     result = h1s.cmd(f'ping -c 5 {h8f.IP()}')
 #     print(result)
 
-def parse_bandwidth(output):
-    """Extract Mbps value from iperf output."""
-    match = re.search(r'(\d+\.\d+|\d+)\s+Mbits/sec', output)
-    return float(match.group(1)) if match else 0.0
-# TCP iperf output parser
-
-# === Parser for TCP iperf output ===
-def parse_iperf_output_tcp(output):
-    duration_match = re.search(r'(\d+\.\d+)-\s*(\d+\.\d+)\s+sec', output)
-    bandwidth_match = re.search(r'(\d+\.\d+|\d+)\s+Mbits/sec', output)
-    transferred_match = re.search(r'(\d+\.\d+|\d+)\s+MBytes', output)
-
-    return {
-        "duration_sec": float(duration_match.group(2)) - float(duration_match.group(1)) if duration_match else 0.0,
-        "bandwidth_mbps": float(bandwidth_match.group(1)) if bandwidth_match else 0.0,
-        "transferred_mbytes": float(transferred_match.group(1)) if transferred_match else 0.0,
-    }
-
 # === Ping latency measurement ===
 def measure_latency(host, target_ip):
     ping_output = host.cmd(f'ping -c 4 {target_ip}')
     match = re.search(r'rtt min/avg/max/mdev = [\d.]+/([\d.]+)/[\d.]+/[\d.]+ ms', ping_output)
     return float(match.group(1)) if match else None
 
+def test_hosts(net):
+    """Student hosts followed by faculty hosts"""
+    return ([net.get(f'h{i+1}s') for i in range(student_number)] +
+            [net.get(f'h{i+1}f') for i in range(faculty_number)])
+
 # === Multithreaded TCP test with latency ===
-def run_iperf_multithreaded_tcp(net, num_requests=3):
-    server = net.get('srv1')
-    student_hosts = [net.get(f'h{i+1}s') for i in range(student_number)]
-    faculty_hosts = [net.get(f'h{i+1}f') for i in range(faculty_number)]
-    all_hosts = student_hosts + faculty_hosts
-
-    bandwidth_data = {'student': [], 'faculty': []}
-    latency_data = {'student': [], 'faculty': []}
-
-    server_name = server.name
-    info(f'\n*** Starting TCP iperf server on {server_name}\n')
-    server.cmd('killall -9 iperf')
-    server.cmd('iperf -s &')
-    time.sleep(1)
-
-    def client_test(host, server_ip, group):
-        for i in range(num_requests):
-            info(f'*** {host.name} TCP request {i+1} to {server_name}\n')
-            latency = measure_latency(host, server_ip)
-            output = host.cmd(f'iperf -c {server_ip} -t 2')
-            result = parse_iperf_output_tcp(output)
-
-            bandwidth_data[group].append(result['bandwidth_mbps'])
-            if latency is not None:
-                latency_data[group].append(latency)
-
-            print(f'{host.name} -> {server_name} [Request {i+1}]: '
-                  f'{result["bandwidth_mbps"]:.2f} Mbps, '
-                  f'Latency: {latency:.2f} ms')
-
-    threads = []
-    for host in all_hosts:
-        group = 'student' if host.name.endswith('s') else 'faculty'
-        t = threading.Thread(target=client_test, args=(host, server.IP(), group))
-        t.start()
-        threads.append(t)
-
-    for t in threads:
-        t.join()
-
-    server.cmd('killall -9 iperf')
-    info(f'*** Stopped TCP iperf server on {server_name}\n')
-
-    # === Summary Output ===
-    print("\n=== Average TCP Performance to srv1 ===")
-    for group in ['student', 'faculty']:
-        bw_list = bandwidth_data[group]
-        lat_list = latency_data[group]
-        if bw_list:
-            avg_bw = sum(bw_list) / len(bw_list)
-            avg_lat = sum(lat_list) / len(lat_list) if lat_list else 0
-            print(f'{group.title()} to {server_name}: '
-                  f'Avg Bandwidth: {avg_bw:.2f} Mbps, '
-                  f'Avg Latency: {avg_lat:.2f} ms')
-        else:
-            print(f'{group.title()} to {server_name}: No data')
+def run_iperf_multithreaded_tcp(net, num_requests=3, server_name='srv1', duration=2, progress=None, on_start=None):
+    """TCP bandwidth and latency from every student and faculty host to a server.
+
+    Each of the num_requests rounds runs the iperf clients of all hosts at
+    the same time, with each host pinging the server meanwhile. Returns an
+    IperfReport. progress(host_name, completed, total) is called as clients
+    finish and on_start(test) with the IperfTest of each round, so a caller
+    can cancel it.
+    """
+    server = net.get(server_name)
+    all_hosts = test_hosts(net)
+    report = IperfReport('tcp', server_name)
+    started = time.perf_counter()
+
+    info(f'\n*** Starting TCP iperf test to {server_name}\n')
+    for request in range(1, num_requests + 1):
+        def client_done(host_name, result, completed, total, request=request):
+            if progress:
+                progress(host_name, (request - 1) * total + completed, num_requests * total)
+
+        test = iperf_runner.IperfTest(server, all_hosts, duration=duration, progress=client_done)
+        if on_start:
+            on_start(test)
+
+        latencies = {}
+        def ping(host):
+            latencies[host.name] = measure_latency(host, server.IP())
+
+        threads = [threading.Thread(target=ping, args=(host,)) for host in all_hosts]
+        for t in threads:
+            t.start()
+        try:
+            run = test.run()
+        finally:
+            for t in threads:
+                t.join()
+
+        for host in all_hosts:
+            result = run['results'].get(host.name, {'error': 'cancelled' if run['cancelled'] else 'no result'})
+            report.measurements.append(IperfMeasurement.from_report(host.name, result, request, latencies.get(host.name)))
+        if run['cancelled']:
+            report.cancelled = True
+            break
+    info(f'*** Finished TCP iperf test to {server_name}\n')
 
+    report.wall_clock_s = round(time.perf_counter() - started, 3)
+    return report
 
-def udp_test(net, student_number, faculty_number):
+
+def udp_test(net, student_number, faculty_number, server_name='srv2', bandwidth='30M', duration=5,
+             interval=1, wave_size=None, progress=None, on_start=None):
     """
-    Test UDP performance from student and faculty hosts to srv2 using iperf.
+    Test UDP performance from student and faculty hosts to a server (srv2 by default) using iperf.
     Hostnames follow the pattern: h1s..hNs (students), h1f..hNf (faculty).
+
+    All clients send at the same time (wave_size at a time if given), each
+    to a server port of its own, so the sweep takes about one duration and
+    measures the loss under contention.
     
     Args:
         net: Mininet network object
         student_number: total student hosts
         faculty_number: total faculty hosts
-    """
-    srv2 = net.get('srv2')
-    srv2.cmd('iperf -s -u -p 5001 -D')
-    time.sleep(1)
-
-    student_results = []
-    faculty_results = []
-
-    print("* Starting UDP tests to srv2\n")
 
-    # Run tests for student hosts
-    for i in range(1, student_number + 1):
-        host_name = f'h{i}s'
-        host = net.get(host_name)
-        print(f"* Testing {host_name} -> srv2")
-        output = host.cmd(f'iperf -c {srv2.IP()} -u -b 30M -p 5001 -t 5')
-
-        match = re.search(
-            r'([\d\.]+)\s+Mbits/sec\s+([\d\.]+)\s+ms\s+[\d\.]+\s*/\s*[\d\.]+\s+\(([\d\.]+)%\)',
-            output
-        )
-
-        if match:
-            bw = float(match.group(1))
-            jitter = float(match.group(2))
-            loss = float(match.group(3))
-        else:
-            bw, jitter, loss = 0.0, 0.0, 100.0  # default on parse failure
-
-        student_results.append((host_name, bw, jitter, loss))
-
-    # Run tests for faculty hosts
-    for i in range(1, faculty_number + 1):
-        host_name = f'h{i}f'
-        host = net.get(host_name)
-        print(f"* Testing {host_name} -> srv2")
-        output = host.cmd(f'iperf -c {srv2.IP()} -u -b 30M -p 5001 -t 5')
-
-        match = re.search(
-            r'([\d\.]+)\s+Mbits/sec\s+([\d\.]+)\s+ms\s+[\d\.]+\s*/\s*[\d\.]+\s+\(([\d\.]+)%\)',
-            output
-        )
-
-        if match:
-            bw = float(match.group(1))
-            jitter = float(match.group(2))
-            loss = float(match.group(3))
-        else:
-            bw, jitter, loss = 0.0, 0.0, 100.0
-
-        faculty_results.append((host_name, bw, jitter, loss))
-
-    srv2.cmd('kill %iperf')
-
-    def print_results(label, results):
-        print(f"\n--- {label} Results ---")
-        print(f"{'Host':<8} {'Throughput(Mbps)':<18} {'Jitter(ms)':<12} {'Loss(%)':<8}")
-        for host, bw, jitter, loss in results:
-            print(f"{host:<8} {bw:<18.2f} {jitter:<12.2f} {loss:<8.2f}")
-
-    def compute_avg(results):
-        if not results:
-            return 0.0, 0.0, 0.0
-        count = len(results)
-        sum_bw = sum(r[1] for r in results)
-        sum_jitter = sum(r[2] for r in results)
-        sum_loss = sum(r[3] for r in results)
-        return sum_bw / count, sum_jitter / count, sum_loss / count
-
-    # Print results
-    print_results("Student", student_results)
-    print_results("Faculty", faculty_results)
-
-    # Print averages
-    student_avg = compute_avg(student_results)
-    faculty_avg = compute_avg(faculty_results)
-
-    print("\n*** Average UDP Performance ***")
-    print(f"{'Group':<10} {'Avg Throughput (Mbps)':<24} {'Avg Jitter (ms)':<18} {'Avg Loss (%)'}")
-    print(f"{'Student':<10} {student_avg[0]:<24.2f} {student_avg[1]:<18.2f} {student_avg[2]:.2f}")
-    print(f"{'Faculty':<10} {faculty_avg[0]:<24.2f} {faculty_avg[1]:<18.2f} {faculty_avg[2]:.2f}")
-
-
-def ping_all(net):
-    info('*** Running pingAll()\n')
-    return net.pingAll()
+    Returns an IperfReport with throughput, jitter and loss per host and per
+    interval (seconds); progress and on_start are as in
+    run_iperf_multithreaded_tcp().
+    """
+    hosts = ([net.get(f'h{i}s') for i in range(1, student_number + 1)] +
+             [net.get(f'h{i}f') for i in range(1, faculty_number + 1)])
+    started = time.perf_counter()
+
+    info(f'* Starting UDP tests to {server_name}\n')
+    test = iperf_runner.IperfTest(net.get(server_name), hosts, duration=duration, wave_size=wave_size, udp=True,
+                                  bandwidth=bandwidth, interval=interval,
+                                  progress=progress and (lambda host_name, result, completed, total:
+                                                         progress(host_name, completed, total)))
+    if on_start:
+        on_start(test)
+    run = test.run()
+
+    report = IperfReport('udp', server_name, cancelled=run['cancelled'])
+    for host in hosts:
+        result = run['results'].get(host.name, {'error': 'cancelled' if run['cancelled'] else 'no result'})
+        report.measurements.append(IperfMeasurement.from_report(host.name, result))
+    report.wall_clock_s = round(time.perf_counter() - started, 3)
+    return report
+
+
+def ping_all(net, count=3, interval=0.2, on_start=None):
+    """LatencyMatrix of pinging between all pairs of student, faculty and server hosts.
+
+    Every host pings all others at the same time (count pings, interval
+    seconds apart); on_start(probe) lets a caller cancel it.
+    """
+    info('*** Measuring all-pairs latency\n')
+    hosts = test_hosts(net) + [net.get(f'srv{i+1}') for i in range(3)]
+    probe = latency_matrix.LatencyProbe(hosts, count=count, interval=interval, subnets=SUBNETS)
+    if on_start:
+        on_start(probe)
+    return probe.run()
 
 def custom_cli(net):
     while True:
@@ -388,18 +372,18 @@ def custom_cli(net):
         #     run_iperf_tcp(net)
         # elif cmd == "run iperf udp":
         #     run_iperf_udp(net)
-        elif cmd == "run iperf tcp mt":
-            run_iperf_multithreaded_tcp(net, num_requests=3)
-        elif cmd == "run iperf udp mt":
-            udp_test(net, student_number, faculty_number)
+        elif cmd.startswith("run iperf tcp mt"):
+            print(format_report(run_iperf_multithreaded_tcp(net, num_requests=3, server_name=cmd[16:].strip() or 'srv1')))
+        elif cmd.startswith("run iperf udp mt"):
+            print(format_report(udp_test(net, student_number, faculty_number, server_name=cmd[16:].strip() or 'srv2')))
         # elif cmd == "h1s ping h8f":
         #     ping_h1s_to_h8f(net)
         elif cmd == "pingall":
-            ping_all(net)
+            print(format_report(ping_all(net)))
         elif cmd.startswith("sh "):
             print(net.getNodeByName('h1').cmd(cmd[3:]))
         else:
-            print("Unknown command. Available: run iperf tcp, run iperf udp, run iperf tcp mt, run iperf udp mt, pingall, h1s ping h8f, exit, sh <host_cmd>")
+            print("Unknown command. Available: run iperf tcp, run iperf udp, run iperf tcp mt [server], run iperf udp mt [server], pingall, h1s ping h8f, exit, sh <host_cmd>")
 
 if __name__ == '__main__':
     setLogLevel('info')
@@ -0,0 +1,500 @@
+"""Index over the ONOS flow snapshot for filtered, paged flow queries.
+
+Flows are kept sorted by (deviceId, id) so paging cursors stay valid across
+snapshots, and every filterable attribute (device, state, app, priority,
+queue) maps to the set of flow ids having it. Selectors map to the flows
+sharing them, keyed by flow_injector.selector_key() so the index and
+reconcile_flows() agree on which rules match alike. IPV4_SRC/IPV4_DST
+prefixes are held in prefix tables that answer longest-prefix-match
+lookups for a concrete address pair.
+
+The index is updated incrementally from each new snapshot: only flows that
+appeared, disappeared or changed an indexed attribute are re-indexed.
+"""
+import base64
+import binascii
+import ipaddress
+import json
+import re
+import threading
+import time
+from bisect import bisect_right, insort
+from collections import Counter, defaultdict
+from functools import lru_cache
+from flow_injector import selector_key
+
+# Query parameter -> attribute with an exact-match map
+FILTERS = ("deviceId", "state", "appId", "priority", "queueId")
+INT_FILTERS = ("priority", "queueId")
+
+MAX_LIMIT = 5000
+
+IP_PROTOCOLS = {"tcp": 6, "udp": 17, "icmp": 1}
+L4_CRITERIA = {"TCP_DST": (6, "tcpPort"), "UDP_DST": (17, "udpPort")}
+
+
+def sort_key(flow):
+    return (flow.get("deviceId") or "", str(flow.get("id") or ""))
+
+
+def normalize_device_id(value):
+    """Accept Mininet switch names (s3) as well as ONOS device ids"""
+    match = re.fullmatch(r"s(\d+)", value)
+    return f"of:{int(match.group(1)):016x}" if match else value
+
+
+def flow_queue(flow):
+    """Queue id a flow steers into, or None"""
+    for instruction in (flow.get("treatment") or {}).get("instructions", []):
+        if instruction.get("type") == "QUEUE":
+            return instruction.get("queueId")
+    return None
+
+
+@lru_cache(maxsize=65536)
+def parse_prefix(text):
+    """IPv4Network of a criterion prefix (flows share few distinct prefixes)"""
+    try:
+        return ipaddress.IPv4Network(text, strict=False)
+    except ValueError:
+        return None
+
+
+def flow_prefix(flow, criterion_type):
+    """IPv4 network of an IPV4_SRC/IPV4_DST criterion, or None"""
+    for criterion in (flow.get("selector") or {}).get("criteria", []):
+        if criterion.get("type") == criterion_type:
+            return parse_prefix(criterion.get("ip"))
+    return None
+
+
+def packet_matcher(flow):
+    """Criteria other than IPv4 src/dst, reduced to (protocol, port, supported).
+
+    supported is False when the selector uses fields an address lookup
+    cannot evaluate (in port, MACs, a non-IPv4 ether type, ...).
+    """
+    protocol, port, supported = None, None, True
+    for criterion in (flow.get("selector") or {}).get("criteria", []):
+        criterion_type = criterion.get("type")
+        if criterion_type in ("IPV4_SRC", "IPV4_DST"):
+            continue
+        if criterion_type == "ETH_TYPE":
+            try:
+                supported = supported and int(str(criterion.get("ethType")), 0) == 0x800
+            except ValueError:
+                supported = False
+        elif criterion_type == "IP_PROTO":
+            protocol = criterion.get("protocol")
+        elif criterion_type in L4_CRITERIA:
+            protocol, port_key = L4_CRITERIA[criterion_type]
+            port = criterion.get(port_key)
+        else:
+            supported = False
+    return protocol, port, supported
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    # The key is compared against the (deviceId, id) string pairs of sort_key()
+    if not isinstance(key, list) or len(key) != 2 or not all(isinstance(part, str) for part in key):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return tuple(key)
+
+
+def parse_query(args):
+    """Validate /api/flows query parameters into a query dict.
+
+    Raises ValueError on malformed values.
+    """
+    query = {"filters": {}, "src": None, "dst": None, "cursor": None, "limit": None, "fields": None,
+             "counts": args.get("counts") in ("1", "true")}
+
+    for name in FILTERS:
+        value = args.get(name)
+        if value is None or value == "":
+            continue
+        if name in INT_FILTERS:
+            try:
+                value = int(value)
+            except ValueError:
+                raise ValueError(f"{name} must be an integer")
+        elif name == "deviceId":
+            value = normalize_device_id(value)
+        query["filters"][name] = value
+
+    for name in ("src", "dst"):
+        value = args.get(name)
+        if value:
+            try:
+                query[name] = ipaddress.IPv4Network(value, strict=False)
+            except ValueError:
+                raise ValueError(f"{name} must be an IPv4 prefix")
+
+    if args.get("limit"):
+        try:
+            limit = int(args["limit"])
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if not 0 <= limit <= MAX_LIMIT:
+            raise ValueError(f"limit must be between 0 and {MAX_LIMIT}")
+        query["limit"] = limit
+
+    if args.get("cursor"):
+        query["cursor"] = decode_cursor(args["cursor"])
+
+    if args.get("fields"):
+        query["fields"] = [field.strip() for field in args["fields"].split(",") if field.strip()]
+
+    return query
+
+
+def parse_lookup(args):
+    """Validate /api/flows/lookup packet parameters into lookup() kwargs"""
+    lookup = {}
+    for name in ("src", "dst"):
+        value = args.get(name)
+        if not value:
+            raise ValueError(f"{name} address is required")
+        try:
+            lookup[name] = ipaddress.IPv4Address(value)
+        except ValueError:
+            raise ValueError(f"{name} must be an IPv4 address")
+
+    protocol = args.get("protocol")
+    if protocol:
+        if protocol.lower() in IP_PROTOCOLS:
+            protocol = IP_PROTOCOLS[protocol.lower()]
+        else:
+            try:
+                protocol = int(protocol)
+            except ValueError:
+                raise ValueError(f"Unknown protocol: {protocol}")
+    lookup["protocol"] = protocol or None
+
+    port = args.get("port")
+    try:
+        lookup["port"] = int(port) if port else None
+    except ValueError:
+        raise ValueError("port must be an integer")
+
+    device_id = args.get("deviceId")
+    lookup["device_id"] = normalize_device_id(device_id) if device_id else None
+    return lookup
+
+
+class PrefixTable:
+    """Flow ids per IPv4 prefix, bucketed by prefix length.
+
+    Flows without the criterion are wildcards and match every address.
+    """
+
+    def __init__(self):
+        self.buckets = {}       # prefix length -> {network address int: set of flow ids}
+        self.lengths = []       # non-empty prefix lengths, longest first
+        self.wildcard = set()
+
+    def add(self, network, flow_id):
+        if network is None:
+            self.wildcard.add(flow_id)
+            return
+        bucket = self.buckets.get(network.prefixlen)
+        if bucket is None:
+            bucket = self.buckets[network.prefixlen] = {}
+            self.lengths = sorted(self.buckets, reverse=True)
+        bucket.setdefault(int(network.network_address), set()).add(flow_id)
+
+    def remove(self, network, flow_id):
+        if network is None:
+            self.wildcard.discard(flow_id)
+            return
+        bucket = self.buckets.get(network.prefixlen, {})
+        ids = bucket.get(int(network.network_address))
+        if ids is None:
+            return
+        ids.discard(flow_id)
+        if not ids:
+            del bucket[int(network.network_address)]
+            if not bucket:
+                del self.buckets[network.prefixlen]
+                self.lengths = sorted(self.buckets, reverse=True)
+
+    def covering(self, address):
+        """(prefix length, flow ids) of every prefix containing address, longest first"""
+        address = int(address)
+        matches = []
+        for length in self.lengths:
+            mask = (0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF
+            ids = self.buckets[length].get(address & mask)
+            if ids:
+                matches.append((length, ids))
+        return matches
+
+    def within(self, network):
+        """Flow ids whose prefix lies inside network"""
+        base = int(network.network_address)
+        shift = 32 - network.prefixlen
+        ids = set()
+        for length in self.lengths:
+            if length < network.prefixlen:
+                break
+            for address, flow_ids in self.buckets[length].items():
+                if address >> shift == base >> shift:
+                    ids |= flow_ids
+        return ids
+
+    def prefix_count(self):
+        return sum(len(bucket) for bucket in self.buckets.values())
+
+
+class FlowIndex:
+    """Flows of the latest snapshot with per-attribute, per-selector and prefix maps"""
+
+    def __init__(self, flows=None):
+        self.lock = threading.RLock()
+        self.source = None
+        self.flows = {}         # flow id -> flow
+        self.keys = []          # sorted (deviceId, id) of every flow
+        self.attributes = {}    # flow id -> indexed attributes
+        self.maps = {name: defaultdict(set) for name in FILTERS}
+        self.selectors = defaultdict(set)
+        self.src = PrefixTable()
+        self.dst = PrefixTable()
+        self.etags = {}         # query string -> ETag of its response, kept by the web routes
+        self.updates = 0
+        self.last_update = {}
+        if flows is not None:
+            self.update(flows)
+
+    def __len__(self):
+        return len(self.flows)
+
+    def _attributes(self, flow):
+        return {
+            "key": sort_key(flow),
+            "deviceId": flow.get("deviceId"),
+            "state": flow.get("state"),
+            "appId": flow.get("appId"),
+            "priority": flow.get("priority"),
+            "queueId": flow_queue(flow),
+            "selector": selector_key(flow),
+            "src": flow_prefix(flow, "IPV4_SRC"),
+            "dst": flow_prefix(flow, "IPV4_DST"),
+            "matcher": packet_matcher(flow),
+            "treatment": flow.get("treatment")
+        }
+
+    def _add(self, flow_id, attributes, sort=True):
+        self.attributes[flow_id] = attributes
+        for name in FILTERS:
+            self.maps[name][attributes[name]].add(flow_id)
+        self.selectors[attributes["selector"]].add(flow_id)
+        self.src.add(attributes["src"], flow_id)
+        self.dst.add(attributes["dst"], flow_id)
+        if sort:
+            insort(self.keys, attributes["key"])
+
+    def _remove(self, flow_id):
+        attributes = self.attributes.pop(flow_id)
+        for name in FILTERS:
+            ids = self.maps[name][attributes[name]]
+            ids.discard(flow_id)
+            if not ids:
+                del self.maps[name][attributes[name]]
+        ids = self.selectors[attributes["selector"]]
+        ids.discard(flow_id)
+        if not ids:
+            del self.selectors[attributes["selector"]]
+        self.src.remove(attributes["src"], flow_id)
+        self.dst.remove(attributes["dst"], flow_id)
+        position = bisect_right(self.keys, attributes["key"]) - 1
+        if 0 <= position < len(self.keys) and self.keys[position] == attributes["key"]:
+            del self.keys[position]
+
+    def update(self, flows):
+        """Bring the index in line with a new flow snapshot.
+
+        Flows whose indexed attributes are unchanged only have their dict
+        swapped (so counters stay current); the rest are re-indexed.
+        Returns the number of flows added, changed and removed.
+        """
+        started = time.perf_counter()
+        with self.lock:
+            if flows is self.source:
+                return self.last_update
+            bulk = not self.flows
+            seen = set()
+            added = changed = 0
+            for flow in flows:
+                flow_id = flow.get("id")
+                seen.add(flow_id)
+                previous = self.attributes.get(flow_id)
+                if previous is None:
+                    self._add(flow_id, self._attributes(flow), sort=not bulk)
+                    added += 1
+                elif (previous["state"] != flow.get("state") or previous["priority"] != flow.get("priority")
+                      or previous["appId"] != flow.get("appId") or previous["deviceId"] != flow.get("deviceId")
+                      or previous["treatment"] != flow.get("treatment")):
+                    self._remove(flow_id)
+                    self._add(flow_id, self._attributes(flow))
+                    changed += 1
+                self.flows[flow_id] = flow
+
+            removed = [flow_id for flow_id in self.flows if flow_id not in seen]
+            for flow_id in removed:
+                self._remove(flow_id)
+                del self.flows[flow_id]
+
+            if bulk:
+                self.keys = sorted(attributes["key"] for attributes in self.attributes.values())
+            self.source = flows
+            self.etags = {}
+            self.updates += 1
+            self.last_update = {
+                "added": added, "changed": changed, "removed": len(removed),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)
+            }
+            return self.last_update
+
+    def match(self, filters, src=None, dst=None):
+        """Sorted (deviceId, id) keys of the flows matching every filter.
+
+        src/dst keep flows whose IPV4_SRC/IPV4_DST lies within the prefix.
+        """
+        with self.lock:
+            sets = [self.maps[name].get(value, set()) for name, value in filters.items()]
+            if src is not None:
+                sets.append(self.src.within(src))
+            if dst is not None:
+                sets.append(self.dst.within(dst))
+            if not sets:
+                return list(self.keys)
+            sets.sort(key=len)
+            ids = sets[0].intersection(*sets[1:])
+            return sorted(self.attributes[flow_id]["key"] for flow_id in ids)
+
+    def page(self, keys, cursor=None, limit=None):
+        """Slice of keys after cursor, plus the cursor of the next page"""
+        start = bisect_right(keys, cursor) if cursor is not None else 0
+        end = len(keys) if limit is None else min(len(keys), start + limit)
+        next_cursor = encode_cursor(keys[end - 1]) if start < end < len(keys) else None
+        return keys[start:end], next_cursor
+
+    def counts(self, keys):
+        """Per-state counts and number of queue-steering flows among keys"""
+        attributes = [self.attributes[flow_id] for _, flow_id in keys]
+        return {
+            "states": dict(Counter(item["state"] for item in attributes)),
+            "queued": sum(1 for item in attributes if item["queueId"] is not None)
+        }
+
+    def query(self, query):
+        """Run a parse_query() dict; returns the /api/flows payload"""
+        with self.lock:
+            keys = self.match(query["filters"], query["src"], query["dst"])
+            page, next_cursor = self.page(keys, query["cursor"], query["limit"])
+
+            fields = query["fields"]
+            flows = [self.flows[flow_id] for _, flow_id in page]
+            if fields:
+                flows = [{field: flow[field] for field in fields if field in flow} for flow in flows]
+
+            payload = {"flows": flows, "total": len(keys), "next_cursor": next_cursor}
+            if query["counts"]:
+                payload["counts"] = self.counts(keys)
+            return payload
+
+    def lookup(self, src, dst, protocol=None, port=None, device_id=None):
+        """Flow each device would apply to a packet from src to dst (IPv4Address).
+
+        Candidates come from longest-prefix matching on IPV4_SRC and
+        IPV4_DST (wildcards included); the remaining criteria are checked
+        against protocol/port and the highest priority candidate wins.
+        Returns one entry per device, sorted by device id.
+        """
+        with self.lock:
+            src_lengths = {}
+            for length, ids in self.src.covering(src):
+                for flow_id in ids:
+                    src_lengths[flow_id] = length
+            dst_lengths = {}
+            for length, ids in self.dst.covering(dst):
+                for flow_id in ids:
+                    dst_lengths[flow_id] = length
+
+            candidates = (set(src_lengths) | self.src.wildcard) & (set(dst_lengths) | self.dst.wildcard)
+            if device_id is not None:
+                candidates &= self.maps["deviceId"].get(device_id, set())
+
+            per_device = defaultdict(list)
+            for flow_id in candidates:
+                attributes = self.attributes[flow_id]
+                flow_protocol, flow_port, supported = attributes["matcher"]
+                if not supported:
+                    continue
+                if flow_protocol is not None and flow_protocol != protocol:
+                    continue
+                if flow_port is not None and flow_port != port:
+                    continue
+                per_device[attributes["deviceId"]].append(flow_id)
+
+            results = []
+            for device, flow_ids in sorted(per_device.items()):
+                # Highest priority wins; among equals prefer the most specific match
+                flow_ids.sort(key=lambda flow_id: (
+                    -(self.attributes[flow_id]["priority"] or 0),
+                    -(src_lengths.get(flow_id, 0) + dst_lengths.get(flow_id, 0)),
+                    self.attributes[flow_id]["key"]
+                ))
+                winner = flow_ids[0]
+                attributes = self.attributes[winner]
+                results.append({
+                    "deviceId": device,
+                    "flow": self.flows[winner],
+                    "queueId": attributes["queueId"],
+                    "src_prefix": str(attributes["src"]) if attributes["src"] else None,
+                    "dst_prefix": str(attributes["dst"]) if attributes["dst"] else None,
+                    "candidates": len(flow_ids)
+                })
+            return results
+
+    def same_selector(self, flow_id):
+        """Flows on any device with exactly the selector of flow_id"""
+        with self.lock:
+            attributes = self.attributes.get(flow_id)
+            if attributes is None:
+                return None
+            return sorted(
+                (self.flows[peer] for peer in self.selectors[attributes["selector"]]),
+                key=sort_key
+            )
+
+    def classify(self, flow_ids):
+        """(deviceId, queueId) of each indexed flow id"""
+        with self.lock:
+            return {
+                flow_id: (self.attributes[flow_id]["deviceId"], self.attributes[flow_id]["queueId"])
+                for flow_id in flow_ids if flow_id in self.attributes
+            }
+
+    def stats(self):
+        """Sizes of the index maps and the cost of the last update"""
+        with self.lock:
+            return {
+                "flows": len(self.flows),
+                "devices": len(self.maps["deviceId"]),
+                "queues": len([queue for queue in self.maps["queueId"] if queue is not None]),
+                "selectors": len(self.selectors),
+                "src_prefixes": self.src.prefix_count(),
+                "dst_prefixes": self.dst.prefix_count(),
+                "updates": self.updates,
+                "last_update": self.last_update
+            }
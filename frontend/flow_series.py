@@ -0,0 +1,189 @@
+"""Per-flow counter time series.
+
+Every collected flow snapshot is sampled into a fixed-size ring buffer per
+flow (timestamps, bytes and packets in typed arrays), so memory per flow is
+bounded by the buffer capacity. Rates (bps/pps) are computed on demand from
+consecutive cumulative counters.
+
+ONOS refreshes flow counters on its own statistics cycle and stamps them
+with lastSeen; a sample is only added when lastSeen moves, so rates are
+computed over the switch's real counter intervals rather than our polling
+interval.
+"""
+import math
+import threading
+import time
+from array import array
+
+
+class CounterRing:
+    """Fixed-capacity ring of (time, bytes, packets) samples"""
+
+    __slots__ = ("times", "bytes", "packets", "head", "size")
+
+    def __init__(self, capacity):
+        self.times = array("d", bytes(8 * capacity))
+        self.bytes = array("Q", bytes(8 * capacity))
+        self.packets = array("Q", bytes(8 * capacity))
+        self.head = 0       # index the next sample is written to
+        self.size = 0
+
+    @property
+    def capacity(self):
+        return len(self.times)
+
+    def append(self, timestamp, byte_count, packet_count):
+        self.times[self.head] = timestamp
+        self.bytes[self.head] = byte_count
+        self.packets[self.head] = packet_count
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def last(self):
+        """Newest (time, bytes, packets), or None when empty"""
+        if not self.size:
+            return None
+        index = (self.head - 1) % self.capacity
+        return self.times[index], self.bytes[index], self.packets[index]
+
+    def clear(self):
+        self.head = 0
+        self.size = 0
+
+    def samples(self):
+        """Samples oldest first as three lists"""
+        start = (self.head - self.size) % self.capacity
+        order = [(start + offset) % self.capacity for offset in range(self.size)]
+        return ([self.times[i] for i in order], [self.bytes[i] for i in order], [self.packets[i] for i in order])
+
+
+def rates(times, byte_counts, packet_counts):
+    """bps/pps between consecutive cumulative samples (one fewer than samples)"""
+    bps, pps = [], []
+    for i in range(1, len(times)):
+        elapsed = times[i] - times[i - 1]
+        if elapsed <= 0:
+            bps.append(0.0)
+            pps.append(0.0)
+            continue
+        bps.append(round((byte_counts[i] - byte_counts[i - 1]) * 8 / elapsed, 1))
+        pps.append(round((packet_counts[i] - packet_counts[i - 1]) / elapsed, 2))
+    return bps, pps
+
+
+class FlowSeriesStore:
+    """Counter rings of up to max_flows flows, capacity samples each"""
+
+    def __init__(self, capacity=120, max_flows=10000):
+        self.capacity = capacity
+        self.max_flows = max_flows
+        self._lock = threading.Lock()
+        self._rings = {}        # flow id -> CounterRing
+        self.dropped = 0        # flows not tracked because max_flows was reached
+        self.resets = 0         # counter resets seen (flow re-installed)
+
+    def record(self, flows, now=None):
+        """Sample the counters of a flow snapshot; forget flows no longer present"""
+        now = time.time() if now is None else now
+        seen = set()
+        with self._lock:
+            for flow in flows:
+                flow_id = flow.get("id")
+                if flow_id is None:
+                    continue
+                seen.add(flow_id)
+                ring = self._rings.get(flow_id)
+                if ring is None:
+                    if len(self._rings) >= self.max_flows:
+                        self.dropped += 1
+                        continue
+                    ring = self._rings[flow_id] = CounterRing(self.capacity)
+
+                last_seen = flow.get("lastSeen")
+                timestamp = last_seen / 1000.0 if last_seen else now
+                byte_count, packet_count = int(flow.get("bytes") or 0), int(flow.get("packets") or 0)
+
+                last = ring.last()
+                if last is not None:
+                    if timestamp <= last[0]:
+                        continue    # counters not refreshed by ONOS since the last sample
+                    if byte_count < last[1] or packet_count < last[2]:
+                        self.resets += 1
+                        ring.clear()
+                ring.append(timestamp, byte_count, packet_count)
+
+            for flow_id in [flow_id for flow_id in self._rings if flow_id not in seen]:
+                del self._rings[flow_id]
+
+    def clear(self):
+        """Forget every flow's samples"""
+        with self._lock:
+            self._rings.clear()
+
+    def series(self, flow_id, window=None, points=None):
+        """Samples and rates of one flow, or None if it is not tracked.
+
+        window keeps only the last window seconds; points downsamples to at
+        most that many samples by keeping every k-th cumulative sample, so
+        the rates of the result are exact averages over the wider intervals.
+        """
+        with self._lock:
+            ring = self._rings.get(flow_id)
+            if ring is None:
+                return None
+            times, byte_counts, packet_counts = ring.samples()
+
+        if window is not None and times:
+            start = next((i for i, t in enumerate(times) if t >= times[-1] - window), len(times))
+            times, byte_counts, packet_counts = times[start:], byte_counts[start:], packet_counts[start:]
+
+        if points is not None and len(times) > points >= 2:
+            step = math.ceil((len(times) - 1) / (points - 1))
+            # Always keep the newest sample
+            keep = list(range(len(times) - 1, -1, -step))[::-1]
+            times = [times[i] for i in keep]
+            byte_counts = [byte_counts[i] for i in keep]
+            packet_counts = [packet_counts[i] for i in keep]
+
+        bps, pps = rates(times, byte_counts, packet_counts)
+        return {
+            "flow_id": flow_id,
+            "samples": len(times),
+            "capacity": self.capacity,
+            "t": times,
+            "bytes": byte_counts,
+            "packets": packet_counts,
+            "bps": bps,
+            "pps": pps
+        }
+
+    def current_rates(self, flow_ids=None):
+        """Latest bps/pps of each flow (from its two newest samples)"""
+        with self._lock:
+            rings = self._rings if flow_ids is None else {
+                flow_id: self._rings[flow_id] for flow_id in flow_ids if flow_id in self._rings
+            }
+            result = {}
+            for flow_id, ring in rings.items():
+                if ring.size < 2:
+                    continue
+                newest = (ring.head - 1) % ring.capacity
+                previous = (ring.head - 2) % ring.capacity
+                bps, pps = rates(
+                    [ring.times[previous], ring.times[newest]],
+                    [ring.bytes[previous], ring.bytes[newest]],
+                    [ring.packets[previous], ring.packets[newest]]
+                )
+                result[flow_id] = {"bps": bps[0], "pps": pps[0], "t": ring.times[newest]}
+            return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "flows": len(self._rings),
+                "capacity": self.capacity,
+                "max_flows": self.max_flows,
+                "bytes_allocated": len(self._rings) * self.capacity * 24,
+                "dropped": self.dropped,
+                "resets": self.resets
+            }
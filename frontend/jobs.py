@@ -0,0 +1,172 @@
+"""Background jobs for long-running network tests.
+
+A submitted test gets a job id right away and runs in a bounded worker
+pool, so no HTTP request is held open for the duration of a test. Jobs
+report progress while they run, can be cancelled (the test registers how
+to stop its processes) and keep their result for a retention period.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job that was cancelled before or while running"""
+
+
+class Job:
+    """One submitted test: state, progress, result and cancellation hooks"""
+
+    def __init__(self, kind, params, manager):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.status = QUEUED
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = threading.Event()
+        self._cancel_hooks = []
+        self._manager = manager
+
+    def update(self, **progress):
+        """Merge progress fields (e.g. completed/total) and notify listeners"""
+        self.progress.update(progress)
+        self._manager._notify(self)
+
+    def on_cancel(self, callback):
+        """Run callback when the job is cancelled (at once if it already is)"""
+        with self._manager._lock:
+            if not self.cancel_requested.is_set():
+                self._cancel_hooks.append(callback)
+                return
+        callback()
+
+    def check_cancelled(self):
+        if self.cancel_requested.is_set():
+            raise JobCancelled()
+
+    def summary(self, with_result=False):
+        data = {
+            "job_id": self.id,
+            "type": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_s": round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None
+        }
+        if with_result:
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """Bounded pool running jobs, with results kept for retention seconds"""
+
+    def __init__(self, max_workers=2, retention=3600, max_jobs=500):
+        self.max_workers = max_workers
+        self.retention = retention
+        self.max_jobs = max_jobs
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = {}         # job id -> Job, in submission order
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """callback(job) on every state or progress change"""
+        self._listeners.append(callback)
+
+    def _notify(self, job):
+        for callback in self._listeners:
+            try:
+                callback(job)
+            except Exception:
+                pass
+
+    def _purge(self):
+        """Drop finished jobs past retention, and the oldest beyond max_jobs (lock held)"""
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and now - job.finished_at > self.retention]:
+            del self._jobs[job_id]
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job_id]
+
+    def submit(self, kind, function, params=None):
+        """Queue function(job) and return the job"""
+        job = Job(kind, params or {}, self)
+        with self._lock:
+            self._purge()
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, function)
+        self._notify(job)
+        return job
+
+    def _run(self, job, function):
+        with self._lock:
+            if job.cancel_requested.is_set():
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+        self._notify(job)
+        try:
+            # A cancelled test may still return what it measured before it was stopped
+            job.result = function(job)
+            status = CANCELLED if job.cancel_requested.is_set() else SUCCEEDED
+        except JobCancelled:
+            status = CANCELLED
+        except Exception as e:
+            status, job.error = (CANCELLED, None) if job.cancel_requested.is_set() else (FAILED, str(e))
+        with self._lock:
+            job.status = status
+            job.finished_at = time.time()
+        self._notify(job)
+
+    def get(self, job_id):
+        with self._lock:
+            self._purge()
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            self._purge()
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Request cancellation; returns the job, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            job.cancel_requested.set()
+            hooks, job._cancel_hooks = job._cancel_hooks, []
+            if job.status == QUEUED:
+                # Never started: finished right away
+                job.status = CANCELLED
+                job.finished_at = time.time()
+        for hook in hooks:
+            try:
+                hook()
+            except Exception:
+                pass
+        self._notify(job)
+        return job
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {"jobs": len(self._jobs), "by_status": counts, "workers": self.max_workers, "retention_s": self.retention}
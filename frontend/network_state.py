@@ -0,0 +1,318 @@
+"""Background collector feeding an in-memory network state store.
+
+The collector thread pulls each registered resource (devices, flows, ports,
+links, ...) on its own interval and stores the result as a versioned
+snapshot. Request handlers read the latest snapshot instead of calling
+ONOS, so page loads do not wait on the controller.
+
+Changes between snapshots are turned into typed events on an EventBus,
+which the web pages receive over Server-Sent Events.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot:
+    """One collected value of a resource"""
+
+    __slots__ = ("value", "version", "updated_at", "fetched_at", "fetch_ms", "error")
+
+    def __init__(self, value, version, updated_at, fetched_at, fetch_ms, error=None):
+        self.value = value
+        self.version = version
+        self.updated_at = updated_at    # when the value last changed
+        self.fetched_at = fetched_at    # when it was last fetched successfully
+        self.fetch_ms = fetch_ms
+        self.error = error              # message of the latest failed fetch
+
+    @property
+    def age(self):
+        """Seconds since the value was last fetched"""
+        return time.monotonic() - self.fetched_at
+
+    def meta(self):
+        """Age/version fields for API responses"""
+        return {
+            "snapshot_age": round(self.age, 3),
+            "snapshot_version": self.version,
+            "snapshot_error": self.error
+        }
+
+
+class StateStore:
+    """Latest snapshot per resource; versions only move when values change.
+
+    clear() starts a new generation: values fetched before it are refused.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dispatch = threading.Lock()   # held while a put notifies listeners
+        self._snapshots = {}
+        self._listeners = []
+        self.generation = 0
+
+    def add_listener(self, callback, changes_only=True):
+        """Call callback(resource, old_value, new_value, version) on every change.
+
+        With changes_only=False it is called after every successful fetch,
+        even when the value is unchanged.
+        """
+        self._listeners.append((callback, changes_only))
+
+    def get(self, resource):
+        """Latest Snapshot of resource, or None before the first fetch"""
+        return self._snapshots.get(resource)
+
+    def put(self, resource, value, fetch_ms=None, generation=None):
+        """Store a fetched value; returns True if it differs from the last one.
+
+        With generation (read before fetching), a value fetched before the
+        last clear() is dropped.
+        """
+        with self._dispatch:
+            return self._put(resource, value, fetch_ms, generation)
+
+    def _put(self, resource, value, fetch_ms, generation):
+        now = time.monotonic()
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            current = self._snapshots.get(resource)
+            changed = current is None or current.value != value
+            if changed:
+                version = (current.version + 1) if current else 1
+                self._snapshots[resource] = Snapshot(value, version, now, now, fetch_ms)
+            else:
+                self._snapshots[resource] = Snapshot(current.value, current.version, current.updated_at, now, fetch_ms)
+
+        old_value = current.value if current else None
+        for callback, changes_only in self._listeners:
+            if changes_only and not changed:
+                continue
+            try:
+                callback(resource, old_value, value, self._snapshots[resource].version)
+            except Exception as e:
+                logger.error(f"State listener failed for {resource}: {e}")
+        return changed
+
+    def put_error(self, resource, error):
+        """Record a failed fetch, keeping the last good value"""
+        with self._lock:
+            current = self._snapshots.get(resource)
+            if current is not None:
+                current.error = str(error)
+
+    def clear(self, resource=None):
+        """Forget one resource (or all of them, starting a new generation).
+
+        Waits for a put that is notifying listeners, so none of its
+        listener work lands after the clear.
+        """
+        with self._dispatch, self._lock:
+            if resource is None:
+                self._snapshots.clear()
+                self.generation += 1
+            else:
+                self._snapshots.pop(resource, None)
+
+    def summary(self):
+        """Version, age and last error of every resource"""
+        return {resource: snapshot.meta() for resource, snapshot in list(self._snapshots.items())}
+
+
+class Collector(threading.Thread):
+    """Daemon thread polling each registered resource on its own interval.
+
+    With an active callable, resources are only fetched while it returns
+    True (e.g. while the network is running).
+    """
+
+    def __init__(self, store, active=None):
+        super().__init__(name="network-collector", daemon=True)
+        self.store = store
+        self.active = active
+        self._resources = {}    # name -> (loader, interval)
+        self._next_due = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._launched = False
+
+    def register(self, resource, loader, interval):
+        """Poll loader() every interval seconds into store[resource]"""
+        with self._lock:
+            self._resources[resource] = (loader, float(interval))
+            self._next_due[resource] = 0.0
+        self._wake.set()
+
+    def intervals(self):
+        return {resource: interval for resource, (_, interval) in self._resources.items()}
+
+    def refresh(self, *resources):
+        """Fetch the given resources (all if none given) as soon as possible"""
+        with self._lock:
+            for resource in resources or list(self._resources):
+                if resource in self._next_due:
+                    self._next_due[resource] = 0.0
+        self._wake.set()
+
+    def ensure_started(self):
+        """Start the thread once, however many callers race here"""
+        with self._lock:
+            if self._launched:
+                return
+            self._launched = True
+        self.start()
+
+    def is_active(self):
+        return self.active is None or self.active()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def _collect(self, resource, loader):
+        generation = self.store.generation
+        started = time.perf_counter()
+        try:
+            value = loader()
+        except Exception as e:
+            logger.debug(f"Collector failed to fetch {resource}: {e}")
+            self.store.put_error(resource, e)
+            return
+        if not self.is_active():
+            # Deactivated while fetching: do not store state of a network that is gone
+            return
+        # The store refuses the value if it was cleared since the fetch started
+        self.store.put(resource, value, round((time.perf_counter() - started) * 1000, 2), generation)
+
+    def run(self):
+        while not self._stopped.is_set():
+            now = time.monotonic()
+            with self._lock:
+                due = [
+                    (resource, loader, interval)
+                    for resource, (loader, interval) in self._resources.items()
+                    if self._next_due[resource] <= now
+                ]
+                for resource, _, interval in due:
+                    self._next_due[resource] = now + interval
+
+            if self.is_active():
+                for resource, loader, _ in due:
+                    self._collect(resource, loader)
+
+            with self._lock:
+                wait = min(self._next_due.values(), default=now + 1.0) - time.monotonic()
+            self._wake.wait(max(0.0, wait))
+            self._wake.clear()
+
+
+class Subscription:
+    """Event queue of one stream client"""
+
+    def __init__(self, max_queue):
+        self._queue = queue.Queue(max_queue)
+
+    def push(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Too far behind: drop the backlog and tell the client to reload
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._queue.put_nowait((event[0], "resync", {}))
+
+    def get(self, timeout):
+        """Next (id, type, data) event, or None after timeout seconds"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """Fan-out of typed events to stream subscribers.
+
+    The most recent events are kept so a reconnecting client can resume
+    from its Last-Event-ID without missing anything.
+    """
+
+    def __init__(self, history=256, max_queue=256):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history)
+        self._last_id = 0
+        self.max_queue = max_queue
+
+    def publish(self, event_type, data):
+        with self._lock:
+            self._last_id += 1
+            event = (self._last_id, event_type, data)
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(event)
+
+    def subscribe(self, last_event_id=None):
+        """New Subscription, pre-filled with the events after last_event_id"""
+        subscription = Subscription(self.max_queue)
+        with self._lock:
+            if last_event_id is not None and last_event_id != self._last_id:
+                missed = [event for event in self._history if event[0] > last_event_id]
+                if not missed or missed[0][0] != last_event_id + 1:
+                    missed = [(self._last_id, "resync", {})]
+                for event in missed[-self.max_queue:]:
+                    subscription.push(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+
+def device_changes(old_devices, new_devices):
+    """Devices that appeared, disappeared or changed availability"""
+    before = {device.get("id"): device for device in old_devices or []}
+    changes = []
+    for device in new_devices or []:
+        previous = before.pop(device.get("id"), None)
+        available = bool(device.get("available"))
+        if previous is None or bool(previous.get("available")) != available:
+            changes.append({"id": device.get("id"), "available": available, "event": "up" if available else "down"})
+    for device_id in before:
+        changes.append({"id": device_id, "available": False, "event": "removed"})
+    return changes
+
+
+def flow_delta(old_flows, new_flows):
+    """Flows added, removed or changed state between two flow lists.
+
+    Counter-only changes (bytes, packets, life) are not reported. Returns
+    None when nothing relevant changed.
+    """
+    before = {flow.get("id"): flow for flow in old_flows or []}
+    added, updated = [], []
+    for flow in new_flows or []:
+        previous = before.pop(flow.get("id"), None)
+        if previous is None:
+            added.append(flow)
+        elif previous.get("state") != flow.get("state"):
+            updated.append(flow)
+    removed = [{"id": flow_id, "deviceId": flow.get("deviceId")} for flow_id, flow in before.items()]
+    if not (added or updated or removed):
+        return None
+    return {"added": added, "updated": updated, "removed": removed}
@@ -0,0 +1,247 @@
+"""Port statistics rate engine.
+
+Port counters from ONOS /statistics/ports are kept in preallocated NumPy
+ring buffers, one row per (device, port). Every tick writes the new counters
+of all ports at once and recomputes rates, utilization against link
+capacity and drop/error ratios for every port in a single vectorized pass,
+so the cost stays flat from a handful of ports to hundreds.
+
+ONOS refreshes port counters on its own statistics cycle. A port only gets
+a new sample when its counters moved (or after idle_timeout seconds, so an
+idle port decays to zero), which keeps rates tied to real counter intervals.
+"""
+import threading
+import time
+import numpy as np
+
+COUNTERS = (
+    "bytesReceived", "bytesSent", "packetsReceived", "packetsSent",
+    "packetsRxDropped", "packetsTxDropped", "packetsRxErrors", "packetsTxErrors",
+)
+BYTES_RX, BYTES_TX, PACKETS_RX, PACKETS_TX, DROPS_RX, DROPS_TX, ERRORS_RX, ERRORS_TX = range(len(COUNTERS))
+
+DEFAULT_CAPACITY_BPS = 1_000_000_000
+
+
+class PortStatsEngine:
+    """Counter rings and derived rates of every (device, port)"""
+
+    def __init__(self, samples=60, initial_ports=256, idle_timeout=15.0,
+                 hotspot_utilization=0.8, hotspot_drop_ratio=0.01,
+                 default_capacity_bps=DEFAULT_CAPACITY_BPS):
+        self.samples = samples
+        self.default_capacity_bps = default_capacity_bps
+        self.idle_timeout = idle_timeout
+        self.hotspot_utilization = hotspot_utilization
+        self.hotspot_drop_ratio = hotspot_drop_ratio
+        self._lock = threading.Lock()
+
+        self.rows = {}          # (device, port) -> row
+        self.keys = []          # row -> (device, port)
+        self.capacities = {}    # (device, port) -> link capacity in bps, when known
+        self._allocate(initial_ports)
+        self.rates = None       # latest compute() result
+        self.ticks = 0
+        self.compute_ms = None
+
+    def _allocate(self, ports):
+        self.counters = np.zeros((ports, self.samples, len(COUNTERS)), dtype=np.int64)
+        self.times = np.zeros((ports, self.samples), dtype=np.float64)
+        self.heads = np.zeros(ports, dtype=np.int64)
+        self.sizes = np.zeros(ports, dtype=np.int64)
+        self.capacity_bps = np.full(ports, self.default_capacity_bps, dtype=np.float64)
+
+    def _grow(self, ports):
+        """Double the preallocated rows until ports fit"""
+        size = len(self.heads)
+        while size < ports:
+            size *= 2
+        extra = size - len(self.heads)
+        self.counters = np.concatenate([self.counters, np.zeros((extra,) + self.counters.shape[1:], np.int64)])
+        self.times = np.concatenate([self.times, np.zeros((extra, self.samples))])
+        self.heads = np.concatenate([self.heads, np.zeros(extra, np.int64)])
+        self.sizes = np.concatenate([self.sizes, np.zeros(extra, np.int64)])
+        self.capacity_bps = np.concatenate([self.capacity_bps, np.full(extra, self.default_capacity_bps, np.float64)])
+
+    def _row(self, key):
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = len(self.keys)
+            self.keys.append(key)
+            if row >= len(self.heads):
+                self._grow(row + 1)
+            self.capacity_bps[row] = self.capacities.get(key, self.default_capacity_bps)
+        return row
+
+    def set_capacities(self, capacities):
+        """Link capacity in bits per second per (device, port)"""
+        with self._lock:
+            for key, capacity in capacities.items():
+                if not capacity:
+                    continue
+                self.capacities[key] = capacity
+                if key in self.rows:
+                    self.capacity_bps[self.rows[key]] = capacity
+
+    def clear(self):
+        """Forget every port's samples and rates (link capacities are kept)"""
+        with self._lock:
+            self.rows = {}
+            self.keys = []
+            self._allocate(len(self.heads))
+            self.rates = None
+            self.compute_ms = None
+
+    def record(self, statistics, now=None):
+        """Write one /statistics/ports snapshot and recompute all rates"""
+        now = time.time() if now is None else now
+        started = time.perf_counter()
+        with self._lock:
+            rows, values = [], []
+            for device in statistics:
+                device_id = device.get("device")
+                for port in device.get("ports", []):
+                    rows.append(self._row((device_id, str(port.get("port")))))
+                    values.append([int(port.get(name) or 0) for name in COUNTERS])
+            if not rows:
+                return
+
+            rows = np.asarray(rows, dtype=np.int64)
+            values = np.asarray(values, dtype=np.int64)
+            newest = (self.heads[rows] - 1) % self.samples
+            last_values = self.counters[rows, newest]
+            last_times = self.times[rows, newest]
+
+            # New ports, moved counters, or idle long enough to record a zero rate
+            due = ((self.sizes[rows] == 0)
+                   | np.any(values != last_values, axis=1)
+                   | (now - last_times >= self.idle_timeout))
+            rows, values = rows[due], values[due]
+
+            heads = self.heads[rows]
+            self.counters[rows, heads] = values
+            self.times[rows, heads] = now
+            self.heads[rows] = (heads + 1) % self.samples
+            self.sizes[rows] = np.minimum(self.sizes[rows] + 1, self.samples)
+
+            self.rates = self._compute()
+            self.ticks += 1
+            self.compute_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    def _compute(self):
+        """Rates of every port from its two newest samples"""
+        count = len(self.keys)
+        heads, sizes = self.heads[:count], self.sizes[:count]
+        index = np.arange(count)
+        newest = (heads - 1) % self.samples
+        previous = (heads - 2) % self.samples
+
+        elapsed = self.times[index, newest] - self.times[index, previous]
+        delta = (self.counters[index, newest] - self.counters[index, previous]).astype(np.float64)
+        # Not enough samples, or counters reset (switch restarted): no rate
+        valid = (sizes >= 2) & (elapsed > 0) & np.all(delta >= 0, axis=1)
+        per_second = np.where(valid[:, None], delta / np.where(elapsed > 0, elapsed, 1.0)[:, None], 0.0)
+
+        rx_bps = per_second[:, BYTES_RX] * 8
+        tx_bps = per_second[:, BYTES_TX] * 8
+        packets = per_second[:, PACKETS_RX] + per_second[:, PACKETS_TX]
+        drops = per_second[:, DROPS_RX] + per_second[:, DROPS_TX]
+        errors = per_second[:, ERRORS_RX] + per_second[:, ERRORS_TX]
+        offered = packets + drops
+
+        return {
+            "valid": valid,
+            "rx_bps": rx_bps,
+            "tx_bps": tx_bps,
+            "rx_pps": per_second[:, PACKETS_RX],
+            "tx_pps": per_second[:, PACKETS_TX],
+            "drops_pps": drops,
+            "utilization": np.maximum(rx_bps, tx_bps) / self.capacity_bps[:count],
+            "drop_ratio": np.divide(drops, offered, out=np.zeros(count), where=offered > 0),
+            "error_ratio": np.divide(errors, offered, out=np.zeros(count), where=offered > 0),
+            "interval_s": elapsed
+        }
+
+    def _port_entry(self, rates, row):
+        device_id, port = self.keys[row]
+        return {
+            "deviceId": device_id,
+            "port": port,
+            "rx_bps": round(float(rates["rx_bps"][row]), 1),
+            "tx_bps": round(float(rates["tx_bps"][row]), 1),
+            "rx_pps": round(float(rates["rx_pps"][row]), 2),
+            "tx_pps": round(float(rates["tx_pps"][row]), 2),
+            "utilization": round(float(rates["utilization"][row]), 4),
+            "drop_ratio": round(float(rates["drop_ratio"][row]), 4),
+            "error_ratio": round(float(rates["error_ratio"][row]), 4),
+            "capacity_bps": float(self.capacity_bps[row]),
+            "interval_s": round(float(rates["interval_s"][row]), 3)
+        }
+
+    def report(self, device_id=None, top=None, links=None):
+        """Per-port rates sorted by utilization, hot spots and link utilization.
+
+        links is the ONOS link list; each link is as hot as its busier end.
+        """
+        with self._lock:
+            rates = self.rates
+            if rates is None:
+                return {"ports": [], "hotspots": [], "links": [], "summary": {"ports": 0}, "ticks": self.ticks}
+
+            count = len(rates["valid"])
+            order = np.argsort(-rates["utilization"], kind="stable")
+            if device_id is not None:
+                order = [row for row in order if self.keys[row][0] == device_id]
+            ports = [self._port_entry(rates, row) for row in (order[:top] if top is not None else order)]
+
+            hot = np.flatnonzero(rates["valid"] & (
+                (rates["utilization"] >= self.hotspot_utilization)
+                | (rates["drop_ratio"] >= self.hotspot_drop_ratio)
+            ))
+            hotspots = sorted((self._port_entry(rates, row) for row in hot),
+                              key=lambda entry: entry["utilization"], reverse=True)
+
+            link_entries = []
+            for link in links or []:
+                ends = [
+                    self.rows.get((link.get(end, {}).get("device"), str(link.get(end, {}).get("port"))))
+                    for end in ("src", "dst")
+                ]
+                ends = [row for row in ends if row is not None]
+                if not ends:
+                    continue
+                link_entries.append({
+                    "src": f"{link['src']['device']}/{link['src']['port']}",
+                    "dst": f"{link['dst']['device']}/{link['dst']['port']}",
+                    "utilization": round(float(max(rates["utilization"][row] for row in ends)), 4),
+                    "drop_ratio": round(float(max(rates["drop_ratio"][row] for row in ends)), 4)
+                })
+            link_entries.sort(key=lambda entry: entry["utilization"], reverse=True)
+
+            valid = rates["valid"]
+            summary = {
+                "ports": count,
+                "reporting": int(valid.sum()),
+                "max_utilization": round(float(rates["utilization"][valid].max()), 4) if valid.any() else None,
+                "mean_utilization": round(float(rates["utilization"][valid].mean()), 4) if valid.any() else None,
+                "total_drops_pps": round(float(rates["drops_pps"].sum()), 2)
+            }
+            return {
+                "ports": ports,
+                "hotspots": hotspots,
+                "links": link_entries,
+                "summary": summary,
+                "ticks": self.ticks,
+                "compute_ms": self.compute_ms
+            }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ports": len(self.keys),
+                "allocated_rows": len(self.heads),
+                "samples": self.samples,
+                "bytes_allocated": int(self.counters.nbytes + self.times.nbytes),
+                "ticks": self.ticks,
+                "compute_ms": self.compute_ms
+            }
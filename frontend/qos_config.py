@@ -0,0 +1,210 @@
+"""Configured OVS QoS read from OVSDB.
+
+The QoS, Queue and Port tables are read in a single OVSDB transaction over
+the shared ovsdb-server connection and parsed into port -> qos -> queue id
+-> rates.
+"""
+import time
+import ovsdb_client
+
+RATE_KEYS = {"max_rate": "max-rate", "min_rate": "min-rate"}
+
+COLUMNS = {
+    "QoS": ["_uuid", "type", "other_config", "queues"],
+    "Queue": ["_uuid", "other_config"],
+    "Port": ["name", "qos"],
+}
+
+
+def read_tables(client=None):
+    """QoS, Queue and Port rows in one transaction"""
+    client = client or ovsdb_client.get_client()
+    results = client.transact(*[ovsdb_client.select(table, columns) for table, columns in COLUMNS.items()])
+    return {table: ovsdb_client.rows(result) for table, result in zip(COLUMNS, results)}
+
+
+def rate(config, key):
+    value = config.get(key) if isinstance(config, dict) else None
+    return int(value) if value not in (None, "") else None
+
+
+def build_model(tables, classes=None):
+    """port -> qos uuid, and each qos with its queues by queue id.
+
+    classes (queue id -> class, see queue_stats.queue_classes) labels the
+    queues with their traffic class.
+    """
+    classes = classes or {}
+    queues = {
+        row["_uuid"]: {
+            "uuid": row["_uuid"],
+            "max_rate": rate(row.get("other_config"), "max-rate"),
+            "min_rate": rate(row.get("other_config"), "min-rate")
+        }
+        for row in tables.get("Queue", [])
+    }
+
+    qos = {}
+    for row in tables.get("QoS", []):
+        qos_queues = {}
+        for queue_id, queue_uuid in (row.get("queues") or {}).items():
+            queue_id = int(queue_id)
+            queue_class = classes.get(queue_id, {})
+            qos_queues[queue_id] = dict(
+                queues.get(queue_uuid, {"uuid": queue_uuid, "max_rate": None, "min_rate": None}),
+                **{key: queue_class[key] for key in ("queue", "subnet", "service", "profile") if key in queue_class}
+            )
+        qos[row["_uuid"]] = {
+            "uuid": row["_uuid"],
+            "type": row.get("type"),
+            "max_rate": rate(row.get("other_config"), "max-rate"),
+            "queues": dict(sorted(qos_queues.items())),
+            "ports": []
+        }
+
+    ports = {}
+    for row in tables.get("Port", []):
+        qos_uuid = row.get("qos")
+        if isinstance(qos_uuid, str) and qos_uuid:
+            ports[row["name"]] = qos_uuid
+            if qos_uuid in qos:
+                qos[qos_uuid]["ports"].append(row["name"])
+    for entry in qos.values():
+        entry["ports"].sort()
+
+    return {"ports": dict(sorted(ports.items())), "qos": list(qos.values()), "queue_count": len(queues)}
+
+
+def main_qos(model):
+    """The QoS attached to the most ports (the host-port QoS)"""
+    return max(model["qos"], key=lambda entry: len(entry["ports"])) if model["qos"] else None
+
+
+def bandwidth_limits(model, queue_ids):
+    """Configured rates of each "subnet_service" class on the busiest QoS.
+
+    queue_ids maps "subnet_service" to the queue id the active flow rules
+    steer that class into.
+    """
+    qos = main_qos(model)
+    if qos is None:
+        return {}
+    limits = {}
+    for name, queue_id in queue_ids.items():
+        queue = qos["queues"].get(queue_id)
+        if queue is not None:
+            limits[name] = {"queue_id": queue_id, "max_rate": queue["max_rate"], "min_rate": queue["min_rate"]}
+    return limits
+
+
+def load(classes=None):
+    """Read OVSDB and build the model, with the read time in ms"""
+    started = time.perf_counter()
+    model = build_model(read_tables(), classes)
+    model["read_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return model
+
+
+def queue_rate_operations(model, changes, total_max_rate):
+    """Validated OVSDB mutations setting new max/min-rates on existing queues.
+
+    changes is a list of {"queue_id" or "queue", "max_rate", "min_rate"};
+    a rate that is left out keeps its value, a null min_rate removes it.
+    Raises ValueError when a change is invalid.
+    """
+    qos = main_qos(model)
+    if qos is None:
+        raise ValueError("No QoS is configured in OVS")
+    limit = total_max_rate or qos["max_rate"]
+    by_name = {queue.get("queue"): queue_id for queue_id, queue in qos["queues"].items() if queue.get("queue")}
+
+    rates = {queue_id: {"max_rate": queue["max_rate"], "min_rate": queue["min_rate"]} for queue_id, queue in qos["queues"].items()}
+    changed = {}
+    for change in changes:
+        queue_id = change.get("queue_id")
+        if queue_id is None:
+            queue_id = by_name.get(change.get("queue"))
+        try:
+            queue_id = int(queue_id)
+        except (TypeError, ValueError):
+            raise ValueError(f"Unknown queue: {change.get('queue_id', change.get('queue'))}")
+        if queue_id not in rates:
+            raise ValueError(f"Queue {queue_id} does not exist")
+
+        for key in RATE_KEYS:
+            if key not in change:
+                continue
+            value = change[key]
+            if value is None and key == "min_rate":
+                rates[queue_id][key] = None
+            elif isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                raise ValueError(f"Queue {queue_id}: {key} must be a non-negative integer (bits per second)")
+            else:
+                rates[queue_id][key] = value
+            changed.setdefault(queue_id, set()).add(key)
+
+    for queue_id in changed:
+        max_rate, min_rate = rates[queue_id]["max_rate"], rates[queue_id]["min_rate"]
+        if not max_rate:
+            raise ValueError(f"Queue {queue_id}: max_rate must be greater than 0")
+        if limit and max_rate > limit:
+            raise ValueError(f"Queue {queue_id}: max_rate {max_rate} exceeds TOTAL_MAX_RATE {limit}")
+        if min_rate is not None and min_rate > max_rate:
+            raise ValueError(f"Queue {queue_id}: min_rate {min_rate} exceeds its max_rate {max_rate}")
+    guaranteed = sum(entry["min_rate"] or 0 for entry in rates.values())
+    if limit and guaranteed > limit:
+        raise ValueError(f"Sum of min_rate over all queues ({guaranteed}) exceeds TOTAL_MAX_RATE {limit}")
+
+    operations, updated = [], []
+    for queue_id, keys in sorted(changed.items()):
+        names = [RATE_KEYS[key] for key in sorted(keys)]
+        values = {RATE_KEYS[key]: str(rates[queue_id][key]) for key in sorted(keys) if rates[queue_id][key] is not None}
+        # Replace only the rate keys; other other_config keys of the queue are kept
+        mutations = [["other_config", "delete", ovsdb_client.ovs_set(names)]]
+        if values:
+            mutations.append(["other_config", "insert", ovsdb_client.ovs_map(values)])
+        operations.append(ovsdb_client.mutate(
+            "Queue", [["_uuid", "==", ovsdb_client.uuid(qos["queues"][queue_id]["uuid"])]], mutations
+        ))
+        updated.append(dict(rates[queue_id], queue_id=queue_id, queue=qos["queues"][queue_id].get("queue")))
+    return operations, updated
+
+
+def apply_queue_rates(changes, total_max_rate, classes=None, client=None, wait_timeout=5.0):
+    """Update queue rates in one transaction and wait for ovs-vswitchd to apply them.
+
+    Like ovs-vsctl, the transaction bumps next_cfg; the change is applied
+    once ovs-vswitchd reports the same cur_cfg.
+    """
+    client = client or ovsdb_client.get_client()
+    started = time.perf_counter()
+    operations, updated = queue_rate_operations(build_model(read_tables(client), classes), changes, total_max_rate)
+    if not operations:
+        raise ValueError("No queue rates to update")
+
+    operations += [
+        ovsdb_client.mutate("Open_vSwitch", [], [["next_cfg", "+=", 1]]),
+        ovsdb_client.select("Open_vSwitch", ["next_cfg"])
+    ]
+    submitted = time.perf_counter()
+    results = client.transact(*operations)
+    committed = time.perf_counter()
+
+    target = results[-1]["rows"][0]["next_cfg"]
+    applied = False
+    while time.perf_counter() - committed < wait_timeout:
+        if client.select("Open_vSwitch", ["cur_cfg"])[0]["cur_cfg"] >= target:
+            applied = True
+            break
+        time.sleep(0.01)
+    finished = time.perf_counter()
+
+    return {
+        "updated": updated,
+        "operations": len(operations),
+        "transactions": 1,
+        "applied": applied,
+        "validate_ms": round((submitted - started) * 1000, 1),
+        "commit_ms": round((committed - submitted) * 1000, 1),
+        "apply_ms": round((finished - started) * 1000, 1)
+    }
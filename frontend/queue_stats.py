@@ -0,0 +1,166 @@
+"""OVS queue statistics of the linux-htb queues on host-facing ports.
+
+One `ovs-ofctl queue-stats` per bridge returns the tx counters of every
+queue on every port of that bridge; the bridges are read in parallel, so a
+poll costs one process launch per switch regardless of how many queues
+there are. Consecutive polls are turned into per-queue rates and summed per
+traffic class (student/faculty x mail/RTMP/call).
+"""
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUE_STATS_RE = re.compile(
+    r'port\s+"?([^":\s]+)"?\s+queue\s+(\d+):\s+bytes=(\d+),\s*pkts=(\d+),\s*errors=(\d+)'
+)
+QUEUE_NAME_RE = re.compile(r"^q([123])([sf])(\d*)$")
+
+SERVICES = {"1": "mail", "2": "rtmp", "3": "call"}
+SUBNETS = {"s": "student", "f": "faculty"}
+
+
+def queue_classes(queue_config, total_max_rate):
+    """Queue id -> class and configured max-rate.
+
+    Queue ids follow the order of QUEUE_CONFIG, as assigned by
+    setup_qos_on_host_ports() (queues:1=@q1s, queues:2=@q2s, ...).
+    """
+    classes = {}
+    for queue_id, (name, share) in enumerate(queue_config.items(), start=1):
+        match = QUEUE_NAME_RE.match(name)
+        classes[queue_id] = {
+            "queue": name,
+            "subnet": SUBNETS[match.group(2)] if match else None,
+            "service": SERVICES[match.group(1)] if match else None,
+            "profile": int(match.group(3) or 1) if match else None,
+            "max_rate": int(total_max_rate * share)
+        }
+    return classes
+
+
+def parse_queue_stats(output):
+    """(port, queue id, bytes, packets, errors) of each queue in ovs-ofctl output"""
+    return [
+        (port, int(queue), int(byte_count), int(packets), int(errors))
+        for port, queue, byte_count, packets, errors in QUEUE_STATS_RE.findall(output)
+    ]
+
+
+def read_bridge(bridge, timeout=5.0):
+    """Queue counters of one bridge"""
+    result = subprocess.run(
+        ['sudo', 'ovs-ofctl', '-O', 'OpenFlow13', '--names', 'queue-stats', bridge],
+        capture_output=True, text=True, timeout=timeout
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ovs-ofctl exited with {result.returncode}")
+    return parse_queue_stats(result.stdout)
+
+
+def read_bridges(bridges, workers=8, timeout=5.0):
+    """Queue counters of all bridges, read in parallel.
+
+    Returns {"samples": [...], "errors": {bridge: message}, "read_ms": ...};
+    a failing bridge does not hide the others.
+    """
+    started = time.perf_counter()
+    samples, errors = [], {}
+    if bridges:
+        with ThreadPoolExecutor(max_workers=min(workers, len(bridges))) as pool:
+            futures = {bridge: pool.submit(read_bridge, bridge, timeout) for bridge in bridges}
+            for bridge, future in futures.items():
+                try:
+                    for port, queue, byte_count, packets, errors_count in future.result():
+                        samples.append({
+                            "bridge": bridge, "port": port, "queue_id": queue,
+                            "tx_bytes": byte_count, "tx_packets": packets, "tx_errors": errors_count
+                        })
+                except Exception as e:
+                    errors[bridge] = str(e)
+    return {"samples": samples, "errors": errors, "read_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+class QueueRates:
+    """Per-queue tx rates from consecutive counter reads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = {}         # (bridge, port, queue id) -> (time, bytes, packets, errors)
+        self.queues = []        # latest per-queue entries
+        self.errors = {}
+        self.read_ms = None
+        self.updated_at = None
+        self.resets = 0
+
+    def record(self, reading, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            last, queues = {}, []
+            for sample in reading.get("samples", []):
+                key = (sample["bridge"], sample["port"], sample["queue_id"])
+                counters = (sample["tx_bytes"], sample["tx_packets"], sample["tx_errors"])
+                last[key] = (now,) + counters
+                entry = dict(sample, tx_bps=None, tx_pps=None, errors_ps=None)
+
+                previous = self._last.get(key)
+                if previous is not None and now > previous[0]:
+                    if any(value < old for value, old in zip(counters, previous[1:])):
+                        self.resets += 1    # queue recreated, counters started over
+                    else:
+                        elapsed = now - previous[0]
+                        entry["tx_bps"] = round((counters[0] - previous[1]) * 8 / elapsed, 1)
+                        entry["tx_pps"] = round((counters[1] - previous[2]) / elapsed, 2)
+                        entry["errors_ps"] = round((counters[2] - previous[3]) / elapsed, 2)
+                queues.append(entry)
+
+            self._last = last
+            self.queues = queues
+            self.errors = reading.get("errors", {})
+            self.read_ms = reading.get("read_ms")
+            self.updated_at = now
+
+    def clear(self):
+        with self._lock:
+            self._last = {}
+            self.queues = []
+            self.errors = {}
+            self.updated_at = None
+
+    def report(self, classes=None, bridge=None):
+        """Per-queue rates plus totals per (subnet, service).
+
+        classes is queue_classes() of the running topology; each queue is
+        also reported against its configured max-rate, which is per port.
+        """
+        classes = classes or {}
+        with self._lock:
+            queues = [dict(entry) for entry in self.queues if bridge is None or entry["bridge"] == bridge]
+            meta = {"errors": dict(self.errors), "read_ms": self.read_ms, "updated_at": self.updated_at}
+
+        totals = {}
+        for entry in queues:
+            queue_class = classes.get(entry["queue_id"], {})
+            entry.update(queue_class)
+            if entry["tx_bps"] is not None and queue_class.get("max_rate"):
+                entry["utilization"] = round(entry["tx_bps"] / queue_class["max_rate"], 4)
+
+            if not queue_class.get("subnet"):
+                continue
+            subnet = totals.setdefault(queue_class["subnet"], {})
+            service = subnet.setdefault(queue_class["service"], {
+                "tx_bps": 0.0, "tx_pps": 0.0, "errors_ps": 0.0, "tx_bytes": 0, "tx_packets": 0, "queues": 0
+            })
+            service["queues"] += 1
+            service["tx_bytes"] += entry["tx_bytes"]
+            service["tx_packets"] += entry["tx_packets"]
+            for rate in ("tx_bps", "tx_pps", "errors_ps"):
+                service[rate] = round(service[rate] + (entry[rate] or 0.0), 2)
+
+        queues.sort(key=lambda entry: (entry["bridge"], entry["port"], entry["queue_id"]))
+        return {"queues": queues, "classes": totals, **meta}
+
+    def stats(self):
+        with self._lock:
+            return {"queues": len(self.queues), "read_ms": self.read_ms, "resets": self.resets, "errors": len(self.errors)}
@@ -1,17 +1,37 @@
 import subprocess
 import json
 import os
-import requests
 import importlib
 import time
-from requests.auth import HTTPBasicAuth
-from flask import render_template, jsonify, request
+import gzip
+import hashlib
+import threading
+import re
+import math
+from flask import render_template, jsonify, request, Response
 from app import app
 # Import from backend directory
 import sys
 import os
 sys.path.append('../backend/topologies')  # Add topology directory to Python path
 sys.path.append('../backend/flowrules')   # Add flowrules directory to Python path
+sys.path.append('../backend/common')      # Add shared backend modules to Python path
+
+import onos_client
+import ovsdb_client
+import flow_injector
+import flow_compiler
+import iperf_runner
+import test_results
+from onos_client import ONOS_IP, ONOS_PORT, ONOS_USERNAME
+from snapshot_cache import SnapshotCache
+import network_state
+import flow_index
+import flow_series
+import port_stats
+import queue_stats
+import qos_config
+import jobs
 
 # Default modules
 current_topology = None
@@ -20,11 +40,160 @@ current_flow_rule = None
 # Global network instance
 net = None
 
-# ONOS configuration - can be overridden by environment variables
-ONOS_IP = os.getenv("ONOS_IP", "127.0.0.1")
-ONOS_PORT = os.getenv("ONOS_PORT", "8181")
-ONOS_USERNAME = os.getenv("ONOS_USERNAME", "onos")
-ONOS_PASSWORD = os.getenv("ONOS_PASSWORD", "rocks")
+# Shared pooled ONOS REST client
+onos = onos_client.get_client()
+
+# Coalesced ONOS snapshots shared by all pollers (TTL in seconds per resource)
+snapshots = SnapshotCache({
+    "devices": float(os.getenv("SNAPSHOT_TTL_DEVICES", "5")),
+    "flows": float(os.getenv("SNAPSHOT_TTL_FLOWS", "3")),
+    "qos": float(os.getenv("SNAPSHOT_TTL_QOS", "300")),
+})
+
+# Background collector keeping the latest ONOS state in memory (poll interval in seconds per resource);
+# it only polls while a network is running
+COLLECTOR_ENABLED = os.getenv("COLLECTOR_ENABLED", "1") != "0"
+state = network_state.StateStore()
+collector = network_state.Collector(state, active=lambda: net is not None)
+collector.register("devices", onos.get_devices, float(os.getenv("COLLECT_INTERVAL_DEVICES", "2")))
+collector.register("flows", onos.get_flows, float(os.getenv("COLLECT_INTERVAL_FLOWS", "2")))
+collector.register("ports", onos.get_ports, float(os.getenv("COLLECT_INTERVAL_PORTS", "5")))
+collector.register("links", onos.get_links, float(os.getenv("COLLECT_INTERVAL_LINKS", "5")))
+
+# Typed change events pushed to the pages over /api/stream
+events = network_state.EventBus()
+STREAM_KEEPALIVE = float(os.getenv("STREAM_KEEPALIVE", "15"))
+
+def publish_status():
+    """Push the network running state and device count"""
+    snapshot = state.get("devices")
+    devices = snapshot.value if snapshot is not None and net is not None else []
+    events.publish("status", {"network_running": net is not None, "device_count": len(devices)})
+
+def publish_state_change(resource, old_value, new_value, version):
+    """Turn collector snapshot changes into stream events"""
+    if old_value is None:
+        # First collection: pages already loaded this state themselves
+        return
+    if resource == "devices":
+        for change in network_state.device_changes(old_value, new_value):
+            events.publish("device", change)
+        publish_status()
+    elif resource == "flows":
+        delta = network_state.flow_delta(old_value, new_value)
+        if delta is not None:
+            events.publish("flows", dict(delta, total=len(new_value), version=version))
+
+state.add_listener(publish_state_change)
+
+@app.before_request
+def start_collector():
+    """Start the collector with the first request (so the reloader parent never runs it)"""
+    if COLLECTOR_ENABLED:
+        collector.ensure_started()
+
+# Index over the latest flow snapshot, updated incrementally by the collector
+flows_index = flow_index.FlowIndex()
+
+def index_flows(resource, old_value, new_value, version):
+    if resource == "flows":
+        flows_index.update(new_value)
+
+state.add_listener(index_flows)
+
+# Per-flow counter history sampled from every collected flow snapshot
+flow_counters = flow_series.FlowSeriesStore(
+    capacity=int(os.getenv("FLOW_SERIES_SAMPLES", "120")),
+    max_flows=int(os.getenv("FLOW_SERIES_MAX_FLOWS", "10000"))
+)
+
+def record_flow_counters(resource, old_value, new_value, version):
+    if resource == "flows":
+        flow_counters.record(new_value)
+
+state.add_listener(record_flow_counters, changes_only=False)
+
+# Port counters, rates and utilization (capacity from ONOS port speed unless PORT_CAPACITY_MBPS is set)
+PORT_CAPACITY_MBPS = os.getenv("PORT_CAPACITY_MBPS")
+port_engine = port_stats.PortStatsEngine(
+    samples=int(os.getenv("PORT_STATS_SAMPLES", "60")),
+    idle_timeout=float(os.getenv("PORT_STATS_IDLE_TIMEOUT", "15")),
+    hotspot_utilization=float(os.getenv("PORT_HOTSPOT_UTILIZATION", "0.8")),
+    hotspot_drop_ratio=float(os.getenv("PORT_HOTSPOT_DROP_RATIO", "0.01")),
+    default_capacity_bps=float(PORT_CAPACITY_MBPS or 1000) * 1e6
+)
+collector.register("port_stats", onos.get_port_statistics, float(os.getenv("COLLECT_INTERVAL_PORT_STATS", "5")))
+
+def record_port_stats(resource, old_value, new_value, version):
+    if resource == "port_stats":
+        port_engine.record(new_value)
+        snapshot = state.get("links")
+        report = port_engine.report(top=10, links=snapshot.value if snapshot else None)
+        report["links"] = report["links"][:10]
+        events.publish("port_stats", report)
+    elif resource == "ports" and not PORT_CAPACITY_MBPS:
+        port_engine.set_capacities({
+            (port.get("element"), str(port.get("port"))): port["portSpeed"] * 1e6
+            for port in new_value if port.get("portSpeed")
+        })
+
+state.add_listener(record_port_stats, changes_only=False)
+
+# Tx counters of the OVS QoS queues, one ovs-ofctl per switch read in parallel
+queue_rates = queue_stats.QueueRates()
+QUEUE_STATS_WORKERS = int(os.getenv("QUEUE_STATS_WORKERS", "8"))
+
+def read_queue_stats():
+    if net is None:
+        return {"samples": [], "errors": {}, "read_ms": 0}
+    return queue_stats.read_bridges([switch.name for switch in net.switches], workers=QUEUE_STATS_WORKERS)
+
+collector.register("queue_stats", read_queue_stats, float(os.getenv("COLLECT_INTERVAL_QUEUES", "5")))
+
+def record_queue_stats(resource, old_value, new_value, version):
+    if resource == "queue_stats":
+        queue_rates.record(new_value)
+        if new_value.get("samples"):
+            report = queue_rates.report(topology_queue_classes())
+            events.publish("queue_stats", {"classes": report["classes"], "errors": report["errors"]})
+
+state.add_listener(record_queue_stats, changes_only=False)
+
+def reset_state():
+    """Forget the collected state of a stopped network"""
+    state.clear()
+    flows_index.update([])
+    flow_counters.clear()
+    port_engine.clear()
+    queue_rates.clear()
+
+def topology_queue_classes():
+    """Queue id -> class and max-rate of the selected topology"""
+    queue_config = getattr(current_topology, 'QUEUE_CONFIG', None)
+    if not queue_config:
+        return {}
+    return queue_stats.queue_classes(queue_config, getattr(current_topology, 'TOTAL_MAX_RATE', 0))
+
+# /api/flows responses at least this large are gzipped for clients accepting it
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 5
+
+def read_state(resource, loader):
+    """Latest value of a resource plus its snapshot age/version.
+
+    Served from the collector's store; until the collector has fetched the
+    resource once (or when it is disabled) it is read through the cache.
+    """
+    snapshot = state.get(resource)
+    if snapshot is not None:
+        return snapshot.value, snapshot.meta()
+    value = snapshots.get(resource, loader)
+    age = snapshots.age(resource)
+    return value, {
+        "snapshot_age": round(age, 3) if age is not None else 0.0,
+        "snapshot_version": None,
+        "snapshot_error": None
+    }
 
 @app.route("/")
 def dashboard():
@@ -69,7 +238,15 @@ def start_network():
             return jsonify({"status": "error", "message": "No topology selected"}), 400
 
         net = current_topology.run()
-        return jsonify({"status": "success", "message": "Network started successfully"})
+        snapshots.invalidate()
+        watch_qos_tables()
+        collector.refresh()
+        publish_status()
+        return jsonify({
+            "status": "success",
+            "message": "Network started successfully",
+            "qos": getattr(current_topology, 'qos_timings', {}).get("setup")
+        })
     except Exception as e:
         app.logger.error(f"Error starting network: {str(e)}")
         return jsonify({"status": "error", "message": f"Failed to start network: {str(e)}"}), 500
@@ -82,9 +259,15 @@ def stop_network():
         if net is None:
             return jsonify({"status": "error", "message": "Network is not running"}), 400
 
+        # Remove the QoS and queues of this run in one transaction
+        qos_report = current_topology.cleanup_qos() if hasattr(current_topology, 'cleanup_qos') else None
+
         net.stop()
         net = None
-        return jsonify({"status": "success", "message": "Network stopped successfully"})
+        snapshots.invalidate()
+        reset_state()
+        publish_status()
+        return jsonify({"status": "success", "message": "Network stopped successfully", "qos": qos_report})
     except Exception as e:
         app.logger.error(f"Error stopping network: {str(e)}")
         return jsonify({"status": "error", "message": f"Failed to stop network: {str(e)}"}), 500
@@ -97,10 +280,10 @@ def network_status():
         is_running = net is not None
 
         # Get device information from ONOS
-        devices = []
+        devices, snapshot = [], {}
         try:
             if is_running:
-                devices = get_onos_devices()
+                devices, snapshot = get_onos_devices()
         except Exception as e:
             app.logger.error(f"Error getting ONOS devices: {str(e)}")
             # Don't fail the entire status call for ONOS errors
@@ -109,7 +292,8 @@ def network_status():
             "status": "success",
             "network_running": is_running,
             "devices": devices,
-            "device_count": len(devices)
+            "device_count": len(devices),
+            **snapshot
         })
     except Exception as e:
         app.logger.error(f"Error in network_status: {str(e)}")
@@ -121,238 +305,398 @@ def network_status():
             "device_count": 0
         }), 500
 
-@app.route("/api/pingall")
-def ping_all():
-    """Run ping test between all hosts"""
-    global net, current_topology
+# Long-running tests also run as background jobs (JOB_WORKERS at a time, results kept JOB_RETENTION seconds)
+job_manager = jobs.JobManager(
+    max_workers=int(os.getenv("JOB_WORKERS", "2")),
+    retention=float(os.getenv("JOB_RETENTION", "3600"))
+)
+job_manager.add_listener(lambda job: events.publish("job", job.summary()))
+
+# Seconds each iperf client sends for
+IPERF_DURATION = int(os.getenv("IPERF_DURATION", "2"))
+
+# Latency matrix: pings per host pair and seconds between them
+PING_COUNT = int(os.getenv("PING_COUNT", "3"))
+PING_INTERVAL = float(os.getenv("PING_INTERVAL", "0.2"))
+
+# UDP sweep: seconds and offered rate (iperf -b) of every client
+UDP_DURATION = int(os.getenv("UDP_DURATION", "5"))
+UDP_BANDWIDTH = os.getenv("UDP_BANDWIDTH", "30M")
+
+# Topology test functions drive the hosts' shells, which cannot be shared between tests
+host_shell_lock = threading.Lock()
+
+TEST_FAILURES = {
+    "pingall": "Ping test failed",
+    "iperf": "TCP multithreaded iPerf test failed",
+    "iperf_server": "iPerf test failed",
+    "udp": "UDP test failed"
+}
+
+class TestRequestError(Exception):
+    """A test cannot run in the current network state or with the given parameters"""
+
+def stop_shell_processes(network, pattern, done):
+    """Kill matching processes started from the hosts' shells until done is set.
+
+    Topology tests run their commands one after another, so every kill only
+    ends the current command; the loop keeps killing until the test returns.
+    """
+    def kill_loop():
+        while not done.is_set():
+            for host in network.hosts:
+                subprocess.run(["pkill", "-P", str(host.pid), pattern],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            done.wait(0.2)
+
+    threading.Thread(target=kill_loop, name="test-cancel", daemon=True).start()
+
+def pingall_test(network, topology, count, interval, job=None):
+    """Ping between all hosts: latency matrix of the topology, or net.pingAll()"""
+    done = threading.Event()
+    events.publish("test", {"test": "pingall", "phase": "started"})
     try:
-        if net is None:
-            return jsonify({"status": "error", "message": "Network is not running"}), 400
-
-        if current_topology is None:
-            return jsonify({"status": "error", "message": "No topology selected"}), 400
-
-        # Check if topology has ping_all function, otherwise use net.pingAll()
-        if hasattr(current_topology, 'ping_all'):
-            result = current_topology.ping_all(net)
-        else:
-            result = net.pingAll()
-
-        # Calculate packet statistics
-        if isinstance(result, (int, float)):
-            packet_loss_percent = result
-            # Estimate based on network size and typical ping behavior
-            student_number = getattr(current_topology, 'student_number', 8)
-            faculty_number = getattr(current_topology, 'faculty_number', 8)
-            total_hosts = student_number + faculty_number + 3  # +3 for servers
-            total_possible_connections = total_hosts * (total_hosts - 1)
-
-            dropped_packets = int((packet_loss_percent / 100.0) * total_possible_connections)
-            successful_packets = total_possible_connections - dropped_packets
+        if hasattr(topology, 'ping_all'):
+            # Every host pings all others at once from its own process, no host shell involved
+            report = topology.ping_all(network, count=count, interval=interval,
+                                       on_start=(lambda probe: job.on_cancel(probe.cancel)) if job is not None else None)
         else:
-            packet_loss_percent = "Unknown"
-            total_possible_connections = "Unknown"
-            dropped_packets = "Unknown"
-            successful_packets = "Unknown"
-
-        return jsonify({
-            "status": "success", 
-            "message": "Full network ping test completed successfully",
-            "result": str(result),
-            "packet_loss": f"{packet_loss_percent}%" if isinstance(packet_loss_percent, (int, float)) else packet_loss_percent,
-            "total_packets": total_possible_connections,
-            "dropped_packets": dropped_packets,
-            "successful_packets": successful_packets
-        })
+            if job is not None:
+                job.on_cancel(lambda: stop_shell_processes(network, "ping", done))
+            with host_shell_lock:
+                if job is not None:
+                    job.check_cancelled()
+                # Topologies without a ping_all() report only the loss percentage
+                report = test_results.PingReport.from_loss(len(network.hosts), network.pingAll())
+    except jobs.JobCancelled:
+        raise
     except Exception as e:
-        app.logger.error(f"Error running ping test: {str(e)}")
-        return jsonify({"status": "error", "message": f"Ping test failed: {str(e)}"}), 500
+        events.publish("test", {"test": "pingall", "phase": "failed", "message": str(e)})
+        raise
+    finally:
+        done.set()
+    events.publish("test", {"test": "pingall", "phase": "cancelled" if getattr(report, "cancelled", False) else "finished"})
+
+    return {
+        "message": "Full network ping test completed successfully",
+        "result": test_results.format_report(report),
+        "packet_loss": f"{report.loss_pct}%",
+        "total_packets": report.sent,
+        "dropped_packets": report.dropped,
+        "successful_packets": report.received,
+        "report": report.to_dict()
+    }
 
-def run_iperf():
+def iperf_test(network, topology, server, duration, job=None):
     """Run iPerf TCP multithreaded performance test using topology function"""
-    global net, current_topology
-    try:
-        if net is None:
-            return jsonify({"status": "error", "message": "Network is not running"}), 400
-
-        if current_topology is None:
-            return jsonify({"status": "error", "message": "No topology selected"}), 400
-
-        # Check if the topology has the required function
-        if not hasattr(current_topology, 'run_iperf_multithreaded_tcp'):
-            return jsonify({"status": "error", "message": "Selected topology does not support multithreaded TCP testing"}), 400
-
-        # Capture output from the multithreaded TCP function
-        import io
-        import sys
-        from contextlib import redirect_stdout, redirect_stderr
-
-        # Create string buffers to capture output
-        output_buffer = io.StringIO()
-        error_buffer = io.StringIO()
-
-        # Use the actual TCP multithreaded function from topology with correct parameters
-        with redirect_stdout(output_buffer), redirect_stderr(error_buffer):
-            current_topology.run_iperf_multithreaded_tcp(net, num_requests=3)
-
-        # Get the captured output
-        output_text = output_buffer.getvalue()
-        error_text = error_buffer.getvalue()
+    done = threading.Event()
+    if job is not None:
+        # Latency pings run in the host shells, the iperf clients as processes of each round's test
+        job.on_cancel(lambda: stop_shell_processes(network, "ping", done))
 
-        # Parse the results from the topology function output
-        results = parse_tcp_multithreaded_results(output_text)
-
-        return jsonify({
-            "status": "success", 
-            "message": "TCP multithreaded iPerf test completed successfully",
-            "results": results,
-            "raw_output": output_text if output_text else "No output captured",
-            "error_output": error_text if error_text else None
-        })
+    def progress(host_name, completed, total):
+        events.publish("test", {"test": "iperf", "server": server, "phase": "progress", "host": host_name,
+                                "completed": completed, "total": total})
+        if job is not None:
+            job.update(completed=completed, total=total, host=host_name)
 
+    try:
+        with host_shell_lock:
+            if job is not None:
+                job.check_cancelled()
+            events.publish("test", {"test": "iperf", "server": server, "phase": "started"})
+            report = topology.run_iperf_multithreaded_tcp(
+                network, num_requests=3, server_name=server, duration=duration, progress=progress,
+                on_start=(lambda test: job.on_cancel(test.cancel)) if job is not None else None
+            )
+            events.publish("test", {"test": "iperf", "server": server,
+                                    "phase": "cancelled" if report.cancelled else "finished"})
+    except jobs.JobCancelled:
+        raise
     except Exception as e:
-        app.logger.error(f"Error running TCP multithreaded iPerf test: {str(e)}")
-        return jsonify({"status": "error", "message": f"TCP multithreaded iPerf test failed: {str(e)}"}), 500
-
-@app.route("/api/iperf")
-def call_run_iperf():
-    return run_iperf()
+        events.publish("test", {"test": "iperf", "server": server, "phase": "failed", "message": str(e)})
+        raise
+    finally:
+        done.set()
+
+    return {
+        "message": f"TCP multithreaded iPerf test to {server} {'cancelled after' if report.cancelled else 'completed in'} {report.wall_clock_s:.1f}s",
+        "results": tcp_results(report),
+        "raw_output": test_results.format_report(report),
+        "report": report.to_dict()
+    }
 
-@app.route("/api/iperf/<server_name>")
-def run_iperf_server(server_name):
-    """Run iPerf test to specific server"""
-    global net
-    try:
-        if net is None:
-            return jsonify({"status": "error", "message": "Network is not running"}), 400
+def tcp_results(report):
+    """Per-host requests and summary of a TCP report, as the Monitoring page shows them"""
+    results = {"server": report.server, "student_results": {}, "faculty_results": {}, "errors": report.errors()}
+    for m in report.measurements:
+        if m.error is None:
+            results[f"{m.group}_results"].setdefault(m.host, []).append({
+                "request": m.request,
+                "bandwidth": m.bandwidth_mbps,
+                "latency": m.latency_ms
+            })
 
-        if server_name not in ['srv1', 'srv2', 'srv3']:
-            return jsonify({"status": "error", "message": "Invalid server name"}), 400
+    summary = report.summary()
+    results["summary"] = {
+        "total_tests": summary.tests if summary else 0,
+        "avg_bandwidth": summary.avg_bandwidth_mbps if summary else 0,
+        "max_bandwidth": summary.max_bandwidth_mbps if summary else 0,
+        "min_bandwidth": summary.min_bandwidth_mbps if summary else 0
+    }
+    for group, entry in report.groups().items():
+        if entry:
+            results["summary"][f"{group}_avg_bandwidth"] = entry.avg_bandwidth_mbps
+            results["summary"][f"{group}_avg_latency"] = entry.avg_latency_ms
+    return results
 
-        # Get topology info for host counts
-        student_number = getattr(current_topology, 'student_number', 8)
-        faculty_number = getattr(current_topology, 'faculty_number', 8)
+def iperf_server_test(network, topology, server, duration, wave_size, job=None):
+    """Run iPerf test from all student and faculty hosts to one server"""
+    # Get topology info for host counts
+    student_number = getattr(topology, 'student_number', 8)
+    faculty_number = getattr(topology, 'faculty_number', 8)
+
+    student_hosts = [network.get(f'h{i+1}s') for i in range(student_number)]
+    faculty_hosts = [network.get(f'h{i+1}f') for i in range(faculty_number)]
+    total_tests = len(student_hosts) + len(faculty_hosts)
+
+    def progress(host_name, report, completed, total):
+        events.publish("test", {"test": "iperf", "server": server, "phase": "progress", "host": host_name,
+                                "completed": completed, "total": total})
+        if job is not None:
+            job.update(completed=completed, total=total, host=host_name)
+
+    test = iperf_runner.IperfTest(network.get(server), student_hosts + faculty_hosts, duration=duration,
+                                  wave_size=wave_size, progress=progress)
+    if job is not None:
+        job.update(completed=0, total=total_tests)
+        job.on_cancel(test.cancel)
+        job.check_cancelled()
+    events.publish("test", {"test": "iperf", "server": server, "phase": "started", "completed": 0, "total": total_tests})
+    try:
+        run = test.run()
+    except Exception as e:
+        events.publish("test", {"test": "iperf", "server": server, "phase": "failed", "message": str(e)})
+        raise
+    events.publish("test", {"test": "iperf", "server": server, "phase": "cancelled" if run["cancelled"] else "finished",
+                            "completed": len(run["results"]), "total": total_tests})
 
-        # Run targeted test to specific server
-        server = net.get(server_name)
-        student_hosts = [net.get(f'h{i+1}s') for i in range(student_number)]
-        faculty_hosts = [net.get(f'h{i+1}f') for i in range(faculty_number)]
+    reports = run["results"]
+    results = {
+        "server": server,
+        "student_results": {host.name: reports.get(host.name, {}).get("bandwidth_mbps", 0.0) for host in student_hosts},
+        "faculty_results": {host.name: reports.get(host.name, {}).get("bandwidth_mbps", 0.0) for host in faculty_hosts},
+        "errors": {name: report["error"] for name, report in reports.items() if "error" in report},
+        "summary": {}
+    }
 
-        results = {
-            "server": server_name,
-            "student_results": {},
-            "faculty_results": {},
-            "summary": {}
+    # Calculate summary
+    all_results = list(results["student_results"].values()) + list(results["faculty_results"].values())
+    if all_results:
+        results["summary"] = {
+            "avg_bandwidth": sum(all_results) / len(all_results),
+            "max_bandwidth": max(all_results),
+            "min_bandwidth": min(all_results),
+            "total_tests": len(all_results)
         }
 
-        # Test from student hosts
-        for host in student_hosts:
-            try:
-                output = host.cmd(f'iperf -c {server.IP()} -t 2')
-                bandwidth = parse_iperf_output_tcp(output)['bandwidth_mbps']
-                results["student_results"][host.name] = bandwidth
-            except:
-                results["student_results"][host.name] = 0.0
-
-        # Test from faculty hosts  
-        for host in faculty_hosts:
-            try:
-                output = host.cmd(f'iperf -c {server.IP()} -t 2')
-                bandwidth = parse_iperf_output_tcp(output)['bandwidth_mbps']
-                results["faculty_results"][host.name] = bandwidth
-            except:
-                results["faculty_results"][host.name] = 0.0
-
-        # Calculate summary
-        all_results = list(results["student_results"].values()) + list(results["faculty_results"].values())
-        if all_results:
-            results["summary"] = {
-                "avg_bandwidth": sum(all_results) / len(all_results),
-                "max_bandwidth": max(all_results),
-                "min_bandwidth": min(all_results),
-                "total_tests": len(all_results)
-            }
+    return {
+        "message": f"iPerf test to {server} {'cancelled after' if run['cancelled'] else 'completed in'} {run['timing']['wall_clock_s']:.1f}s",
+        "results": results,
+        "timing": run["timing"]
+    }
 
-        return jsonify({
-            "status": "success",
-            "message": f"iPerf test to {server_name} completed",
-            "results": results
-        })
+def udp_sweep_test(network, topology, server, duration, wave_size, bandwidth, job=None):
+    """UDP throughput, jitter and loss of all hosts sending to a server at once"""
+    def progress(host_name, completed, total):
+        events.publish("test", {"test": "udp", "server": server, "phase": "progress", "host": host_name,
+                                "completed": completed, "total": total})
+        if job is not None:
+            job.update(completed=completed, total=total, host=host_name)
 
+    events.publish("test", {"test": "udp", "server": server, "phase": "started"})
+    try:
+        report = topology.udp_test(
+            network, getattr(topology, 'student_number', 8), getattr(topology, 'faculty_number', 8),
+            server_name=server, bandwidth=bandwidth, duration=duration, wave_size=wave_size, progress=progress,
+            on_start=(lambda test: job.on_cancel(test.cancel)) if job is not None else None
+        )
     except Exception as e:
-        app.logger.error(f"Error running iPerf test to {server_name}: {str(e)}")
-        return jsonify({"status": "error", "message": f"iPerf test failed: {str(e)}"}), 500
-
-def parse_tcp_multithreaded_results(output):
-    """Parse TCP multithreaded iPerf output from topology function"""
-    import re
-
-    results = {
-        "student_results": {},
-        "faculty_results": {},
-        "summary": {
-            "total_tests": 0,
-            "avg_bandwidth": 0,
-            "max_bandwidth": 0,
-            "min_bandwidth": float('inf')
-        }
+        events.publish("test", {"test": "udp", "server": server, "phase": "failed", "message": str(e)})
+        raise
+    events.publish("test", {"test": "udp", "server": server, "phase": "cancelled" if report.cancelled else "finished"})
+
+    return {
+        "message": f"UDP test to {server} {'cancelled after' if report.cancelled else 'completed in'} {report.wall_clock_s:.1f}s",
+        "report": report.to_dict(),
+        "raw_output": test_results.format_report(report)
     }
 
-    # Parse individual host results from output like "h1s -> srv1 [Request 1]: 25.50 Mbps, Latency: 2.50 ms"
-    lines = output.split('\n')
-    bandwidth_values = []
-    latency_values = []
-
-    for line in lines:
-        # Parse individual test results
-        match = re.search(r'(h\d+[sf])\s*->\s*srv1\s*\[Request\s*\d+\]:\s*(\d+\.\d+)\s*Mbps,\s*Latency:\s*(\d+\.\d+)\s*ms', line)
-        if match:
-            host = match.group(1)
-            bandwidth = float(match.group(2))
-            latency = float(match.group(3))
-
-            bandwidth_values.append(bandwidth)
-            latency_values.append(latency)
-
-            if host.endswith('s'):  # Student host
-                if host not in results["student_results"]:
-                    results["student_results"][host] = []
-                results["student_results"][host].append({
-                    "bandwidth": bandwidth,
-                    "latency": latency
-                })
-            elif host.endswith('f'):  # Faculty host
-                if host not in results["faculty_results"]:
-                    results["faculty_results"][host] = []
-                results["faculty_results"][host].append({
-                    "bandwidth": bandwidth,
-                    "latency": latency
-                })
+def prepare_test(test_type, params):
+    """Validate a test request against the running network.
+
+    Returns the function running the test (taking an optional job) and the
+    normalized parameters; raises TestRequestError when it cannot run.
+    """
+    if test_type not in TEST_FAILURES:
+        raise TestRequestError(f"Unknown test type: {test_type}")
+    if net is None:
+        raise TestRequestError("Network is not running")
+    network, topology = net, current_topology
+
+    if test_type == "pingall":
+        if topology is None:
+            raise TestRequestError("No topology selected")
+        try:
+            count = int(params.get("count") or PING_COUNT)
+            interval = float(params.get("interval") or PING_INTERVAL)
+        except (TypeError, ValueError):
+            raise TestRequestError("count must be an integer and interval a number")
+        if not 1 <= count <= 100 or not 0.01 <= interval <= 10:
+            raise TestRequestError("count must be 1-100 and interval 0.01-10 seconds")
+        settings = {"count": count, "interval": interval}
+        return lambda job=None: pingall_test(network, topology, job=job, **settings), settings
+
+    server = params.get("server") or {"iperf": "srv1", "udp": "srv2"}.get(test_type)
+    if server not in ['srv1', 'srv2', 'srv3']:
+        raise TestRequestError("Invalid server name")
+    # Clients all at once (hosts under contention) or wave_size at a time
+    try:
+        duration = int(params.get("duration") or (UDP_DURATION if test_type == "udp" else IPERF_DURATION))
+        wave_size = int(params["wave_size"]) if params.get("wave_size") else None
+    except (TypeError, ValueError):
+        raise TestRequestError("duration and wave_size must be integers")
+    if duration < 1 or (wave_size is not None and wave_size < 1):
+        raise TestRequestError("duration and wave_size must be positive")
+
+    if test_type == "iperf_server":
+        settings = {"server": server, "duration": duration, "wave_size": wave_size}
+        return lambda job=None: iperf_server_test(network, topology, job=job, **settings), settings
+
+    if topology is None:
+        raise TestRequestError("No topology selected")
+    if test_type == "udp":
+        if not hasattr(topology, 'udp_test'):
+            raise TestRequestError("Selected topology does not support UDP testing")
+        bandwidth = str(params.get("bandwidth") or UDP_BANDWIDTH)
+        if not re.fullmatch(r"\d+(\.\d+)?[KMG]?", bandwidth):
+            raise TestRequestError("bandwidth must be a rate like 30M")
+        settings = {"server": server, "duration": duration, "wave_size": wave_size, "bandwidth": bandwidth}
+        return lambda job=None: udp_sweep_test(network, topology, job=job, **settings), settings
+
+    if not hasattr(topology, 'run_iperf_multithreaded_tcp'):
+        raise TestRequestError("Selected topology does not support multithreaded TCP testing")
+    settings = {"server": server, "duration": duration}
+    return lambda job=None: iperf_test(network, topology, job=job, **settings), settings
+
+def submit_test(test_type, test, params):
+    """Queue a prepared test as a job and answer 202 with its id"""
+    def run(job):
+        try:
+            return test(job)
+        except Exception as e:
+            if not job.cancel_requested.is_set():
+                app.logger.error(f"Error running {test_type} job {job.id}: {str(e)}")
+            raise
+
+    job = job_manager.submit(test_type, run, params)
+    return jsonify({
+        "status": "success",
+        "message": f"{test_type} test queued as job {job.id}",
+        "job_id": job.id,
+        "job": job.summary()
+    }), 202
+
+def run_test(test_type, params):
+    """Run a test within the request, or as a job when async=1 is given"""
+    try:
+        test, settings = prepare_test(test_type, params)
+    except TestRequestError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
 
-    # Parse summary lines from topology output
-    for line in lines:
-        # Look for summary lines like "Student to srv1: Avg Bandwidth: 25.50 Mbps, Avg Latency: 1.23 ms"
-        match = re.search(r'(Student|Faculty) to srv1: Avg Bandwidth: ([\d.]+) Mbps, Avg Latency: ([\d.]+) ms', line)
-        if match:
-            group = match.group(1).lower()
-            avg_bw = float(match.group(2))
-            avg_lat = float(match.group(3))
-
-            results["summary"][f"{group}_avg_bandwidth"] = avg_bw
-            results["summary"][f"{group}_avg_latency"] = avg_lat
-
-    # Calculate summary statistics
-    if bandwidth_values:
-        results["summary"]["total_tests"] = len(bandwidth_values)
-        results["summary"]["avg_bandwidth"] = sum(bandwidth_values) / len(bandwidth_values)
-        results["summary"]["max_bandwidth"] = max(bandwidth_values)
-        results["summary"]["min_bandwidth"] = min(bandwidth_values)
-    else:
-        results["summary"]["min_bandwidth"] = 0
+    if str(params.get("async", "")).lower() in ("1", "true"):
+        return submit_test(test_type, test, settings)
+    try:
+        return jsonify({"status": "success", **test()})
+    except Exception as e:
+        app.logger.error(f"Error running {test_type} test: {str(e)}")
+        return jsonify({"status": "error", "message": f"{TEST_FAILURES[test_type]}: {str(e)}"}), 500
 
-    return results
+@app.route("/api/pingall")
+def ping_all():
+    """Run ping test between all hosts"""
+    return run_test("pingall", request.args)
 
+@app.route("/api/iperf")
+def call_run_iperf():
+    return run_test("iperf", request.args)
 
+@app.route("/api/iperf/<server_name>")
+def run_iperf_server(server_name):
+    """Run iPerf test to specific server"""
+    return run_test("iperf_server", dict(request.args.items(), server=server_name))
+
+@app.route("/api/udp")
+def run_udp_test():
+    """Run UDP test from all hosts at once to a server (srv2 by default)"""
+    return run_test("udp", request.args)
+
+@app.route("/api/jobs", methods=["POST"])
+def submit_job():
+    """Queue a test (pingall, iperf, iperf_server or udp) and return its job id"""
+    data = request.get_json(silent=True) or {}
+    test_type = data.get("type")
+    try:
+        test, settings = prepare_test(test_type, data)
+    except TestRequestError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return submit_test(test_type, test, settings)
+
+@app.route("/api/jobs")
+def list_jobs():
+    """Queued, running and retained jobs, newest first"""
+    return jsonify({
+        "status": "success",
+        "jobs": [job.summary() for job in reversed(job_manager.list())],
+        "stats": job_manager.stats()
+    })
+
+@app.route("/api/jobs/<job_id>")
+def get_job(job_id):
+    """Status and progress of a job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": f"Job {job_id} not found"}), 404
+    return jsonify({"status": "success", "job": job.summary()})
+
+@app.route("/api/jobs/<job_id>/result")
+def get_job_result(job_id):
+    """Response of a finished test, in the same form as the synchronous endpoint"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": f"Job {job_id} not found"}), 404
+    if job.status == jobs.FAILED:
+        return jsonify({"status": "error", "message": f"{TEST_FAILURES[job.kind]}: {job.error}", "job": job.summary()}), 500
+    if job.status not in jobs.FINISHED or job.result is None:
+        return jsonify({"status": "error", "message": f"Job {job_id} is {job.status}", "job": job.summary()}), 409
+    return jsonify({"status": "success", **job.result, "job": job.summary()})
+
+@app.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    """Cancel a queued or running job, stopping its processes on the hosts"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": f"Job {job_id} not found"}), 404
+    phase = "being cancelled" if job.status == jobs.RUNNING else job.status
+    return jsonify({"status": "success", "message": f"Job {job_id} is {phase}", "job": job.summary()})
+
+def positive_option(options, name, default, kind):
+    """JSON option that must be a positive int (kind int) or number (kind float)"""
+    value = options.get(name, default)
+    valid = isinstance(value, int) if kind is int else isinstance(value, (int, float)) and math.isfinite(value)
+    if isinstance(value, bool) or not valid or value <= 0:
+        raise ValueError(f"{name} must be a positive {'integer' if kind is int else 'number'}")
+    return kind(value)
 
 @app.route("/api/inject_flows", methods=["POST"])
 def inject_flows():
@@ -364,14 +708,30 @@ def inject_flows():
         if current_flow_rule is None:
             return jsonify({"status": "error", "message": "No flow rule selected"}), 400
 
+        # Injection options: mode ("batch", "parallel" or "reconcile"), batch_size,
+        # max_workers, track_convergence (off by default, it polls ONOS for up to
+        # convergence_timeout seconds before answering) and convergence_timeout
+        options = request.get_json(silent=True) or {}
+        mode = options.get('mode', flow_injector.DEFAULT_MODE)
+        if mode not in flow_injector.MODES:
+            return jsonify({"status": "error", "message": f"Invalid injection mode: {mode}"}), 400
+        try:
+            batch_size = positive_option(options, 'batch_size', flow_injector.DEFAULT_BATCH_SIZE, int)
+            max_workers = positive_option(options, 'max_workers', flow_injector.DEFAULT_MAX_WORKERS, int)
+            convergence_timeout = positive_option(options, 'convergence_timeout', flow_injector.DEFAULT_CONVERGENCE_TIMEOUT, float)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        track = options.get('track_convergence', False)
+        if not isinstance(track, bool):
+            return jsonify({"status": "error", "message": "track_convergence must be true or false"}), 400
+
         # Log the flow rule module being used
         flow_rule_name = getattr(current_flow_rule, '__name__', 'Unknown')
-        app.logger.info(f"Injecting flows using module: {flow_rule_name}")
+        app.logger.info(f"Injecting flows using module: {flow_rule_name} ({mode} mode)")
         
         # Check ONOS connection first
         try:
-            test_url = f"http://{ONOS_IP}:{ONOS_PORT}/onos/v1/devices"
-            test_response = requests.get(test_url, auth=HTTPBasicAuth(ONOS_USERNAME, ONOS_PASSWORD), timeout=5)
+            test_response = onos.request("GET", "devices", "devices")
             if test_response.status_code != 200:
                 return jsonify({
                     "status": "error", 
@@ -383,17 +743,37 @@ def inject_flows():
                 "message": f"ONOS connection failed: {str(e)}"
             }), 500
 
-        success = current_flow_rule.inject_flow_rules()
+        # Modules exposing their payloads go through the injection engine for timing
+        if not hasattr(current_flow_rule, 'build_flow_payloads'):
+            success = current_flow_rule.inject_flow_rules()
+            injection = None
+        else:
+            switch_count = getattr(current_topology, 'switch_number', flow_compiler.DEFAULT_SWITCH_COUNT)
+            report = flow_injector.inject_flows(
+                current_flow_rule.build_flow_payloads(switch_count),
+                mode=mode,
+                batch_size=batch_size,
+                max_workers=max_workers,
+                track=track,
+                convergence_timeout=convergence_timeout
+            )
+            success = report["failed_count"] == 0
+            injection = {key: value for key, value in report.items() if key != "results"}
+            injection["failures"] = [result for result in report["results"] if not result["success"]]
+        snapshots.invalidate("flows")
+        collector.refresh("flows")
 
         if success:
             return jsonify({
                 "status": "success", 
-                "message": f"Flow rules injected successfully using {flow_rule_name}"
+                "message": f"Flow rules injected successfully using {flow_rule_name}",
+                "injection": injection
             })
         else:
             return jsonify({
                 "status": "error", 
-                "message": "Failed to inject some flow rules - check console logs for details"
+                "message": "Failed to inject some flow rules - check console logs for details",
+                "injection": injection
             }), 500
     except Exception as e:
         app.logger.error(f"Error injecting flows: {str(e)}")
@@ -404,57 +784,340 @@ def inject_flows():
 
 @app.route("/api/flows")
 def get_flows():
-    """Get current flow rules from ONOS"""
-    try:
-        url = f"http://{ONOS_IP}:{ONOS_PORT}/onos/v1/flows"
-        response = requests.get(url, auth=HTTPBasicAuth(ONOS_USERNAME, ONOS_PASSWORD))
+    """Get current flow rules from ONOS.
 
-        if response.status_code == 200:
-            flows_data = response.json()
-            return jsonify({"status": "success", "flows": flows_data.get("flows", [])})
-        else:
+    Query parameters: deviceId, state, appId, priority, queueId, src/dst
+    (IPv4 prefix the match must lie within), limit and cursor for paging,
+    fields for projection and counts=1 for per-state totals.
+    """
+    try:
+        try:
+            index, snapshot = current_flow_index()
+        except onos_client.OnosError:
             return jsonify({"status": "error", "message": "Failed to retrieve flows"}), 500
+
+        # Unchanged result for this query: answer 304 without building it
+        etag = index.etags.get(request.query_string)
+        if etag is not None and request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+
+        try:
+            query = flow_index.parse_query(request.args)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        body = json.dumps(dict(status="success", **index.query(query)), separators=(",", ":"))
+        etag = hashlib.sha1(body.encode()).hexdigest()
+        index.etags[request.query_string] = etag
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+
+        # Snapshot age/version are appended after hashing so they do not change the ETag
+        body = body[:-1] + "," + json.dumps(snapshot, separators=(",", ":"))[1:]
+        return json_response(body.encode(), etag)
     except Exception as e:
         app.logger.error(f"Error getting flows: {str(e)}")
         return jsonify({"status": "error", "message": f"Failed to get flows: {str(e)}"}), 500
 
+def current_flow_index():
+    """Flow index of the latest flow snapshot, plus the snapshot's age/version"""
+    flows, snapshot = read_state("flows", onos.get_flows)
+    if state.get("flows") is None:
+        # No collected snapshot to index yet: index the cached read instead
+        flows_index.update(flows)
+    return flows_index, snapshot
+
+@app.route("/api/flows/lookup")
+def lookup_flows():
+    """Find the flow rules a packet would hit, or the flows sharing a flow's selector.
+
+    Either src and dst (plus optional protocol, port and deviceId, where
+    deviceId may be a switch name like s3), or flowId.
+    """
+    try:
+        try:
+            index, snapshot = current_flow_index()
+        except onos_client.OnosError:
+            return jsonify({"status": "error", "message": "Failed to retrieve flows"}), 500
+
+        started = time.perf_counter()
+        flow_id = request.args.get("flowId")
+        if flow_id:
+            peers = index.same_selector(flow_id)
+            if peers is None:
+                return jsonify({"status": "error", "message": f"Unknown flow: {flow_id}"}), 404
+            result = {"flows": peers}
+        else:
+            try:
+                lookup = flow_index.parse_lookup(request.args)
+            except ValueError as e:
+                return jsonify({"status": "error", "message": str(e)}), 400
+            result = {"matches": index.lookup(**lookup)}
+
+        return jsonify({
+            "status": "success",
+            **result,
+            "lookup_ms": round((time.perf_counter() - started) * 1000, 3),
+            **snapshot
+        })
+    except Exception as e:
+        app.logger.error(f"Error looking up flows: {str(e)}")
+        return jsonify({"status": "error", "message": f"Flow lookup failed: {str(e)}"}), 500
+
+@app.route("/api/flows/<flow_id>/series")
+def get_flow_series(flow_id):
+    """Counter history and bps/pps rates of one flow.
+
+    Optional window (seconds of history) and points (downsample to at most
+    that many samples).
+    """
+    try:
+        try:
+            window = float(request.args["window"]) if request.args.get("window") else None
+            points = int(request.args["points"]) if request.args.get("points") else None
+        except ValueError:
+            return jsonify({"status": "error", "message": "window and points must be numbers"}), 400
+        if points is not None and points < 2:
+            return jsonify({"status": "error", "message": "points must be at least 2"}), 400
+
+        series = flow_counters.series(flow_id, window, points)
+        if series is None:
+            return jsonify({"status": "error", "message": f"No counter history for flow {flow_id}"}), 404
+        return jsonify({"status": "success", "series": series})
+    except Exception as e:
+        app.logger.error(f"Error getting flow series: {str(e)}")
+        return jsonify({"status": "error", "message": f"Failed to get flow series: {str(e)}"}), 500
+
+@app.route("/api/flows/rates")
+def get_flow_rates():
+    """Current flow throughput per switch and queue, plus the busiest flows.
+
+    by_queue takes each queue at the switch where it carries the most
+    traffic, since the same packets are counted by every switch on their path.
+    """
+    try:
+        try:
+            top = int(request.args.get("top", "10"))
+        except ValueError:
+            return jsonify({"status": "error", "message": "top must be an integer"}), 400
+
+        current = flow_counters.current_rates()
+        classes = flows_index.classify(current)
+
+        by_device = {}
+        for flow_id, rate in current.items():
+            device, queue = classes.get(flow_id, (None, None))
+            totals = by_device.setdefault(device, {}).setdefault(str(queue), {"bps": 0.0, "pps": 0.0, "flows": 0})
+            totals["bps"] += rate["bps"]
+            totals["pps"] += rate["pps"]
+            totals["flows"] += 1
+
+        by_queue = {}
+        for device, queues in by_device.items():
+            for queue, totals in queues.items():
+                if queue not in by_queue or totals["bps"] > by_queue[queue]["bps"]:
+                    by_queue[queue] = dict(totals, deviceId=device)
+
+        busiest = sorted(current.items(), key=lambda item: item[1]["bps"], reverse=True)[:max(0, top)]
+        return jsonify({
+            "status": "success",
+            "by_queue": by_queue,
+            "by_device": by_device,
+            "top_flows": [
+                dict(rate, id=flow_id, deviceId=classes.get(flow_id, (None, None))[0],
+                     queueId=classes.get(flow_id, (None, None))[1])
+                for flow_id, rate in busiest
+            ]
+        })
+    except Exception as e:
+        app.logger.error(f"Error getting flow rates: {str(e)}")
+        return jsonify({"status": "error", "message": f"Failed to get flow rates: {str(e)}"}), 500
+
+def not_modified(etag):
+    response = app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+def json_response(body, etag):
+    """JSON response with a weak ETag, gzipped when large and accepted"""
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag, weak=True)
+    response.vary.add("Accept-Encoding")
+    if len(body) >= GZIP_MIN_SIZE and "gzip" in request.accept_encodings:
+        response.set_data(gzip.compress(body, GZIP_LEVEL))
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
+@app.route("/api/flows/clear", methods=["POST"])
+def clear_flows():
+    """Bulk-remove injected flow rules from ONOS"""
+    try:
+        # Options: method ("application" or "ids"), app_id, device_id
+        options = request.get_json(silent=True) or {}
+        method = options.get('method', 'application')
+        if method not in ('application', 'ids'):
+            return jsonify({"status": "error", "message": f"Invalid clear method: {method}"}), 400
+        if method == 'application' and options.get('device_id'):
+            return jsonify({"status": "error", "message": "device_id requires the 'ids' clear method"}), 400
+
+        report = flow_injector.clear_flows(
+            app_id=options.get('app_id', flow_injector.MANAGED_APP_ID),
+            method=method,
+            device_id=options.get('device_id'),
+            batch_size=options.get('batch_size', flow_injector.DEFAULT_BATCH_SIZE)
+        )
+        snapshots.invalidate("flows")
+        collector.refresh("flows")
+
+        if report["confirmed"]:
+            return jsonify({
+                "status": "success",
+                "message": f"Removed {report['removed']} flow rules in {report['elapsed_ms']:.0f} ms",
+                "clear": report
+            })
+        elif report["confirm_error"] and not report["errors"]:
+            # ONOS accepted the delete but could not be read back before the deadline
+            return jsonify({
+                "status": "success",
+                "message": f"Removal of {report['remaining']} of {report['matched']} flow rules not confirmed: {report['confirm_error']}",
+                "clear": report
+            }), 202
+        elif report["errors"] and not report["matched"]:
+            return jsonify({
+                "status": "error",
+                "message": f"Failed to clear flows: {report['errors'][0]}",
+                "clear": report
+            }), 500
+        else:
+            return jsonify({
+                "status": "error",
+                "message": f"{report['remaining']} of {report['matched']} flow rules are still installed",
+                "clear": report
+            }), 500
+    except Exception as e:
+        app.logger.error(f"Error clearing flows: {str(e)}")
+        return jsonify({"status": "error", "message": f"Failed to clear flows: {str(e)}"}), 500
+
 @app.route("/api/devices")
 def get_devices():
     """Get device information from ONOS"""
     try:
-        devices = get_onos_devices()
-        return jsonify({"status": "success", "devices": devices})
+        devices, snapshot = get_onos_devices()
+        return jsonify({"status": "success", "devices": devices, **snapshot})
     except Exception as e:
         app.logger.error(f"Error getting devices: {str(e)}")
         return jsonify({"status": "error", "message": f"Failed to get devices: {str(e)}"}), 500
 
+@app.route("/api/ports")
+def get_ports():
+    """Get port information of every device from ONOS"""
+    try:
+        ports, snapshot = read_state("ports", onos.get_ports)
+        return jsonify({"status": "success", "ports": ports, **snapshot})
+    except Exception as e:
+        app.logger.error(f"Error getting ports: {str(e)}")
+        return jsonify({"status": "error", "message": f"Failed to get ports: {str(e)}"}), 500
+
+@app.route("/api/links")
+def get_links():
+    """Get infrastructure links from ONOS"""
+    try:
+        links, snapshot = read_state("links", onos.get_links)
+        return jsonify({"status": "success", "links": links, **snapshot})
+    except Exception as e:
+        app.logger.error(f"Error getting links: {str(e)}")
+        return jsonify({"status": "error", "message": f"Failed to get links: {str(e)}"}), 500
+
+# Shared ovsdb-server connection; a monitor drops the cached QoS model when OVS changes
+ovsdb = ovsdb_client.get_client()
+
+def watch_qos_tables():
+    try:
+        ovsdb.monitor(
+            {"QoS": ["type", "other_config", "queues"], "Queue": ["other_config"], "Port": ["qos"]},
+            lambda updates: snapshots.invalidate("qos"),
+            monitor_id="qos"
+        )
+    except ovsdb_client.OvsdbError as e:
+        app.logger.warning(f"Not monitoring OVS QoS tables: {str(e)}")
+
+def active_queue_ids(classes):
+    """"subnet_service" -> queue id the selected flow rules steer it into"""
+    spec = getattr(current_flow_rule, 'spec', None)
+    if spec:
+        return {f"{entry['subnet']}_{entry['service']}": entry['queueId'] for entry in spec['classes']}
+    return {
+        f"{entry['subnet']}_{entry['service']}": queue_id
+        for queue_id, entry in classes.items() if entry.get('profile') == 1 and entry.get('subnet')
+    }
+
 @app.route("/api/qos")
 def get_qos_info():
     """Get QoS configuration information"""
     try:
-        # Get queue information from OVS
-        result = subprocess.run(['sudo', 'ovs-vsctl', 'list', 'queue'], capture_output=True, text=True)
-
-        qos_info = {
-            "queues": [],
-            "bandwidth_limits": {
-                "student_mail": "5 Mbps",
-                "student_rtmp": "25 Mbps", 
-                "student_call": "10 Mbps",
-                "faculty_mail": "15 Mbps",
-                "faculty_rtmp": "50 Mbps",
-                "faculty_call": "20 Mbps"
-            }
-        }
-
-        if result.returncode == 0:
-            qos_info["ovs_output"] = result.stdout
-
-        return jsonify({"status": "success", "qos": qos_info})
+        # QoS, Queue and Port tables read from OVSDB in one transaction, cached until they change
+        classes = topology_queue_classes()
+        model = snapshots.get("qos", lambda: qos_config.load(classes))
+        age = snapshots.age("qos")
+
+        qos_info = dict(
+            model,
+            bandwidth_limits=qos_config.bandwidth_limits(model, active_queue_ids(classes)),
+            total_max_rate=getattr(current_topology, 'TOTAL_MAX_RATE', None)
+        )
+        return jsonify({"status": "success", "qos": qos_info, "snapshot_age": round(age, 3) if age is not None else None})
     except Exception as e:
         app.logger.error(f"Error getting QoS info: {str(e)}")
         return jsonify({"status": "error", "message": f"Failed to get QoS info: {str(e)}"}), 500
 
+@app.route("/api/qos/queues", methods=["PUT"])
+def update_qos_queues():
+    """Change max-rate/min-rate of existing queues in place, without restarting the network.
+
+    Body: {"queues": [{"queue_id": 2, "max_rate": 40000000, "min_rate": 5000000}, ...]}
+    (rates in bits per second; "queue": "q2s" may be given instead of queue_id).
+    """
+    try:
+        if net is None:
+            return jsonify({"status": "error", "message": "Network is not running"}), 400
+
+        data = request.get_json(silent=True) or {}
+        changes = data.get("queues")
+        if not isinstance(changes, list) or not all(isinstance(change, dict) for change in changes):
+            return jsonify({"status": "error", "message": "queues must be a list of queue changes"}), 400
+
+        try:
+            report = qos_config.apply_queue_rates(
+                changes, getattr(current_topology, 'TOTAL_MAX_RATE', None), topology_queue_classes(), ovsdb
+            )
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        snapshots.invalidate("qos")
+        events.publish("qos", {"updated": report["updated"]})
+        return jsonify({"status": "success", "message": f"Updated {len(report['updated'])} queues", **report})
+    except Exception as e:
+        app.logger.error(f"Error updating QoS queues: {str(e)}")
+        return jsonify({"status": "error", "message": f"Failed to update QoS queues: {str(e)}"}), 500
+
+
+@app.route("/api/qos/stats")
+def get_qos_stats():
+    """Tx rates of every OVS queue and totals per traffic class.
+
+    Optional bridge (e.g. s3) limits the queues to one switch.
+    """
+    try:
+        if net is None:
+            return jsonify({"status": "error", "message": "Network is not running"}), 400
+
+        report = queue_rates.report(topology_queue_classes(), request.args.get("bridge"))
+        snapshot = state.get("queue_stats")
+        meta = snapshot.meta() if snapshot else {"snapshot_age": None, "snapshot_version": None, "snapshot_error": None}
+        return jsonify({"status": "success", **report, **meta})
+    except Exception as e:
+        app.logger.error(f"Error getting QoS statistics: {str(e)}")
+        return jsonify({"status": "error", "message": f"Failed to get QoS statistics: {str(e)}"}), 500
 
 
 # New API endpoints for topology and flow rule selection
@@ -492,6 +1155,7 @@ def select_topology():
 
         # Import the selected topology module
         current_topology = importlib.import_module(topology_name)
+        snapshots.invalidate("qos")    # queue classes come from the topology's QUEUE_CONFIG
 
         return jsonify({
             "status": "success", 
@@ -504,14 +1168,14 @@ def select_topology():
 
 @app.route("/api/flowrules")
 def get_available_flowrules():
-    """Get list of available flow rule files"""
+    """Get list of available flow rule files (Python modules and JSON specs)"""
     try:
         flowrule_dir = "../backend/flowrules"
         flowrule_files = []
 
-        for file in os.listdir(flowrule_dir):
-            if file.endswith('.py') and not file.startswith('__'):
-                module_name = file[:-3]  # Remove .py extension
+        for file in sorted(os.listdir(flowrule_dir)):
+            if file.endswith(('.py', '.json')) and not file.startswith('__'):
+                module_name = os.path.splitext(file)[0]  # Remove .py/.json extension
                 flowrule_files.append({
                     "name": module_name,
                     "filename": file,
@@ -534,8 +1198,12 @@ def select_flowrule():
         if not flowrule_name:
             return jsonify({"status": "error", "message": "Flow rule name required"}), 400
 
-        # Import the selected flow rule module
-        current_flow_rule = importlib.import_module(flowrule_name)
+        # Load the selected flow rule spec, or import the flow rule module
+        spec_path = os.path.join("../backend/flowrules", f"{flowrule_name}.json")
+        if os.path.exists(spec_path):
+            current_flow_rule = flow_compiler.FlowRuleSpec(spec_path)
+        else:
+            current_flow_rule = importlib.import_module(flowrule_name)
 
         return jsonify({
             "status": "success", 
@@ -564,11 +1232,8 @@ def onos_status():
     """Check ONOS controller connectivity and status"""
     try:
         # Test basic connectivity
-        devices_url = f"http://{ONOS_IP}:{ONOS_PORT}/onos/v1/devices"
-        apps_url = f"http://{ONOS_IP}:{ONOS_PORT}/onos/v1/applications"
-        
-        devices_response = requests.get(devices_url, auth=HTTPBasicAuth(ONOS_USERNAME, ONOS_PASSWORD), timeout=5)
-        apps_response = requests.get(apps_url, auth=HTTPBasicAuth(ONOS_USERNAME, ONOS_PASSWORD), timeout=5)
+        devices_response = onos.request("GET", "devices", "devices")
+        apps_response = onos.request("GET", "applications", "applications")
         
         return jsonify({
             "status": "success",
@@ -596,6 +1261,80 @@ def onos_status():
         }), 500
 
 
+@app.route("/api/port_stats")
+def get_port_stats():
+    """Port rates, utilization against link capacity, drop ratios and hot spots.
+
+    Optional deviceId (or switch name like s3) and top (number of ports).
+    """
+    try:
+        try:
+            top = int(request.args["top"]) if request.args.get("top") else None
+        except ValueError:
+            return jsonify({"status": "error", "message": "top must be an integer"}), 400
+        device_id = request.args.get("deviceId")
+        if device_id:
+            device_id = flow_index.normalize_device_id(device_id)
+
+        snapshot = state.get("links")
+        report = port_engine.report(device_id, top, snapshot.value if snapshot else None)
+        port_snapshot = state.get("port_stats")
+        meta = port_snapshot.meta() if port_snapshot else {"snapshot_age": None, "snapshot_version": None, "snapshot_error": None}
+        return jsonify({"status": "success", **report, **meta})
+    except Exception as e:
+        app.logger.error(f"Error getting port statistics: {str(e)}")
+        return jsonify({"status": "error", "message": f"Failed to get port statistics: {str(e)}"}), 500
+
+
+@app.route("/api/stream")
+def event_stream():
+    """Server-Sent Events stream of status, device, flow and test events"""
+    try:
+        last_event_id = int(request.headers.get("Last-Event-ID", ""))
+    except ValueError:
+        last_event_id = None
+    subscription = events.subscribe(last_event_id)
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = subscription.get(STREAM_KEEPALIVE)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                event_id, event_type, data = event
+                yield f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            events.unsubscribe(subscription)
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+@app.route("/api/cache/stats")
+def cache_stats():
+    """Hit/miss counters of the ONOS snapshot cache and collector state"""
+    return jsonify({
+        "status": "success",
+        "cache": snapshots.stats(),
+        "collector": {
+            "running": collector.is_alive(),
+            "intervals": collector.intervals(),
+            "resources": state.summary()
+        },
+        "stream_subscribers": events.subscriber_count(),
+        "flow_index": flows_index.stats(),
+        "flow_series": flow_counters.stats(),
+        "port_stats": port_engine.stats(),
+        "queue_stats": queue_rates.stats(),
+        "ovsdb": ovsdb.stats(),
+        "jobs": job_manager.stats()
+    })
+
+
 @app.route("/api/topology")
 def get_topology():
     """Get dynamic topology information from selected topology"""
@@ -610,6 +1349,7 @@ def get_topology():
         # Get topology info dynamically from the selected topology module
         student_number = getattr(current_topology, 'student_number', 8)
         faculty_number = getattr(current_topology, 'faculty_number', 8)
+        switch_number = getattr(current_topology, 'switch_number', 8)
 
         topology_info = {
             "subnets": {
@@ -630,7 +1370,7 @@ def get_topology():
                     "services": ["Mail", "RTMP", "Call"]
                 }
             },
-            "switches": [f"s{i+1}" for i in range(8)],
+            "switches": [f"s{i+1}" for i in range(switch_number)],
             "router": {
                 "name": "r0",
                 "interfaces": [
@@ -661,17 +1401,12 @@ def get_topology():
         return jsonify({"status": "error", "message": f"Failed to get topology info: {str(e)}"}), 500
 
 def get_onos_devices():
-    """Helper function to get device information from ONOS"""
+    """Helper function to get device information (and its snapshot age) from ONOS"""
     try:
-        url = f"http://{ONOS_IP}:{ONOS_PORT}/onos/v1/devices"
-        response = requests.get(url, auth=HTTPBasicAuth(ONOS_USERNAME, ONOS_PASSWORD))
-
-        if response.status_code == 200:
-            devices_data = response.json()
-            return devices_data.get("devices", [])
-        else:
-            app.logger.error(f"Failed to get devices from ONOS: {response.status_code}")
-            return []
+        return read_state("devices", onos.get_devices)
+    except onos_client.OnosError as e:
+        app.logger.error(f"Failed to get devices from ONOS: {e.status_code}")
+        return [], {}
     except Exception as e:
         app.logger.error(f"Error connecting to ONOS: {str(e)}")
-        return []
+        return [], {}
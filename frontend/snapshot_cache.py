@@ -0,0 +1,104 @@
+"""TTL cache with single-flight request coalescing for ONOS reads.
+
+Dashboard pages poll the same ONOS resources from every open tab. The cache
+serves a snapshot while it is younger than its TTL, and when it expires only
+one request thread reloads it - concurrent readers wait for that load
+instead of sending their own.
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+
+class SnapshotCache:
+    """Keyed snapshots with per-key TTL, coalesced loads and counters"""
+
+    def __init__(self, ttls, default_ttl=5.0, wait_timeout=30.0):
+        self.ttls = dict(ttls)
+        self.default_ttl = default_ttl
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._entries = {}      # key -> (value, loaded_at)
+        self._inflight = {}     # key -> Future of the running load
+        self._generations = {}  # key -> bumped on invalidation
+        self._stats = {}
+
+    def _counter(self, key):
+        return self._stats.setdefault(key, {
+            "hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "invalidations": 0
+        })
+
+    def get(self, key, loader, ttl=None):
+        """Return the cached value of key, calling loader() when stale.
+
+        Exceptions from loader() are not cached; they are raised to the
+        loading thread and to every reader coalesced onto that load.
+        """
+        ttl = self.ttls.get(key, self.default_ttl) if ttl is None else ttl
+        with self._lock:
+            stats = self._counter(key)
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < ttl:
+                stats["hits"] += 1
+                return entry[0]
+
+            future = self._inflight.get(key)
+            if future is not None:
+                stats["coalesced"] += 1
+                leader = False
+            else:
+                stats["misses"] += 1
+                future = Future()
+                self._inflight[key] = future
+                generation = self._generations.get(key, 0)
+                leader = True
+
+        if not leader:
+            return future.result(timeout=self.wait_timeout)
+
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                stats["errors"] += 1
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            # A load that raced with invalidate() is handed out but not kept
+            if self._generations.get(key, 0) == generation:
+                self._entries[key] = (value, time.monotonic())
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    def invalidate(self, *keys):
+        """Drop the given keys (all keys if none given)"""
+        with self._lock:
+            for key in keys or list(set(self._entries) | set(self._inflight)):
+                self._entries.pop(key, None)
+                self._inflight.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+                self._counter(key)["invalidations"] += 1
+
+    def age(self, key):
+        """Seconds since key was loaded, or None if it is not cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return time.monotonic() - entry[1] if entry else None
+
+    def stats(self):
+        """Per-key counters plus TTL and current snapshot age"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                key: dict(
+                    counters,
+                    ttl=self.ttls.get(key, self.default_ttl),
+                    age=round(now - self._entries[key][1], 3) if key in self._entries else None
+                )
+                for key, counters in self._stats.items()
+            }
@@ -124,6 +124,60 @@ async function apiCall(endpoint, options = {}) {
     }
 }
 
+// Server-Sent Events utilities
+// Set once the page subscribes; pages without a subscription fall back to timed refreshes
+let networkEventsSubscribed = false;
+
+// handlers maps event types (status, device, flows, test, resync) to callbacks
+function subscribeNetworkEvents(handlers) {
+    const source = new EventSource('/api/stream');
+    networkEventsSubscribed = true;
+
+    Object.entries(handlers).forEach(([type, handler]) => {
+        source.addEventListener(type, event => {
+            try {
+                handler(JSON.parse(event.data));
+            } catch (error) {
+                console.error(`Error handling ${type} event:`, error);
+            }
+        });
+    });
+
+    // The browser reconnects on its own and resumes from the last event id
+    source.onerror = () => console.warn('Event stream disconnected, reconnecting...');
+    return source;
+}
+
+// Background test jobs
+// Queues a test (pingall, iperf, iperf_server) and resolves with its result once the job is done;
+// onProgress receives the job (id, status, progress) while it runs
+async function runTestJob(type, params = {}, onProgress = null) {
+    const submitted = await fetch('/api/jobs', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ type, ...params })
+    }).then(response => response.json());
+    if (submitted.status !== 'success') {
+        return submitted;
+    }
+
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const data = await fetch(`/api/jobs/${submitted.job_id}`).then(response => response.json());
+        if (data.status !== 'success') {
+            return data;
+        }
+        if (onProgress) onProgress(data.job);
+        if (['succeeded', 'failed', 'cancelled'].includes(data.job.status)) {
+            return fetch(`/api/jobs/${submitted.job_id}/result`).then(response => response.json());
+        }
+    }
+}
+
+function cancelTestJob(jobId) {
+    return fetch(`/api/jobs/${jobId}/cancel`, { method: 'POST' }).then(response => response.json());
+}
+
 // Loading state utilities
 function showLoading(elementId, message = 'Loading...') {
     const element = document.getElementById(elementId);
@@ -250,9 +304,10 @@ document.addEventListener('DOMContentLoaded', function() {
     loadTopologies();
     loadFlowrules();
     loadCurrentSelection();
-    // Auto-refresh every 30 seconds
+    // Auto-refresh every 30 seconds, unless the page is kept current by the event stream
     setInterval(() => {
-        updateNetworkStatus();
-        updateDeviceCount();
+        if (networkEventsSubscribed) return;
+        if (typeof updateNetworkStatus === 'function') updateNetworkStatus();
+        if (typeof updateDeviceCount === 'function') updateDeviceCount();
     }, 30000);
 });
@@ -0,0 +1,64 @@
+"""Checks of the /api/flows cursor and query parsers"""
+import ipaddress
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend/common'))
+import flow_index
+
+
+def test_cursor_round_trip():
+    key = ("of:0000000000000001", "49539597284508561")
+    assert flow_index.decode_cursor(flow_index.encode_cursor(list(key))) == key
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    flow_index.encode_cursor("of:0000000000000001"),
+    flow_index.encode_cursor(["of:0000000000000001"]),
+    flow_index.encode_cursor([1, 2]),
+    flow_index.encode_cursor([None, "x"]),
+])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        flow_index.decode_cursor(cursor)
+
+
+def test_parse_query():
+    query = flow_index.parse_query({"deviceId": "s3", "priority": "40000", "src": "10.0.0.5",
+                                    "limit": "10", "fields": "id, state", "counts": "1"})
+    assert query["filters"] == {"deviceId": "of:0000000000000003", "priority": 40000}
+    assert query["src"] == ipaddress.IPv4Network("10.0.0.5/32")
+    assert query["limit"] == 10
+    assert query["fields"] == ["id", "state"]
+    assert query["counts"] is True
+
+
+@pytest.mark.parametrize("args", [
+    {"priority": "high"},
+    {"src": "10.0.0.300"},
+    {"limit": "-1"},
+    {"limit": str(flow_index.MAX_LIMIT + 1)},
+    {"cursor": flow_index.encode_cursor([1, 2])},
+])
+def test_parse_query_rejects(args):
+    with pytest.raises(ValueError):
+        flow_index.parse_query(args)
+
+
+def test_parse_lookup():
+    lookup = flow_index.parse_lookup({"src": "10.0.0.1", "dst": "10.0.2.1", "protocol": "udp", "port": "5001"})
+    assert lookup == {"src": ipaddress.IPv4Address("10.0.0.1"), "dst": ipaddress.IPv4Address("10.0.2.1"),
+                      "protocol": 17, "port": 5001, "device_id": None}
+    with pytest.raises(ValueError):
+        flow_index.parse_lookup({"src": "10.0.0.1"})
+
+
+def test_selector_matches_reconcile():
+    posted = {"deviceId": "of:0000000000000001", "priority": 40000, "selector": {"criteria": [
+        {"type": "ETH_TYPE", "ethType": "0x800"}, {"type": "UDP_DST", "udpPort": "5004"}]}}
+    installed = {"deviceId": "of:0000000000000002", "priority": 40000, "selector": {"criteria": [
+        {"type": "UDP_DST", "udpPort": 5004}, {"type": "ETH_TYPE", "ethType": "0x800"}]}}
+    index = flow_index.FlowIndex([dict(installed, id="1"), dict(posted, id="2")])
+    assert [flow["id"] for flow in index.same_selector("1")] == ["2", "1"]